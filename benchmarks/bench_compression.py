@@ -0,0 +1,88 @@
+"""
+Time and bytes on the wire of reading a large result set without
+compression, and with OPTIONS['compression'] set to 'zlib' and 'zstd'
+(skipped without pyzstd; servers without zstd negotiate zlib, reported as
+such).
+
+Runs against the 'default' database of test_cymysql.py, or of the settings
+module in DJANGO_SETTINGS_MODULE:
+
+    $ python benchmarks/bench_compression.py [rows]
+
+Compression pays off when the link is slower than compressing: compare the
+bytes received with what the link carries per second.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_cymysql')
+
+import django  # NOQA: E402
+
+django.setup()
+
+from django.db import connection, connections  # NOQA: E402
+
+from mysql_cymysql import compression, instrumentation  # NOQA: E402
+
+TABLE = 'bench_compression'
+INSERT = 'INSERT INTO %s (name, kind, amount, created) VALUES (%%s, %%s, %%s, %%s)' % TABLE
+
+
+def run(label, option, repeat, baseline=None):
+    if option == 'zstd' and compression.pyzstd is None:
+        print('%-6s skipped, pyzstd is not installed' % label)
+        return None
+    db = connections['default'].copy()
+    db.settings_dict['OPTIONS']['compression'] = option
+    try:
+        db.ensure_connection()
+        counter = instrumentation.count_bytes(db.connection)
+        algorithm = db.connection.compress or 'none'
+        with db.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            received = counter.bytes_received
+            start = time.perf_counter()
+            for i in range(repeat):
+                cursor.execute('SELECT * FROM %s' % TABLE)
+                rows = cursor.fetchall()
+            duration = (time.perf_counter() - start) / repeat
+            received = (counter.bytes_received - received) / repeat
+    finally:
+        db.close()
+    line = '%-6s %-6s %8d rows %8.3fs %10.0f KiB' % (label, algorithm, len(rows), duration, received / 1024)
+    if baseline is not None:
+        line += ' %6.1f%% of the bytes, %6.2fx the time' % (
+            received / baseline[1] * 100, duration / baseline[0],
+        )
+    print(line)
+    return duration, received
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    # Repetitive text, like most result sets.
+    rows = [
+        ('customer %d' % i, ('order', 'refund', 'invoice')[i % 3], i * 0.25, '2024-01-01 12:00:00.123456')
+        for i in range(count)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS %s' % TABLE)
+        cursor.execute(
+            'CREATE TABLE %s (id integer AUTO_INCREMENT PRIMARY KEY, name varchar(100), '
+            'kind varchar(20), amount double, created datetime(6))' % TABLE
+        )
+        cursor.executemany(INSERT, rows)
+    try:
+        baseline = run('none', None, 3)
+        run('zlib', 'zlib', 3, baseline)
+        run('zstd', 'zstd', 3, baseline)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE %s' % TABLE)
+
+
+if __name__ == '__main__':
+    main()
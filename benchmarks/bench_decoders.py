@@ -0,0 +1,48 @@
+"""
+Microseconds per value of the decoders in mysql_cymysql.decoders against
+the generic decoders they replace (cymysql's, and typecast_time() for TIME).
+
+Needs no database:
+
+    $ python benchmarks/bench_decoders.py [values]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cymysql.constants import FIELD_TYPE  # NOQA: E402
+from cymysql.converters import decoders  # NOQA: E402
+
+from mysql_cymysql.decoders import django_conversions, typecast_time  # NOQA: E402
+
+generic = dict(decoders)
+generic[FIELD_TYPE.TIME] = typecast_time
+
+VALUES = [
+    ('DATETIME(6)', FIELD_TYPE.DATETIME, b'2024-01-02 03:04:05.123456'),
+    ('DATETIME', FIELD_TYPE.DATETIME, b'2024-01-02 03:04:05'),
+    ('TIMESTAMP', FIELD_TYPE.TIMESTAMP, b'2024-01-02 03:04:05'),
+    ('DATE', FIELD_TYPE.DATE, b'2024-01-02'),
+    ('TIME(6)', FIELD_TYPE.TIME, b'03:04:05.123456'),
+    ('DECIMAL', FIELD_TYPE.NEWDECIMAL, b'12345.67'),
+    ('zero DATE', FIELD_TYPE.DATE, b'0000-00-00'),
+]
+
+
+def per_value(decode, value, count):
+    return min(timeit.repeat(lambda: decode(value), number=count, repeat=5)) / count * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('%-12s %10s %10s' % ('', 'generic', 'backend'))
+    for label, type_code, value in VALUES:
+        before = per_value(generic[type_code], value, count)
+        after = per_value(django_conversions[type_code], value, count)
+        print('%-12s %8.3fus %8.3fus' % (label, before, after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Rows per second of executemany() INSERTs, one statement per row (the
+driver's executemany()) against the multi-row statements of
+CursorWrapper.executemany().
+
+Runs against the 'default' database of test_cymysql.py, or of the settings
+module in DJANGO_SETTINGS_MODULE:
+
+    $ python benchmarks/bench_executemany.py [rows]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_cymysql')
+
+import django  # NOQA: E402
+
+django.setup()
+
+from django.db import connection  # NOQA: E402
+
+TABLE = 'bench_executemany'
+INSERT = 'INSERT INTO %s (name, amount, created) VALUES (%%s, %%s, %%s)' % TABLE
+
+
+def run(label, executemany, rows):
+    with connection.cursor() as cursor:
+        cursor.execute('TRUNCATE TABLE %s' % TABLE)
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        executemany(cursor, INSERT, rows)
+    connection.commit()
+    duration = time.perf_counter() - start
+    print('%-12s %8d rows %8.3fs %10.0f rows/s' % (label, len(rows), duration, len(rows) / duration))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = [('name %d' % i, i * 0.5, '2024-01-01 12:00:00.123456') for i in range(count)]
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS %s' % TABLE)
+        cursor.execute(
+            'CREATE TABLE %s (id integer AUTO_INCREMENT PRIMARY KEY, name varchar(100), '
+            'amount double, created datetime(6))' % TABLE
+        )
+    connection.set_autocommit(False)
+    try:
+        run('per row', lambda cursor, query, args: cursor.cursor.cursor.executemany(query, args), rows)
+        run('multi-row', lambda cursor, query, args: cursor.executemany(query, args), rows)
+    finally:
+        connection.set_autocommit(True)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE %s' % TABLE)
+
+
+if __name__ == '__main__':
+    main()
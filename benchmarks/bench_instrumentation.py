@@ -0,0 +1,62 @@
+"""
+Per-query cost of OPTIONS['instrumentation']: the same queries run with the
+option off, on without sinks, and on with a HistogramSink and a
+CallbackSink.
+
+Runs against the 'default' database of test_cymysql.py, or of the settings
+module in DJANGO_SETTINGS_MODULE:
+
+    $ python benchmarks/bench_instrumentation.py [queries]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_cymysql')
+
+import django  # NOQA: E402
+
+django.setup()
+
+from django.db import connections  # NOQA: E402
+
+from mysql_cymysql import instrumentation  # NOQA: E402
+
+
+def run(label, instrumented, count, baseline=None):
+    connection = connections['default'].copy()
+    connection.settings_dict['OPTIONS']['instrumentation'] = instrumented
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            start = time.perf_counter()
+            for i in range(count):
+                cursor.execute('SELECT %s', [i])
+                cursor.fetchall()
+            duration = time.perf_counter() - start
+    finally:
+        connection.close()
+    per_query = duration / count * 1e6
+    extra = '' if baseline is None else ' %+8.2fus' % (per_query - baseline)
+    print('%-24s %10.2fus/query%s' % (label, per_query, extra))
+    return per_query
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    baseline = run('disabled', False, count)
+    run('enabled, no sinks', True, count, baseline)
+    histograms = instrumentation.HistogramSink()
+    callback = instrumentation.CallbackSink(on_query=lambda event: None)
+    instrumentation.add_sink(histograms)
+    instrumentation.add_sink(callback)
+    try:
+        run('enabled, two sinks', True, count, baseline)
+    finally:
+        instrumentation.remove_sink(histograms)
+        instrumentation.remove_sink(callback)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+asyncio connections for async views.
+
+The synchronous backend is @async_unsafe, so async views would otherwise run
+every query through sync_to_async(). This module runs queries on CyMySQL's
+asyncio protocol implementation (cymysql.aio) instead, with the connection
+parameters, conversions and error mapping of the alias' DatabaseWrapper:
+
+    from mysql_cymysql.aio import get_async_pool
+
+    async def view(request):
+        async with get_async_pool().connection() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.aexecute('SELECT id, name FROM app_item WHERE kind = %s', [kind])
+                async for row in cursor:
+                    ...
+
+These connections aren't used by the ORM; queries are plain SQL.
+"""
+import asyncio
+import enum
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import cymysql as Database
+import cymysql.aio
+from cymysql.converters import escape_item
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, Error, IntegrityError, connections
+from django.db.utils import DatabaseErrorWrapper
+
+from .base import CursorWrapper
+from .pool import COM_RESET_CONNECTION, BasePool
+
+
+class AsyncCursorWrapper:
+    """
+    The asyncio counterpart of base.CursorWrapper. Driver exceptions are
+    reraised as Django's database exceptions.
+    """
+    codes_for_integrityerror = CursorWrapper.codes_for_integrityerror
+
+    def __init__(self, cursor, db):
+        self.cursor = cursor
+        self.db = db
+
+    async def aexecute(self, query, args=None):
+        if args:
+            args = [a.value if isinstance(a, enum.Enum) else a for a in args]
+        with self.db.wrap_database_errors:
+            try:
+                # args is None means no string interpolation
+                return await self.cursor.execute(query, args)
+            except Database.OperationalError as e:
+                if e.args[0] in self.codes_for_integrityerror:
+                    raise IntegrityError(*tuple(e.args))
+                raise
+
+    async def aexecutemany(self, query, args):
+        if args:
+            args = [
+                [a.value if isinstance(a, enum.Enum) else a for a in row]
+                if isinstance(row, (list, tuple)) else row
+                for row in args
+            ]
+        with self.db.wrap_database_errors:
+            try:
+                return await self.cursor.executemany(query, args)
+            except Database.OperationalError as e:
+                if e.args[0] in self.codes_for_integrityerror:
+                    raise IntegrityError(*tuple(e.args))
+                raise
+
+    async def afetchone(self):
+        with self.db.wrap_database_errors:
+            return await self.cursor.fetchone()
+
+    async def afetchmany(self, size=None):
+        with self.db.wrap_database_errors:
+            return await self.cursor.fetchmany(size)
+
+    async def afetchall(self):
+        with self.db.wrap_database_errors:
+            return await self.cursor.fetchall()
+
+    async def aclose(self):
+        await self.cursor.close()
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        row = await self.afetchone()
+        if row is None:
+            raise StopAsyncIteration
+        return row
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
+class AsyncDatabaseConnection:
+    """An asyncio connection of an alias, see connect()."""
+    # DatabaseErrorWrapper maps the driver's exceptions from this module.
+    Database = Database
+
+    def __init__(self, connection, alias):
+        self.connection = connection
+        self.alias = alias
+        # Set by DatabaseErrorWrapper when a query fails for other reasons
+        # than bad data; the pool doesn't reuse such connections.
+        self.errors_occurred = False
+
+    @property
+    def wrap_database_errors(self):
+        return DatabaseErrorWrapper(self)
+
+    def cursor(self):
+        return AsyncCursorWrapper(self.connection.cursor(), self)
+
+    async def acommit(self):
+        with self.wrap_database_errors:
+            await self.connection.commit()
+
+    async def arollback(self):
+        with self.wrap_database_errors:
+            await self.connection.rollback()
+
+    async def aset_autocommit(self, autocommit):
+        with self.wrap_database_errors:
+            await self.connection.autocommit(autocommit)
+
+    async def aclose(self):
+        with self.wrap_database_errors:
+            await self.connection.close()
+
+    async def areset_session(self):
+        """
+        Reset the session with COM_RESET_CONNECTION, like
+        pool.reset_session(), and apply the connection's character set
+        again. The setup of connect() is left to the caller.
+        """
+        with self.wrap_database_errors:
+            await self.connection._execute_command(COM_RESET_CONNECTION, b'')
+            await self.connection.read_packet()
+            await self.connection.set_charset(self.connection.charset)
+
+    def is_usable(self):
+        return self.connection._is_connect() and not self.errors_occurred
+
+
+def _connection_settings(alias):
+    """
+    Return the connection parameters of an alias and the statements that
+    initialize a new connection.
+    """
+    wrapper = connections[alias]
+    if wrapper.connection_params is None:
+        # get_connection_params() sets up the alias' slow query log,
+        # replicas, result cache, ...: call it on a wrapper of its own.
+        wrapper = type(wrapper)(wrapper.settings_dict, alias)
+        wrapper.connection_params = wrapper.get_connection_params()
+    conn_params = dict(wrapper.connection_params)
+    # cymysql.aio doesn't await the sql_mode and init_command statements,
+    # so they are run here.
+    sql_mode = conn_params.pop('sql_mode', None)
+    init_command = conn_params.pop('init_command', None)
+    # Asyncio connections don't use the compressed protocol.
+    conn_params.pop('compression', None)
+    setup = []
+    if sql_mode is not None:
+        setup.append('SET sql_mode=%s' % escape_item(sql_mode, 'utf-8'))
+    if init_command:
+        setup.append(init_command)
+    # Like DatabaseWrapper.session_state, without reading the server data
+    # synchronously: disabling SQL_AUTO_IS_NULL is harmless when it's off.
+    setup.append('SET SQL_AUTO_IS_NULL = 0')
+    if wrapper.isolation_level:
+        setup.append('SET SESSION TRANSACTION ISOLATION LEVEL %s' % wrapper.isolation_level.upper())
+    return conn_params, setup, wrapper.settings_dict['AUTOCOMMIT'], wrapper.pool_options
+
+
+async def _connect(alias, conn_params, setup, autocommit):
+    db = AsyncDatabaseConnection(None, alias)
+    with db.wrap_database_errors:
+        db.connection = await cymysql.aio.connect(**conn_params)
+    await _set_up(db, setup, autocommit)
+    return db
+
+
+async def _set_up(db, setup, autocommit):
+    cursor = db.cursor()
+    # One statement at a time, see DatabaseWrapper.init_connection_state().
+    for statement in setup:
+        await cursor.aexecute(statement)
+    await cursor.aclose()
+    await db.aset_autocommit(autocommit)
+
+
+async def connect(alias=DEFAULT_DB_ALIAS):
+    """Open an AsyncDatabaseConnection with the settings of an alias."""
+    conn_params, setup, autocommit, _ = _connection_settings(alias)
+    return await _connect(alias, conn_params, setup, autocommit)
+
+
+class AsyncConnectionPool(BasePool):
+    """
+    A bounded LIFO pool of asyncio connections, configured like the
+    synchronous pool (see pool.BasePool) with OPTIONS['pool'].
+
+    A pool belongs to the event loop it was created in.
+    """
+    def __init__(self, alias=DEFAULT_DB_ALIAS, **options):
+        super().__init__(**options)
+        self.alias = alias
+        self.conn_params, self.setup, self.autocommit, _ = _connection_settings(alias)
+        self._cond = asyncio.Condition()
+
+    def _is_usable(self, db):
+        return db.is_usable()
+
+    async def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        stale = []
+        try:
+            async with self._cond:
+                while True:
+                    now = time.monotonic()
+                    db = self._pop_idle(now, stale)
+                    if db is not None:
+                        return db
+                    if self._reserve():
+                        break
+                    remaining = deadline - now
+                    try:
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        raise self._exhausted()
+        finally:
+            await _close_quietly(stale)
+        try:
+            db = await _connect(self.alias, self.conn_params, self.setup, self.autocommit)
+        except BaseException:
+            async with self._cond:
+                self._forget(None)
+            raise
+        async with self._cond:
+            self._added(db)
+        try:
+            self._check_reset(db.connection)
+        except ImproperlyConfigured:
+            await self.discard(db)
+            raise
+        return db
+
+    async def release(self, db):
+        """
+        Take a connection back. Its session is reset and set up again like
+        that of a new connection, see AsyncDatabaseConnection.areset_session();
+        broken or expired connections are closed instead of being reused.
+        """
+        try:
+            if db.is_usable():
+                await db.areset_session()
+                await _set_up(db, self.setup, self.autocommit)
+                reusable = True
+            else:
+                reusable = False
+        except (Database.Error, Error):
+            reusable = False
+        async with self._cond:
+            if self._check_in(db, reusable):
+                return
+        await _close_quietly([db])
+
+    async def discard(self, db):
+        """Close a checked out connection without returning it to the pool."""
+        async with self._cond:
+            self._forget(db)
+        await _close_quietly([db])
+
+    async def close(self):
+        """Close all idle connections."""
+        async with self._cond:
+            idle = self._take_idle()
+        await _close_quietly(idle)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection for the duration of the block."""
+        db = await self.acquire()
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+
+async def _close_quietly(dbs):
+    for db in dbs:
+        try:
+            await db.connection.close()
+        except (Database.Error, OSError):
+            pass
+
+
+# Pools per event loop and alias.
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(alias=DEFAULT_DB_ALIAS):
+    """
+    Return the pool of the running event loop for an alias, configured with
+    OPTIONS['pool'] of the alias.
+    """
+    loop = asyncio.get_running_loop()
+    pools = _pools.setdefault(loop, {})
+    pool = pools.get(alias)
+    if pool is None:
+        options = _connection_settings(alias)[3] or {}
+        pool = pools[alias] = AsyncConnectionPool(alias, **options)
+    return pool
@@ -4,45 +4,61 @@ MySQL database backend for Django.
 Requires CyMySQL: https://github.com/nakagami/CyMySQL
 """
 import enum
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.exceptions import ImproperlyConfigured
 from django.db import IntegrityError
-from django.db.backends import utils as backend_utils
 from django.db.backends.base.base import BaseDatabaseWrapper
 from django.utils.asyncio import async_unsafe
 from django.utils.functional import cached_property
 from django.utils.regex_helper import _lazy_re_compile
 
 import cymysql as Database
-from cymysql.converters import decoders, escape_string
-from cymysql.constants import FIELD_TYPE, CLIENT
+from cymysql.converters import escape_item, escape_string
+from cymysql.constants import CLIENT
 
 # Some of these import MySQLdb, so import them after checking if it's installed.
 from django.db.backends.mysql.client import DatabaseClient                          # isort:skip
-from django.db.backends.mysql.creation import DatabaseCreation                      # isort:skip
+from . import columnar                                      # isort:skip
+from . import compression                                   # isort:skip
+from .compression import get_compression                    # isort:skip
+from .creation import DatabaseCreation                      # isort:skip
+from .cursors import ColumnarCursor, PreparedCursor, StreamingCursor  # isort:skip
+from .decoders import django_conversions                    # isort:skip
 from .features import DatabaseFeatures                      # isort:skip
+from . import instrumentation                               # isort:skip
 from .introspection import DatabaseIntrospection            # isort:skip
 from .operations import DatabaseOperations                  # isort:skip
-from .schema import DatabaseSchemaEditor                    # isort:skip
+from .pool import get_pool                                  # isort:skip
+from . import replicas                                      # isort:skip
+from .replicas import ReplicaSet                            # isort:skip
+from .resultcache import get_result_cache                   # isort:skip
+from .server import schema_versions, server_data_cache, server_key  # isort:skip
+from .slowlog import SlowQueryLog                           # isort:skip
+from . import statements                                    # isort:skip
+from .statements import StatementCache, preparable_re       # isort:skip
+from .schema import DatabaseSchemaEditor, OnlineDDL         # isort:skip
 from django.db.backends.mysql.validation import DatabaseValidation                  # isort:skip
 
-# MySQLdb returns TIME columns as timedelta -- they are more like timedelta in
-# terms of actual behavior as they are signed and include days -- and Django
-# expects time.
-def typecast_time(v):
-    if isinstance(v, bytes):
-        v = v.decode('ascii')
-    return backend_utils.typecast_time(v)
-
-django_conversions = decoders.copy()
-django_conversions.update({
-    FIELD_TYPE.TIME: typecast_time,
-})
-
 # This should match the numerical portion of the version numbers (we can treat
 # versions like 5.0.24 and 5.0.24a as the same).
 server_version_re = _lazy_re_compile(r'(\d{1,2})\.(\d{1,2})\.(\d{1,2})')
 
+# An INSERT/REPLACE with a single VALUES row, which executemany() can rewrite
+# into multi-row statements.
+insert_values_re = _lazy_re_compile(
+    r'\s*((?:INSERT|REPLACE)\b.+\bVALUES?\s*)'
+    r'(\(\s*%s\s*(?:,\s*%s\s*)*\))'
+    r'(\s*(?:ON\s+DUPLICATE\b.*)?);?\s*\Z',
+    re.IGNORECASE | re.DOTALL,
+)
+# Statements that change the schema.
+ddl_re = _lazy_re_compile(r'\s*(?:CREATE|ALTER|DROP|RENAME|TRUNCATE)\b', re.IGNORECASE)
+
 
 class CursorWrapper:
     """
@@ -59,27 +75,95 @@ class CursorWrapper:
         4025,  # CHECK constraint failed
     )
 
-    def __init__(self, cursor):
+    def __init__(self, cursor, db=None):
         self.cursor = cursor
+        self.db = db
+        # With read replicas, self.cursor is switched between this cursor
+        # and a cursor on the replica connection, see _route().
+        self.primary_cursor = cursor
+        self._replica = None
+
+    def _check_stream(self):
+        stream = self.db.open_stream
+        if stream is not None and stream is not self:
+            raise Database.ProgrammingError(
+                "Can't execute a query while a server-side cursor is streaming "
+                "results on the same connection. Exhaust or close the "
+                "iterator first."
+            )
+
+    # Whether results may be served from the result cache.
+    cacheable = True
 
     def execute(self, query, args=None):
+        if self.db is not None and self.db.result_cache is not None:
+            return self.db.result_cache.execute(self, query, args)
+        return self._execute(query, args)
+
+    def _execute(self, query, args=None):
+        if self.db is not None and self.db.open_stream is not None:
+            self._check_stream()
         if args:
             args = [a.value if isinstance(a, enum.Enum) else a for a in args]
-        try:
-            # args is None means no string interpolation
-            return self.cursor.execute(query, args)
-        except Database.OperationalError as e:
-            # Map some error codes to IntegrityError, since they seem to be
-            # misclassified and Django would prefer the more logical place.
-            if e.args[0] in self.codes_for_integrityerror:
-                raise IntegrityError(*tuple(e.args))
-            raise
+        if self.db is not None and self.db.replicas is not None:
+            self.cursor = self._route(query)
+            if self.cursor is not self.primary_cursor:
+                try:
+                    return self._run(self.cursor.execute, query, args)
+                except Database.OperationalError as e:
+                    if e.args[0] not in replicas.connection_error_codes:
+                        raise
+                    # Fail over to the primary.
+                    self.db.replica_failed()
+                    self.cursor = self.primary_cursor
+        # args is None means no string interpolation
+        return self._run(self.cursor.execute, query, args)
+
+    def _route(self, query):
+        connection = self.db.replica_for(query)
+        if connection is None:
+            return self.primary_cursor
+        if self._replica is None or self._replica[0] is not connection:
+            self._replica = (connection, connection.cursor(type(self.primary_cursor)))
+        return self._replica[1]
 
     def executemany(self, query, args):
+        if self.db is not None and self.db.open_stream is not None:
+            self._check_stream()
+        if self.db is not None:
+            # Rather than a replica's cursor or a cached result.
+            self.cursor = self.primary_cursor
+            if self.db.replicas is not None:
+                self.db.read_primary = True
+        if args and self.db is not None:
+            match = insert_values_re.match(query)
+            if match:
+                return self._executemany_insert(match, args)
         if args:
             args = [a.value if isinstance(a, enum.Enum) else a for a in args]
+        if self.db is not None and self.db.result_cache is not None:
+            try:
+                return self._run(self.cursor.executemany, query, args, many=True)
+            finally:
+                self.db.result_cache.wrote(self.db, query)
+        return self._run(self.cursor.executemany, query, args, many=True)
+
+    def _run(self, method, query, args, many=False):
+        if self.db is None:
+            return self._call(method, query, args)
+        if self.db.pending_savepoints:
+            self.db.create_pending_savepoints()
         try:
-            return self.cursor.executemany(query, args)
+            if self.db.instrumented or self.db.slow_query_log is not None:
+                return self._run_observed(method, query, args, many)
+            return self._call(method, query, args)
+        finally:
+            if ddl_re.match(query):
+                self.db.schema_changed()
+
+    def _call(self, method, query, args):
+        try:
+            return method(query, args)
         except Database.OperationalError as e:
             # Map some error codes to IntegrityError, since they seem to be
             # misclassified and Django would prefer the more logical place.
@@ -87,6 +171,96 @@ class CursorWrapper:
                 raise IntegrityError(*tuple(e.args))
             raise
 
+    def _run_observed(self, method, query, args, many):
+        # Report the query to the instrumentation sinks and the slow query
+        # log.
+        db = self.db
+        if db.instrumented:
+            counter = instrumentation.count_bytes(db.connection)
+            sent, received = counter.bytes_sent, counter.bytes_received
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = self._call(method, query, args)
+            failed = False
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            if db.instrumented:
+                instrumentation.record_query(instrumentation.QueryEvent(
+                    db.alias, query, many, duration, self._rows(),
+                    counter.bytes_sent - sent, counter.bytes_received - received,
+                    failed,
+                ))
+            slow_query_log = db.slow_query_log
+            if slow_query_log is not None and not failed and duration >= slow_query_log.threshold:
+                slow_query_log.log(db, self.cursor, query, args, duration)
+
+    def _rows(self):
+        # The driver's rowcount is -1 for result sets; count the rows read
+        # (unless they are still on the socket).
+        rowcount = self.cursor.rowcount
+        if rowcount == -1:
+            result = getattr(self.cursor, '_result', None)
+            if result is not None and result.rest_rows is not None:
+                return len(result.rest_rows)
+            return None
+        return rowcount
+
+    def _executemany_insert(self, match, args):
+        """
+        Run an INSERT executemany() as multi-row INSERT statements, each one
+        filling up to max_allowed_packet, and set rowcount to the rows of
+        all the statements.
+        """
+        prefix, values, suffix = match.groups()
+        max_size = self.db.ops.max_statement_size() - len(prefix.encode()) - len(suffix.encode())
+        rowcount = 0
+        batch, batch_size = [], 0
+        for row in args:
+            row = values % tuple(
+                escape_item(a.value if isinstance(a, enum.Enum) else a, 'utf-8')
+                for a in row
+            )
+            row_size = len(row.encode()) + 1
+            if batch and batch_size + row_size > max_size:
+                self.execute(prefix + ','.join(batch) + suffix)
+                rowcount += self.cursor.rowcount
+                batch, batch_size = [], 0
+            batch.append(row)
+            batch_size += row_size
+        if batch:
+            self.execute(prefix + ','.join(batch) + suffix)
+            rowcount += self.cursor.rowcount
+        # Like the driver's executemany().
+        self.cursor._result = None
+        self.cursor._rowcount = rowcount
+        return rowcount
+
+    def execute_columns(self, query, args=None, use_numpy=None):
+        """
+        Run a query and return its result set as a list of columns, in
+        select order (see columnar.py). use_numpy defaults to whether NumPy
+        is installed. The query runs on the primary server and bypasses the
+        result cache.
+        """
+        if self.db is not None and self.db.open_stream is not None:
+            self._check_stream()
+        if args:
+            args = [a.value if isinstance(a, enum.Enum) else a for a in args]
+        self.cursor = self.primary_cursor.connection.cursor(ColumnarCursor)
+        try:
+            self._run(self.cursor.execute, query, args)
+            columns = self.cursor.fetchcolumns()
+            # rowcount reports the rows read, like the driver's cursors.
+            self.primary_cursor._result = None
+            self.primary_cursor._rowcount = self.cursor.rowcount
+        finally:
+            self.cursor = self.primary_cursor
+        if use_numpy is None:
+            use_numpy = columnar.numpy is not None
+        return columnar.as_numpy(columns) if use_numpy else columns
+
     def __getattr__(self, attr):
         return getattr(self.cursor, attr)
 
@@ -94,6 +268,109 @@ class CursorWrapper:
         return iter(self.cursor)
 
 
+class StreamingCursorWrapper(CursorWrapper):
+    """
+    A CursorWrapper around an unbuffered cursor, used for QuerySet.iterator().
+
+    Rows are read from the socket as they are fetched, so the connection
+    can't be used for anything else until the result set is exhausted or the
+    cursor is closed (which discards the unread rows).
+    """
+    drain_size = 1000
+    cacheable = False
+
+    def execute(self, query, args=None):
+        self._drain()
+        result = super().execute(query, args)
+        self.db.open_stream = self
+        return result
+
+    def executemany(self, query, args):
+        self._drain()
+        return super().executemany(query, args)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany(size or self.cursor.arraysize)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _finish(self):
+        if self.db.open_stream is self:
+            self.db.open_stream = None
+
+    def _drain(self):
+        if self.db.open_stream is self:
+            try:
+                while self.cursor.fetchmany(self.drain_size):
+                    pass
+            finally:
+                self._finish()
+
+    def close(self):
+        try:
+            self._drain()
+        finally:
+            self.cursor.close()
+
+
+class PreparedCursorWrapper(CursorWrapper):
+    """
+    A CursorWrapper that runs parameterized statements as server-side
+    prepared statements, cached per connection (see statements.py).
+    """
+    def _execute(self, query, args=None):
+        if (
+            not isinstance(args, (list, tuple)) or not preparable_re.match(query) or
+            # Reads on replicas use the text protocol.
+            (self.db.replicas is not None and self._route(query) is not self.primary_cursor)
+        ):
+            return super()._execute(query, args)
+        self.cursor = self.primary_cursor
+        if self.db.open_stream is not None:
+            self._check_stream()
+        conn = self.cursor.connection
+        cache = self.db.statement_cache
+        if cache.schema_version != self.db.schema_version:
+            # The schema changed since the statements were prepared.
+            self.db.clear_statement_cache()
+        found, statement = cache.get(query)
+        if not found:
+            try:
+                statement = self.cursor.prepare(query)
+            except Database.DatabaseError as e:
+                # execute() reports genuine errors. Only remember statements
+                # the server will never prepare; others (e.g. on a table
+                # that doesn't exist yet) are tried again next time.
+                statement = None
+                if e.args[0] not in statements.unpreparable_codes:
+                    return super()._execute(query, args)
+            evicted = cache.add(query, statement)
+            if evicted is not None:
+                statements.close(conn, evicted)
+        if statement is None:
+            return super()._execute(query, args)
+        args = [a.value if isinstance(a, enum.Enum) else a for a in args]
+        return self._run(
+            lambda query, args: self.cursor.execute_prepared(query, args, statement),
+            query, args,
+        )
+
+
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'mysql'
     # This dictionary maps Field objects to their associated MySQL column
@@ -190,6 +467,37 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     introspection_class = DatabaseIntrospection
     ops_class = DatabaseOperations
     validation_class = DatabaseValidation
+    # The ConnectionPool the current connection was checked out from.
+    pool = None
+    # Number of round trips init_connection_state() spent on session setup.
+    session_setup_queries = 0
+    # The StreamingCursorWrapper with unread rows on this connection, if any.
+    open_stream = None
+    # Whether queries are reported to instrumentation.sinks.
+    instrumented = False
+    # The SlowQueryLog of OPTIONS['slow_query_log'], if any.
+    slow_query_log = None
+    # The ReplicaSet of OPTIONS['replicas'], if any, the connection to the
+    # replica in use and its ReplicaState.
+    replicas = None
+    replica_connection = None
+    replica_state = None
+    # Set by writes so that the following reads of the request see them.
+    read_primary = False
+    # The ResultCache of OPTIONS['result_cache'], if any, and the tables
+    # written by the current transaction (None for any table).
+    result_cache = None
+    result_cache_dirty = frozenset()
+    # The Compression of OPTIONS['compression'], if any.
+    compression = None
+    # The OnlineDDL of OPTIONS['online_ddl'], if any, see schema.py.
+    online_ddl = None
+    # Savepoints created by atomic blocks that no statement has run in yet,
+    # outermost first, see _savepoint().
+    pending_savepoints = ()
+    # The parameters of the current connection, for opening another one
+    # without calling get_connection_params() again.
+    connection_params = None
 
     def get_connection_params(self):
         kwargs = {
@@ -214,6 +522,9 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         kwargs['client_flag'] = CLIENT.FOUND_ROWS
         # Validate the transaction isolation level, if specified.
         options = settings_dict['OPTIONS'].copy()
+        if options.pop('local_infile', False):
+            # Announce LOAD DATA LOCAL INFILE support, see bulk.load_rows().
+            kwargs['client_flag'] |= CLIENT.LOCAL_FILES
         isolation_level = options.pop('isolation_level', 'read committed')
         if isolation_level:
             isolation_level = isolation_level.lower()
@@ -225,43 +536,272 @@ class DatabaseWrapper(BaseDatabaseWrapper):
                         ', '.join("'%s'" % s for s in sorted(self.isolation_levels))
                     ))
         self.isolation_level = isolation_level
+        # Connection pooling is opt-in: OPTIONS = {'pool': True} or a dict of
+        # ConnectionPool options.
+        pool_options = options.pop('pool', None)
+        if pool_options is True:
+            pool_options = {}
+        elif pool_options is False:
+            pool_options = None
+        self.pool_options = pool_options
+        options.pop('server_data_ttl', None)
+        # Stream QuerySet.iterator() results with an unbuffered cursor.
+        options.pop('server_side_cursors', None)
+        # See check_constraints().
+        options.pop('constraint_check_workers', None)
+        options.pop('constraint_check_chunk_size', None)
+        # See DatabaseCreation._clone_db().
+        options.pop('clone_workers', None)
+        # Report queries to the instrumentation sinks.
+        self.instrumented = bool(options.pop('instrumentation', False))
+        # Log slow statements with their plan, see slowlog.py.
+        slow_query_log = options.pop('slow_query_log', None)
+        if slow_query_log is True:
+            slow_query_log = {}
+        elif slow_query_log is False:
+            slow_query_log = None
+        self.slow_query_log = None if slow_query_log is None else SlowQueryLog(**slow_query_log)
+        # Send reads outside transactions to replicas, see replicas.py.
+        replica_options = options.pop('replicas', None)
+        if isinstance(replica_options, (list, tuple)):
+            replica_options = {'hosts': replica_options}
+        self.replicas = ReplicaSet(**replica_options) if replica_options else None
+        # Cache the results of reads, see resultcache.py.
+        result_cache_options = options.pop('result_cache', None)
+        if result_cache_options is True:
+            result_cache_options = {}
+        elif result_cache_options is False:
+            result_cache_options = None
+        self.result_cache = None if result_cache_options is None else get_result_cache(
+            server_key(settings_dict), result_cache_options,
+        )
+        # Answer introspection from one schema-wide snapshot, see
+        # DatabaseIntrospection.schema_snapshot().
+        options.pop('bulk_introspection', None)
+        # Server-side prepared statements: OPTIONS = {'prepared_statements':
+        # True} or the maximum number of statements cached per connection.
+        prepared_statements = options.pop('prepared_statements', None)
+        if prepared_statements is True:
+            prepared_statements = StatementCache().max_size
+        self.prepared_statements = prepared_statements or None
+        # Use the compressed protocol, see compression.py.
+        compression_options = options.pop('compression', None)
+        if compression_options is True:
+            compression_options = {}
+        elif compression_options is False:
+            compression_options = None
+        elif isinstance(compression_options, str):
+            compression_options = {'algorithm': compression_options}
+        self.compression = None if compression_options is None else get_compression(
+            server_key(settings_dict), compression_options,
+        )
+        if self.compression is not None:
+            kwargs['compression'] = self.compression
+        # Run schema changes without blocking writes, see schema.py.
+        online_ddl = options.pop('online_ddl', None)
+        if online_ddl is True:
+            online_ddl = {}
+        elif online_ddl is False:
+            online_ddl = None
+        self.online_ddl = None if online_ddl is None else OnlineDDL(**online_ddl)
         kwargs.update(options)
+        if self.replicas is not None:
+            self.replicas.primary_params = dict(kwargs)
         return kwargs
 
     @async_unsafe
     def get_new_connection(self, conn_params):
-        return Database.connect(**conn_params)
+        start = time.perf_counter()
+        self.connection_params = conn_params
+        if self.pool_options is not None:
+            self.pool = get_pool(conn_params, self.pool_options, self.isolation_level)
+            connection = self.pool.acquire()
+        else:
+            self.pool = None
+            connection = compression.connect(**conn_params)
+        if self.instrumented:
+            instrumentation.record_connection_wait(self.alias, time.perf_counter() - start)
+            instrumentation.count_bytes(connection)
+        return connection
+
+    def _close(self):
+        self.open_stream = None
+        self.pending_savepoints = ()
+        self._close_replica()
+        self.introspection.invalidate_snapshot()
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
+            return
+        super()._close()
 
     def init_connection_state(self):
-        assignments = []
+        # The assignments are remembered on the physical connection, so a
+        # connection handed out again by the pool doesn't repeat them.
+        session_state = self.session_state
+        if getattr(self.connection, '_django_session_state', None) == session_state:
+            return
+        if session_state:
+            # CyMySQL doesn't read the results of multiple statements when
+            # the first one returns no rows, so they are sent one at a time.
+            with self.cursor() as cursor:
+                for assignment in session_state:
+                    cursor.execute(assignment)
+                    self.session_setup_queries += 1
+        self.connection._django_session_state = session_state
+
+    def replica_for(self, query):
+        """
+        Return the replica connection to run a read on, or None to run the
+        query on the primary. Reads run on a replica outside transactions
+        and until the first write of the request.
+        """
+        if replicas.write_re.match(query):
+            self.read_primary = True
+            return None
+        if (
+            self.read_primary or self.in_atomic_block or not self.autocommit or
+            not replicas.read_re.match(query) or replicas.primary_read_re.search(query)
+        ):
+            return None
+        if self.replica_connection is not None:
+            if self.replicas.is_healthy(self.replica_state, self.replica_connection):
+                return self.replica_connection
+            self._close_replica()
+        for state in self.replicas.candidates():
+            try:
+                connection = compression.connect(**self.replicas.conn_params(state, self.replicas.primary_params))
+                connection.autocommit(True)
+                cursor = connection.cursor()
+                for assignment in self.session_state:
+                    cursor.execute(assignment)
+            except Database.Error:
+                self.replicas.mark_down(state)
+                continue
+            self.replicas.acquire(state)
+            self.replica_connection, self.replica_state = connection, state
+            if self.replicas.is_healthy(state, connection):
+                return connection
+            self._close_replica()
+        return None
+
+    def replica_failed(self):
+        """Skip the replica in use after it failed."""
+        self.replicas.mark_down(self.replica_state)
+        self._close_replica()
+
+    def _close_replica(self):
+        if self.replica_connection is None:
+            return
+        connection, state = self.replica_connection, self.replica_state
+        self.replica_connection = self.replica_state = None
+        self.replicas.release(state)
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def close_if_unusable_or_obsolete(self):
+        # Called at the start and end of each request.
+        self.read_primary = False
+        super().close_if_unusable_or_obsolete()
+
+    @property
+    def session_state(self):
+        assignments = ()
         if self.features.is_sql_auto_is_null_enabled:
             # SQL_AUTO_IS_NULL controls whether an AUTO_INCREMENT column on
             # a recently inserted row will return when the field is tested
             # for NULL. Disabling this brings this aspect of MySQL in line
             # with SQL standards.
-            assignments.append('SET SQL_AUTO_IS_NULL = 0')
-
+            assignments += ('SET SQL_AUTO_IS_NULL = 0',)
         if self.isolation_level:
-            assignments.append('SET SESSION TRANSACTION ISOLATION LEVEL %s' % self.isolation_level.upper())
-
-        if assignments:
-            with self.cursor() as cursor:
-                cursor.execute('; '.join(assignments))
+            assignments += ('SET SESSION TRANSACTION ISOLATION LEVEL %s' % self.isolation_level.upper(),)
+        return assignments
 
     @async_unsafe
     def create_cursor(self, name=None):
+        if name is not None:
+            return StreamingCursorWrapper(self.connection.cursor(StreamingCursor), self)
+        if self.prepared_statements:
+            return PreparedCursorWrapper(self.connection.cursor(PreparedCursor), self)
         cursor = self.connection.cursor()
-        return CursorWrapper(cursor)
+        return CursorWrapper(cursor, self)
+
+    @property
+    def statement_cache(self):
+        """
+        The StatementCache of the current connection. Its stats() report
+        hits, misses and evictions.
+        """
+        cache = getattr(self.connection, '_django_statement_cache', None)
+        if cache is None:
+            cache = self.connection._django_statement_cache = StatementCache(self.prepared_statements)
+            cache.schema_version = self.schema_version
+        return cache
+
+    def clear_statement_cache(self):
+        """Close the prepared statements of the current connection."""
+        if self.connection is None or not self.prepared_statements:
+            return
+        cache = self.statement_cache
+        cache.schema_version = self.schema_version
+        with self.wrap_database_errors:
+            for statement in cache.clear():
+                statements.close(self.connection, statement)
+
+    @property
+    def schema_version(self):
+        return schema_versions.get(server_key(self.settings_dict))
+
+    def schema_changed(self):
+        """
+        Record that the schema of the database changed. Every connection to
+        it drops its prepared statements and introspection snapshot before
+        using them again.
+        """
+        schema_versions.bump(server_key(self.settings_dict))
+
+    def chunked_cursor(self):
+        if self.settings_dict['OPTIONS'].get('server_side_cursors'):
+            return self._cursor(name='stream')
+        return super().chunked_cursor()
+
+    def _commit(self):
+        self.pending_savepoints = ()
+        result = super()._commit()
+        self._invalidate_written_tables()
+        return result
 
     def _rollback(self):
+        self.pending_savepoints = ()
+        self.result_cache_dirty = frozenset()
         try:
             BaseDatabaseWrapper._rollback(self)
         except Database.NotSupportedError:
             pass
 
     def _set_autocommit(self, autocommit):
-        with self.wrap_database_errors:
-            self.connection.autocommit(autocommit)
+        self.pending_savepoints = ()
+        # The autocommit mode is remembered on the physical connection, so
+        # that a pooled connection handed out again isn't switched to the
+        # mode it's already in. It's unknown if switching fails.
+        if getattr(self.connection, '_django_autocommit', None) is not autocommit:
+            self.connection._django_autocommit = None
+            with self.wrap_database_errors:
+                self.connection.autocommit(autocommit)
+            self.connection._django_autocommit = autocommit
+        if autocommit:
+            # Turning autocommit on commits the transaction.
+            self._invalidate_written_tables()
+
+    def _invalidate_written_tables(self):
+        # Entries cached by other connections while the transaction ran may
+        # hold the data it changed.
+        dirty = self.result_cache_dirty
+        if dirty and self.result_cache is not None:
+            self.result_cache_dirty = frozenset()
+            self.result_cache.invalidate(None if None in dirty else dirty)
 
     def disable_constraint_checking(self):
         """
@@ -269,8 +809,7 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         forward references. Always return True to indicate constraint checks
         need to be re-enabled.
         """
-        with self.cursor() as cursor:
-            cursor.execute('SET foreign_key_checks=0')
+        self._set_foreign_key_checks(False)
         return True
 
     def enable_constraint_checking(self):
@@ -281,11 +820,52 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         # nested inside transaction.atomic.
         self.needs_rollback, needs_rollback = False, self.needs_rollback
         try:
-            with self.cursor() as cursor:
-                cursor.execute('SET foreign_key_checks=1')
+            self._set_foreign_key_checks(True)
         finally:
             self.needs_rollback = needs_rollback
 
+    def _set_foreign_key_checks(self, enabled):
+        # Remembered on the physical connection like the autocommit mode.
+        self.ensure_connection()
+        if getattr(self.connection, '_django_foreign_key_checks', None) is enabled:
+            return
+        self.connection._django_foreign_key_checks = None
+        with self.cursor() as cursor:
+            cursor.execute('SET foreign_key_checks=%d' % enabled)
+        self.connection._django_foreign_key_checks = enabled
+
+    def _savepoint(self, sid):
+        # Savepoints are created when the first statement runs inside them,
+        # so that atomic blocks that run none cost no round trips.
+        self.pending_savepoints += (sid,)
+
+    def create_pending_savepoints(self):
+        """Create the savepoints that were deferred by _savepoint()."""
+        cursor = self.connection.cursor()
+        try:
+            while self.pending_savepoints:
+                cursor.execute(self.ops.savepoint_create_sql(self.pending_savepoints[0]))
+                self.pending_savepoints = self.pending_savepoints[1:]
+        finally:
+            cursor.close()
+
+    def _savepoint_commit(self, sid):
+        if sid in self.pending_savepoints:
+            # Neither sid nor the savepoints nested in it were created.
+            self.pending_savepoints = self.pending_savepoints[:self.pending_savepoints.index(sid)]
+            return
+        # The pending savepoints are nested in sid.
+        self.pending_savepoints = ()
+        super()._savepoint_commit(sid)
+
+    def _savepoint_rollback(self, sid):
+        if sid in self.pending_savepoints:
+            # Nothing ran since sid; it stays pending.
+            self.pending_savepoints = self.pending_savepoints[:self.pending_savepoints.index(sid) + 1]
+            return
+        self.pending_savepoints = ()
+        super()._savepoint_rollback(sid)
+
     def check_constraints(self, table_names=None):
         """
         Check each table name in `table_names` for rows with invalid foreign
@@ -293,38 +873,127 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         `disable_constraint_checking()` and `enable_constraint_checking()`, to
         determine if rows with invalid references were entered while constraint
         checks were off.
+
+        Each foreign key is checked until its first invalid row. With
+        OPTIONS['constraint_check_workers'] > 1 the foreign keys are checked
+        on that many extra connections, unless a transaction is open whose
+        rows they couldn't see. With OPTIONS['constraint_check_chunk_size']
+        tables with an integer primary key are scanned in ranges of that many
+        primary key values.
         """
+        options = self.settings_dict['OPTIONS']
+        workers = options.get('constraint_check_workers') or 1
+        chunk_size = options.get('constraint_check_chunk_size')
         with self.cursor() as cursor:
             if table_names is None:
                 table_names = self.introspection.table_names(cursor)
+            checks = []
             for table_name in table_names:
                 primary_key_column_name = self.introspection.get_primary_key_column(cursor, table_name)
                 if not primary_key_column_name:
                     continue
                 key_columns = self.introspection.get_key_columns(cursor, table_name)
                 for column_name, referenced_table_name, referenced_column_name in key_columns:
-                    cursor.execute(
-                        """
-                        SELECT REFERRING.`%s`, REFERRING.`%s` FROM `%s` as REFERRING
-                        LEFT JOIN `%s` as REFERRED
-                        ON (REFERRING.`%s` = REFERRED.`%s`)
-                        WHERE REFERRING.`%s` IS NOT NULL AND REFERRED.`%s` IS NULL
-                        """ % (
-                            primary_key_column_name, column_name, table_name,
-                            referenced_table_name, column_name, referenced_column_name,
-                            column_name, referenced_column_name,
-                        )
-                    )
-                    for bad_row in cursor.fetchall():
-                        raise IntegrityError(
-                            "The row in table '%s' with primary key '%s' has an invalid "
-                            "foreign key: %s.%s contains a value '%s' that does not "
-                            "have a corresponding value in %s.%s."
-                            % (
-                                table_name, bad_row[0], table_name, column_name,
-                                bad_row[1], referenced_table_name, referenced_column_name,
-                            )
-                        )
+                    checks.append((
+                        table_name, primary_key_column_name, column_name,
+                        referenced_table_name, referenced_column_name,
+                    ))
+            if workers > 1 and len(checks) > 1 and self.get_autocommit() and not self.in_atomic_block:
+                violation = self._check_foreign_keys_in_parallel(checks, workers, chunk_size)
+            else:
+                violation = None
+                for check in checks:
+                    bad_row = self._find_invalid_reference(cursor, check, chunk_size)
+                    if bad_row is not None:
+                        violation = (check, bad_row)
+                        break
+        if violation is not None:
+            (table_name, _, column_name, referenced_table_name, referenced_column_name), bad_row = violation
+            raise IntegrityError(
+                "The row in table '%s' with primary key '%s' has an invalid "
+                "foreign key: %s.%s contains a value '%s' that does not "
+                "have a corresponding value in %s.%s."
+                % (
+                    table_name, bad_row[0], table_name, column_name,
+                    bad_row[1], referenced_table_name, referenced_column_name,
+                )
+            )
+
+    def _find_invalid_reference(self, cursor, check, chunk_size=None):
+        """
+        Return the primary key and value of the first row whose foreign key
+        doesn't reference an existing row, or None.
+        """
+        table_name, primary_key_column_name, column_name, referenced_table_name, referenced_column_name = check
+        ranges = [None]
+        if chunk_size:
+            cursor.execute("SELECT MIN(`%s`), MAX(`%s`) FROM `%s`" % (
+                primary_key_column_name, primary_key_column_name, table_name,
+            ))
+            low, high = cursor.fetchone()
+            if isinstance(low, int) and isinstance(high, int) and high - low >= chunk_size:
+                ranges = [(start, start + chunk_size) for start in range(low, high + 1, chunk_size)]
+        for bounds in ranges:
+            in_range = ''
+            if bounds is not None:
+                in_range = ' AND REFERRING.`%s` >= %d AND REFERRING.`%s` < %d' % (
+                    primary_key_column_name, bounds[0], primary_key_column_name, bounds[1],
+                )
+            cursor.execute(
+                """
+                SELECT REFERRING.`%s`, REFERRING.`%s` FROM `%s` as REFERRING
+                LEFT JOIN `%s` as REFERRED
+                ON (REFERRING.`%s` = REFERRED.`%s`)
+                WHERE REFERRING.`%s` IS NOT NULL AND REFERRED.`%s` IS NULL%s
+                LIMIT 1
+                """ % (
+                    primary_key_column_name, column_name, table_name,
+                    referenced_table_name, column_name, referenced_column_name,
+                    column_name, referenced_column_name, in_range,
+                )
+            )
+            bad_row = cursor.fetchone()
+            if bad_row is not None:
+                return bad_row
+        return None
+
+    def _check_foreign_keys_in_parallel(self, checks, workers, chunk_size):
+        """
+        Run _find_invalid_reference() for each check on worker connections
+        and return the (check, bad_row) that a sequential run would find.
+        """
+        pending = queue.SimpleQueue()
+        for index, check in enumerate(checks):
+            pending.put((index, check))
+        found = {}
+        stop = threading.Event()
+
+        def worker():
+            connection = self.copy()
+            try:
+                with connection.cursor() as cursor:
+                    while not stop.is_set():
+                        try:
+                            index, check = pending.get_nowait()
+                        except queue.Empty:
+                            return
+                        bad_row = connection._find_invalid_reference(cursor, check, chunk_size)
+                        if bad_row is not None:
+                            found[index] = (check, bad_row)
+                            stop.set()
+            except Exception:
+                stop.set()
+                raise
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(checks))) as executor:
+            futures = [executor.submit(worker) for _ in range(min(workers, len(checks)))]
+        for future in futures:
+            future.result()
+        # Checks are taken in order and a worker finishes its current check
+        # before stopping, so every check before the first violation ran.
+        return found[min(found)] if found else None
 
     def is_usable(self):
         return self.connection._is_connect()
@@ -348,8 +1017,24 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             return check_constraints
         return {}
 
-    @cached_property
+    @property
     def mysql_server_data(self):
+        ttl = self.settings_dict['OPTIONS'].get('server_data_ttl', 300)
+        # No query can run while a server-side cursor streams results: the
+        # expired data is served until a later access reloads it.
+        return server_data_cache.get(
+            server_key(self.settings_dict), self._load_mysql_server_data, ttl,
+            stale_ok=self.open_stream is not None,
+        )
+
+    def _load_mysql_server_data(self):
+        if self.open_stream is not None:
+            # Nothing to serve meanwhile: read it on a connection of its own.
+            connection = self.copy()
+            try:
+                return connection._load_mysql_server_data()
+            finally:
+                connection.close()
         with self.temporary_connection() as cursor:
             # Select some server variables and test if the time zone
             # definitions are installed. CONVERT_TZ returns NULL if 'UTC'
@@ -360,7 +1045,8 @@ class DatabaseWrapper(BaseDatabaseWrapper):
                        @@default_storage_engine,
                        @@sql_auto_is_null,
                        @@lower_case_table_names,
-                       CONVERT_TZ('2001-01-01 01:00:00', 'UTC', 'UTC') IS NOT NULL
+                       CONVERT_TZ('2001-01-01 01:00:00', 'UTC', 'UTC') IS NOT NULL,
+                       @@max_allowed_packet
             """)
             row = cursor.fetchone()
         return {
@@ -370,26 +1056,32 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             'sql_auto_is_null': bool(row[3]),
             'lower_case_table_names': bool(row[4]),
             'has_zoneinfo_database': bool(row[5]),
+            'max_allowed_packet': int(row[6]),
         }
 
-    @cached_property
+    def refresh_server_data(self):
+        """
+        Discard the cached server data, e.g. after a server upgrade or a
+        change of the global sql_mode.
+        """
+        server_data_cache.refresh(server_key(self.settings_dict))
+
+    @property
     def mysql_server_info(self):
         return self.mysql_server_data['version']
 
-    @cached_property
+    @property
     def mysql_version(self):
         match = server_version_re.match(self.mysql_server_info)
         if not match:
             raise Exception('Unable to determine MySQL version from version string %r' % self.mysql_server_info)
         return tuple(int(x) for x in match.groups())
 
-    @cached_property
+    @property
     def mysql_is_mariadb(self):
         return 'mariadb' in self.mysql_server_info.lower()
 
-    @cached_property
+    @property
     def sql_mode(self):
-        with self.cursor() as cursor:
-            cursor.execute('SELECT @@sql_mode')
-            sql_mode = cursor.fetchone()
-        return set(sql_mode[0].split(',') if sql_mode else ())
+        sql_mode = self.mysql_server_data['sql_mode']
+        return set(sql_mode.split(',') if sql_mode else ())
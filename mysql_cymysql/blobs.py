@@ -0,0 +1,208 @@
+"""
+Chunked access to large BinaryField and TextField values.
+
+open_blob() returns a file object that reads a column of one row in chunks,
+each one fetched with SUBSTRING(), so that a value is never held in memory
+as a whole. write_blob() replaces such a value with the content of a file
+object, sent chunk by chunk:
+
+    from mysql_cymysql.blobs import open_blob, write_blob
+
+    attachment = Attachment.objects.create(name='report.pdf', data=b'')
+    with open('report.pdf', 'rb') as f:
+        write_blob(attachment, 'data', f)
+
+    with open_blob(attachment, 'data') as blob:
+        shutil.copyfileobj(blob, response)
+
+Binary fields are read as bytes, text fields as str (decoded from utf8mb4).
+Each chunk is a separate query: wrap reads in transaction.atomic() to read a
+consistent value while it may be rewritten.
+
+write_blob() appends the chunks to a user variable with CONCAT() and writes
+the value with a single UPDATE, so that readers never see a partial value
+and the row is rewritten once. The server doesn't build strings longer than
+max_allowed_packet: larger values raise DataError.
+"""
+import io
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DataError, connections, router, transaction
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Character sets whose values are their utf8mb4 encoding.
+utf8_charsets = {'utf8mb4', 'utf8mb3', 'utf8', 'ascii'}
+
+# The user variable write_blob() builds the value in.
+_variable = '@mysql_cymysql_blob'
+
+
+class BlobReader(io.RawIOBase):
+    """
+    A seekable raw binary file over the value of a column in the row whose
+    pk_column is pk. size is None when the value is NULL.
+    """
+
+    def __init__(self, connection, table, column, pk_column, pk, chunk_size=DEFAULT_CHUNK_SIZE, text=False):
+        super().__init__()
+        quote_name = connection.ops.quote_name
+        value = quote_name(column)
+        where = 'FROM %s WHERE %s = %%s' % (quote_name(table), quote_name(pk_column))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT LENGTH(%s), CHARSET(%s) %s' % (value, value, where), [pk])
+            row = cursor.fetchone()
+            if row is None:
+                raise ObjectDoesNotExist('No row of %s has %s = %r.' % (table, pk_column, pk))
+            self.size, charset = row
+            if text and self.size is not None and charset not in utf8_charsets:
+                # Each read converts the whole value: only done for columns
+                # in other character sets.
+                value = 'CONVERT(%s USING utf8mb4)' % value
+                cursor.execute('SELECT LENGTH(%s) %s' % (value, where), [pk])
+                self.size = cursor.fetchone()[0]
+        if text:
+            # Read the bytes of text values, which SUBSTRING() would
+            # otherwise count in characters.
+            value = 'CAST(%s AS BINARY)' % value
+        self._select = 'SELECT SUBSTRING(%s, %%s, %%s) %s' % (value, where)
+        self.connection = connection
+        self.pk = pk
+        self.chunk_size = chunk_size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size or 0
+        if offset < 0:
+            raise ValueError('Negative seek position %d' % offset)
+        self._position = offset
+        return offset
+
+    def readinto(self, b):
+        size = min(len(b), self.chunk_size, (self.size or 0) - self._position)
+        if size <= 0:
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(self._select, [self._position + 1, size, self.pk])
+            row = cursor.fetchone()
+        data = row[0] if row is not None and row[0] is not None else b''
+        memoryview(b)[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def readall(self):
+        # RawIOBase.readall() would read in DEFAULT_BUFFER_SIZE chunks.
+        chunks = []
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+
+def _blob_location(obj, field_name, using):
+    field = obj._meta.get_field(field_name)
+    text = field.get_internal_type() != 'BinaryField'
+    return connections[using], obj._meta.db_table, field.column, obj._meta.pk.column, text
+
+
+def open_blob(obj, field_name, using=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a file object that reads field_name of a saved model instance in
+    chunks of chunk_size bytes: a buffered binary file for BinaryField, a
+    text file for text fields.
+    """
+    using = using or obj._state.db or router.db_for_read(type(obj), instance=obj)
+    connection, table, column, pk_column, text = _blob_location(obj, field_name, using)
+    try:
+        reader = BlobReader(connection, table, column, pk_column, obj.pk, chunk_size, text)
+    except ObjectDoesNotExist:
+        raise type(obj).DoesNotExist('%s matching pk %r does not exist.' % (type(obj).__name__, obj.pk))
+    buffered = io.BufferedReader(reader, buffer_size=chunk_size)
+    if text:
+        return io.TextIOWrapper(buffered, encoding='utf-8')
+    return buffered
+
+
+def _read_chunk(stream, size, text):
+    """
+    Return what stream reads up to size bytes (of the utf-8 encoding of a
+    text file, on a character boundary), and its size in bytes.
+    """
+    if not text:
+        data = stream.read(size)
+        return data, len(data)
+    parts = []
+    length = 0
+    while length < size:
+        # A character takes up to four bytes.
+        part = stream.read(max((size - length) // 4, 1))
+        if not part:
+            break
+        parts.append(part)
+        length += len(part.encode('utf-8'))
+    return ''.join(parts), length
+
+
+def write_blob(obj, field_name, stream, using=None, chunk_size=None):
+    """
+    Replace the value of field_name of a saved model instance with what
+    stream, a binary file (a text file for text fields), reads and return
+    its length in bytes (of its utf-8 encoding for text fields).
+
+    Each statement sends up to chunk_size bytes, by default and at most as
+    many as fit in a packet. Values larger than max_allowed_packet raise
+    DataError and leave the field unchanged.
+    """
+    using = using or obj._state.db or router.db_for_write(type(obj), instance=obj)
+    connection, table, column, pk_column, text = _blob_location(obj, field_name, using)
+    quote_name = connection.ops.quote_name
+    column, where = quote_name(column), 'WHERE %s = %%s' % quote_name(pk_column)
+    table = quote_name(table)
+    # Escaping at most doubles the size of a value.
+    limit = connection.ops.max_statement_size() // 2
+    chunk_size = min(chunk_size or limit, limit)
+    max_size = connection.mysql_server_data['max_allowed_packet']
+    length = 0
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM %s %s FOR UPDATE' % (table, where), [obj.pk])
+        if cursor.fetchone() is None:
+            raise type(obj).DoesNotExist('%s matching pk %r does not exist.' % (type(obj).__name__, obj.pk))
+        try:
+            chunk, size = _read_chunk(stream, chunk_size, text)
+            cursor.execute('SET %s = %%s' % _variable, [chunk])
+            while size:
+                length += size
+                if length > max_size:
+                    # CONCAT() would return NULL.
+                    raise DataError(
+                        'The value of %s.%s is larger than max_allowed_packet (%d bytes).' % (
+                            type(obj).__name__, field_name, max_size,
+                        )
+                    )
+                chunk, size = _read_chunk(stream, chunk_size, text)
+                if size:
+                    cursor.execute('SET %s = CONCAT(%s, %%s)' % (_variable, _variable), [chunk])
+            cursor.execute('UPDATE %s SET %s = %s %s' % (table, column, _variable, where), [obj.pk])
+            # Catch values the server truncated or set to NULL.
+            length_function = 'CHAR_LENGTH' if text else 'LENGTH'
+            cursor.execute('SELECT %s(%s) = %s(%s) FROM %s %s' % (
+                length_function, column, length_function, _variable, table, where,
+            ), [obj.pk])
+            if not cursor.fetchone()[0]:
+                raise DataError('The value of %s.%s was not stored whole.' % (type(obj).__name__, field_name))
+        finally:
+            cursor.execute('SET %s = NULL' % _variable)
+    return length
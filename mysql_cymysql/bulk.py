@@ -0,0 +1,280 @@
+"""
+Bulk loading with LOAD DATA LOCAL INFILE.
+
+CyMySQL doesn't handle LOCAL INFILE requests, so load_rows() runs the
+exchange itself: it sends the LOAD DATA statement and answers the server's
+file request with rows encoded as they are consumed from the iterable. No
+temporary file is written and at most buffer_size bytes of encoded rows are
+held in memory.
+
+The server must allow local_infile and the connection must announce LOCAL
+INFILE support with OPTIONS = {'local_infile': True}.
+
+Usage:
+
+    from mysql_cymysql.bulk import load_rows
+    result = load_rows(connection, Event, rows, columns=['ts', 'kind', 'payload'])
+    result.rows, result.warnings
+
+Rows that were sent before an error are loaded unless the call is wrapped in
+transaction.atomic().
+
+upsert() and bulk_update() write model instances with as few statements as
+fit in a packet: an INSERT ... ON DUPLICATE KEY UPDATE, and an
+UPDATE joined on the new values rather than bulk_update()'s CASE WHEN
+expressions:
+
+    from mysql_cymysql.bulk import bulk_update, upsert
+
+    result = upsert(connection, Price, prices, update_fields=['amount'])
+    result.rows, result.updated
+    bulk_update(connection, Price, prices, ['amount', 'updated_at'])
+"""
+import enum
+import struct
+from collections import namedtuple
+
+from cymysql.constants import COMMAND
+from cymysql.converters import escape_item
+from cymysql.packet import MysqlPacket
+
+from django.db import NotSupportedError, transaction
+
+LoadResult = namedtuple('LoadResult', 'rows warnings')
+# rows is the number of objects written, updated the number of existing rows
+# whose values changed.
+UpsertResult = namedtuple('UpsertResult', 'rows updated')
+
+# The largest payload of a single protocol packet.
+MAX_PACKET_SIZE = 0xffffff
+
+# Bytes that must be escaped inside an enclosed LOAD DATA field.
+_bytes_escapes = {
+    ord('\\'): b'\\\\',
+    ord("'"): b"\\'",
+    ord('\n'): b'\\n',
+    ord('\r'): b'\\r',
+    ord('\0'): b'\\0',
+    0x1a: b'\\Z',
+}
+
+
+def _escape_bytes(value):
+    escaped = bytearray(b"'")
+    for byte in value:
+        escaped += _bytes_escapes.get(byte) or bytes((byte,))
+    escaped += b"'"
+    return bytes(escaped)
+
+
+def encode_row(row, encoding='utf-8'):
+    """
+    Encode a row as a LOAD DATA line. Fields use the same quoting as SQL
+    literals (FIELDS OPTIONALLY ENCLOSED BY "'" ESCAPED BY '\\'), and an
+    unquoted NULL is read as NULL.
+    """
+    return b','.join(
+        _escape_bytes(value) if isinstance(value, (bytes, bytearray, memoryview)) else
+        escape_item(value, encoding).encode(encoding)
+        for value in row
+    ) + b'\n'
+
+
+def load_rows(connection, model_or_table, rows, columns=None, buffer_size=65536):
+    """
+    Load rows into a table with LOAD DATA LOCAL INFILE and return a
+    LoadResult of the affected rows and warnings.
+
+    model_or_table is a model or a table name. For a model, columns defaults
+    to the columns of its concrete fields and rows may be model instances.
+    """
+    if isinstance(model_or_table, str):
+        table = model_or_table
+        if columns is None:
+            raise ValueError('columns are required when loading into a table name.')
+    else:
+        opts = model_or_table._meta
+        table = opts.db_table
+        if columns is None:
+            fields = [f for f in opts.concrete_fields if f.column]
+        else:
+            by_column = {f.column: f for f in opts.concrete_fields}
+            fields = [by_column[column] for column in columns]
+        columns = [f.column for f in fields]
+        rows = _model_rows(connection, model_or_table, fields, rows)
+
+    connection.ensure_connection()
+    # The server reads the file in character_set_database unless told
+    # otherwise. encode_row() encodes in the connection's encoding, which is
+    # Python's UTF-8, i.e. utf8mb4, for utf8.
+    charset = connection.connection.charset
+    if charset in ('utf8', 'utf8mb3'):
+        charset = 'utf8mb4'
+    quote_name = connection.ops.quote_name
+    sql = (
+        "LOAD DATA LOCAL INFILE 'rows' INTO TABLE %s CHARACTER SET %s "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\\'' ESCAPED BY '\\\\' "
+        "LINES TERMINATED BY '\\n' (%s)" % (
+            quote_name(table), charset, ', '.join(quote_name(c) for c in columns),
+        )
+    )
+    buffer_size = min(buffer_size, MAX_PACKET_SIZE)
+    if connection.replicas is not None:
+        # Like CursorWrapper.executemany(): the following reads of the
+        # request see the rows.
+        connection.read_primary = True
+    try:
+        with connection.wrap_database_errors:
+            if connection.pending_savepoints:
+                connection.create_pending_savepoints()
+            return _load(connection.connection, sql, rows, buffer_size)
+    finally:
+        if connection.result_cache is not None:
+            connection.result_cache.wrote(connection, sql)
+
+
+def _model_rows(connection, model, fields, rows):
+    for row in rows:
+        if isinstance(row, model):
+            # Like bulk_create(), e.g. for auto_now fields.
+            row = [f.get_db_prep_save(f.pre_save(row, True), connection) for f in fields]
+        yield row
+
+
+def _load(conn, sql, rows, buffer_size):
+    if conn.compress:
+        raise NotSupportedError('load_rows() is not supported on compressed connections.')
+    # Like Cursor.execute(), read what's left of the previous result.
+    last_cursor = getattr(conn, '_last_execute_cursor', None)
+    if last_cursor is not None and last_cursor() is not None:
+        last_cursor()._flush()
+    conn._execute_command(COMMAND.COM_QUERY, sql)
+    # MysqlPacket raises the server's error, e.g. if local_infile is off.
+    packet = MysqlPacket(conn.socket.recv_packet(), conn.charset, conn.encoding)
+    if packet.get_all_data()[:1] != b'\xfb':
+        raise NotSupportedError(
+            "The server didn't request the rows of LOAD DATA LOCAL INFILE."
+        )
+    # The server's file request had sequence number 1.
+    sequence = 2
+    error = None
+    buffer = bytearray()
+    try:
+        for row in rows:
+            buffer += encode_row(row, conn.encoding)
+            while len(buffer) >= buffer_size:
+                _send_packet(conn, bytes(buffer[:buffer_size]), sequence)
+                sequence += 1
+                del buffer[:buffer_size]
+    except Exception as e:
+        # Finish the exchange so that the connection stays usable.
+        error = e
+    if buffer:
+        _send_packet(conn, bytes(buffer), sequence)
+        sequence += 1
+    _send_packet(conn, b'', sequence)
+    packet = MysqlPacket(conn.socket.recv_packet(), conn.charset, conn.encoding)
+    affected_rows, insert_id, server_status, warning_count, message = packet.read_ok_packet()
+    if error is not None:
+        raise error
+    return LoadResult(affected_rows, warning_count)
+
+
+def _send_packet(conn, payload, sequence):
+    conn.socket.send_packet(
+        struct.pack('<I', len(payload))[:3] + bytes((sequence & 0xff,)) + payload
+    )
+
+
+def _literals(connection, fields, obj, add=False):
+    values = []
+    for field in fields:
+        value = field.pre_save(obj, add) if add else getattr(obj, field.attname)
+        value = field.get_db_prep_save(value, connection)
+        if isinstance(value, enum.Enum):
+            value = value.value
+        values.append(escape_item(value, 'utf-8'))
+    return values
+
+
+def _batches(connection, rows, row_size, overhead):
+    """
+    Split rows into lists of rows that fit in a statement (see
+    DatabaseOperations.max_statement_size()), given the size of a row and of
+    the rest of the statement.
+    """
+    max_size = connection.ops.max_statement_size() - overhead
+    batch, batch_size = [], 0
+    for row in rows:
+        size = row_size(row)
+        if batch and batch_size + size > max_size:
+            yield batch
+            batch, batch_size = [], 0
+        batch.append(row)
+        batch_size += size
+    if batch:
+        yield batch
+
+
+def upsert(connection, model, objs, update_fields=()):
+    """
+    Insert objs, updating update_fields of the rows whose primary or unique
+    key already exists, and return an UpsertResult. The primary keys of the
+    inserted rows aren't set on objs.
+    """
+    opts = model._meta
+    ops = connection.ops
+    update_columns = [opts.get_field(name).column for name in update_fields]
+    # Like bulk_create(), objects without a primary key leave it to the
+    # database.
+    with_pk = [obj for obj in objs if obj.pk is not None]
+    without_pk = [obj for obj in objs if obj.pk is None]
+    rows = updated = 0
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        with connection.cursor() as cursor:
+            for group, fields in (
+                (with_pk, opts.concrete_fields),
+                (without_pk, [f for f in opts.concrete_fields if f is not opts.auto_field]),
+            ):
+                if not group:
+                    continue
+                columns = [f.column for f in fields]
+                values = ('(%s)' % ','.join(_literals(connection, fields, obj, add=True)) for obj in group)
+                overhead = len(ops.upsert_sql(opts.db_table, columns, update_columns, ['()']).encode())
+                for batch in _batches(connection, values, lambda row: len(row.encode()) + 2, overhead):
+                    cursor.execute(ops.upsert_sql(opts.db_table, columns, update_columns, batch))
+                    # With CLIENT.FOUND_ROWS, each row counts 1 if it's
+                    # inserted or left unchanged, 2 if it's updated.
+                    rows += len(batch)
+                    updated += cursor.rowcount - len(batch)
+    return UpsertResult(rows, updated)
+
+
+def bulk_update(connection, model, objs, fields):
+    """
+    Update fields of objs, which must have a primary key, and return the
+    number of rows matched, like QuerySet.bulk_update().
+    """
+    if not objs:
+        return 0
+    opts = model._meta
+    ops = connection.ops
+    fields = [opts.get_field(name) for name in fields]
+    if any(obj.pk is None for obj in objs):
+        raise ValueError('All bulk_update() objects must have a primary key set.')
+    columns = [f.column for f in fields]
+    pk = opts.pk
+    rows = (_literals(connection, [pk] + fields, obj) for obj in objs)
+    overhead = len(ops.bulk_update_sql(opts.db_table, pk.column, columns, [['NULL'] * (len(fields) + 1)]).encode())
+
+    def row_size(row):
+        # ' UNION ALL SELECT ' and the separators.
+        return 18 + sum(len(value.encode()) + 2 for value in row)
+
+    matched = 0
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        with connection.cursor() as cursor:
+            for batch in _batches(connection, rows, row_size, overhead):
+                cursor.execute(ops.bulk_update_sql(opts.db_table, pk.column, columns, batch))
+                matched += cursor.rowcount
+    return matched
@@ -0,0 +1,110 @@
+"""
+Columnar results.
+
+CursorWrapper.execute_columns() reads a result set into one buffer per
+column instead of a list of row tuples: an array.array for integer and
+floating point columns (a NumPy array when NumPy is installed), a list for
+the others and for numeric columns that contain NULLs. Each row is added to
+the buffers as its packet is decoded, so the rows are never held as tuples.
+
+    from mysql_cymysql.columnar import values_columns
+
+    columns = values_columns(Payment.objects.filter(...), 'ts', 'amount')
+    columns['amount'].sum()
+
+Values are the database values: Django's field converters aren't applied
+(booleans are 0 and 1, datetimes are naive).
+"""
+from array import array
+
+from cymysql.constants import FIELD_TYPE
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# array typecodes of the numeric column types. Column descriptions don't
+# tell whether a column is unsigned: a signed array is converted to the
+# unsigned typecode when a value overflows it.
+typecodes = {
+    FIELD_TYPE.TINY: 'b',
+    FIELD_TYPE.SHORT: 'h',
+    FIELD_TYPE.YEAR: 'h',
+    FIELD_TYPE.INT24: 'i',
+    FIELD_TYPE.LONG: 'i',
+    FIELD_TYPE.LONGLONG: 'q',
+    FIELD_TYPE.FLOAT: 'f',
+    FIELD_TYPE.DOUBLE: 'd',
+}
+
+
+class ColumnBuilder:
+    """Collects decoded rows into per-column buffers."""
+
+    def __init__(self, description):
+        self.columns = [
+            array(typecodes[column[1]]) if column[1] in typecodes else []
+            for column in description
+        ]
+        self._appends = [column.append for column in self.columns]
+        self.rows = 0
+
+    def add(self, row):
+        appends = self._appends
+        for i, value in enumerate(row):
+            try:
+                appends[i](value)
+            except (TypeError, OverflowError):
+                self._widen(i, value)
+        self.rows += 1
+
+    def _widen(self, i, value):
+        column = self.columns[i]
+        if value is not None and column.typecode in 'bhiq' and value >= 0 and min(column, default=0) >= 0:
+            column = array(column.typecode.upper(), column)
+            try:
+                column.append(value)
+            except OverflowError:
+                column = None
+        else:
+            column = None
+        if column is None:
+            # A NULL in a numeric column, or a value that doesn't fit: the
+            # column is kept as a list from now on.
+            column = list(self.columns[i])
+            column.append(value)
+        self.columns[i] = column
+        self._appends[i] = column.append
+
+
+def as_numpy(columns):
+    """Return columns with the arrays converted to NumPy arrays."""
+    return [
+        numpy.frombuffer(column, dtype=column.typecode) if isinstance(column, array) else column
+        for column in columns
+    ]
+
+
+def values_columns(queryset, *fields, use_numpy=None):
+    """
+    Return {field: column} for queryset.values_list(*fields), read with
+    CursorWrapper.execute_columns(). use_numpy defaults to whether NumPy is
+    installed.
+    """
+    queryset = queryset.values_list(*fields)
+    query = queryset.query
+    # The columns are selected in this order, see ValuesListIterable.
+    names = [*query.extra_select, *query.values_select, *query.annotation_select]
+    try:
+        sql, params = query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return {name: [] for name in (fields or names)}
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        columns = cursor.execute_columns(sql, params, use_numpy=use_numpy)
+    columns = dict(zip(names, columns))
+    return {name: columns[name] for name in (fields or names)}
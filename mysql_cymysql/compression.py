@@ -0,0 +1,235 @@
+"""
+Protocol compression.
+
+With OPTIONS['compression'], connections use the MySQL compressed protocol:
+
+    'OPTIONS': {
+        'compression': {
+            'algorithm': 'zstd',
+            'level': 3,
+            'min_size': 1024,
+        },
+    },
+
+'zlib' or 'zstd' is short for {'algorithm': ...}, and True for the
+defaults. Options:
+
+- algorithm: 'zlib', or 'zstd' (MySQL >= 8.0.18, requires pyzstd). zstd
+  falls back to zlib on servers that don't support it, and connections to
+  servers that don't support compression aren't compressed.
+- level: compression level of the packets sent, and for zstd of the packets
+  the server sends; None for the algorithm's default.
+- min_size: packets smaller than this many bytes are sent uncompressed.
+
+connection.compression.stats() reports the bytes sent and received before
+and after compression, for every connection of the process to the server.
+Compression costs CPU on both ends and pays off for large result sets and
+bulk inserts over slow or metered links, not on a local network.
+"""
+import threading
+import zlib
+
+import cymysql as Database
+from cymysql.connections import Connection
+from cymysql.constants import CLIENT
+from cymysql.socketwrapper import SocketWrapper
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import pyzstd
+except ImportError:
+    pyzstd = None
+
+# The largest payload of a compressed packet.
+MAX_PACKET_SIZE = 0xffffff
+
+
+class Compression:
+    defaults = {
+        'algorithm': 'zlib',
+        'level': None,
+        'min_size': 50,
+    }
+    algorithms = ('zlib', 'zstd')
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid compression option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+        if self.algorithm not in self.algorithms:
+            raise ImproperlyConfigured(
+                "Invalid compression algorithm '%s'. Use one of %s." % (self.algorithm, ', '.join(self.algorithms))
+            )
+        if self.algorithm == 'zstd' and pyzstd is None:
+            raise ImproperlyConfigured("zstd compression requires pyzstd.")
+        self._lock = threading.Lock()
+        self.bytes_sent = self.bytes_sent_compressed = 0
+        self.bytes_received = self.bytes_received_compressed = 0
+
+    def compress(self, algorithm, data):
+        if algorithm == 'zstd':
+            return pyzstd.compress(data, self.level or 0)
+        return zlib.compress(data, -1 if self.level is None else self.level)
+
+    def count(self, sent, sent_compressed, received, received_compressed):
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_sent_compressed += sent_compressed
+            self.bytes_received += received
+            self.bytes_received_compressed += received_compressed
+
+    def stats(self):
+        """
+        Return the payload bytes sent and received and what they took on the
+        wire, the bytes saved and the compressed to payload size ratio.
+        """
+        with self._lock:
+            payload = self.bytes_sent + self.bytes_received
+            wire = self.bytes_sent_compressed + self.bytes_received_compressed
+            return {
+                'bytes_sent': self.bytes_sent,
+                'bytes_sent_compressed': self.bytes_sent_compressed,
+                'bytes_received': self.bytes_received,
+                'bytes_received_compressed': self.bytes_received_compressed,
+                'bytes_saved': payload - wire,
+                'ratio': wire / payload if payload else None,
+            }
+
+
+def _int24(n):
+    return bytes((n & 0xff, (n >> 8) & 0xff, (n >> 16) & 0xff))
+
+
+class CompressedSocket(SocketWrapper):
+    """
+    Replaces cymysql's SocketWrapper on compressed connections: the
+    compressed packets are numbered in sequence, payloads larger than a
+    packet are split, and the packets smaller than min_size aren't
+    compressed.
+    """
+
+    def __init__(self, sock, algorithm, compression):
+        super().__init__(sock, algorithm)
+        self.algorithm = algorithm
+        self.compression = compression
+        self._buffer = bytearray()
+        self._sequence = 0
+
+    def _recv(self, size):
+        data = b''
+        while size:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                raise Database.OperationalError(2013, 'Lost connection to MySQL server during query')
+            data += chunk
+            size -= len(chunk)
+        return data
+
+    def _recv_decompressed(self, size):
+        while len(self._buffer) < size:
+            header = self._recv(7)
+            compressed_length = header[0] | header[1] << 8 | header[2] << 16
+            self._sequence = (header[3] + 1) & 0xff
+            length = header[4] | header[5] << 8 | header[6] << 16
+            data = self._recv(compressed_length)
+            if length:
+                if self.algorithm == 'zstd':
+                    data = pyzstd.decompress(data)
+                else:
+                    data = zlib.decompress(data)
+                if len(data) != length:
+                    raise Database.OperationalError(2027, 'Malformed compressed packet')
+            self._buffer += data
+            self.compression.count(0, 0, len(data), compressed_length + 7)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def recv_packet(self):
+        """Read an entire mysql packet and return its payload."""
+        data = b''
+        while True:
+            header = self._recv_decompressed(4)
+            length = header[0] | header[1] << 8 | header[2] << 16
+            data += self._recv_decompressed(length)
+            if length < MAX_PACKET_SIZE:
+                return data
+
+    def send_packet(self, data):
+        # A packet with sequence number 0 starts a new command, which
+        # restarts the compressed sequence too.
+        if len(data) > 3 and data[3] == 0:
+            self._sequence = 0
+        compression = self.compression
+        sent = 0
+        for start in range(0, max(len(data), 1), MAX_PACKET_SIZE):
+            chunk = data[start:start + MAX_PACKET_SIZE]
+            length = len(chunk)
+            if length >= compression.min_size:
+                compressed = compression.compress(self.algorithm, chunk)
+                if len(compressed) < length:
+                    chunk = compressed
+                else:
+                    length = 0
+            else:
+                length = 0
+            self._sock.sendall(_int24(len(chunk)) + bytes((self._sequence,)) + _int24(length) + chunk)
+            self._sequence = (self._sequence + 1) & 0xff
+            sent += len(chunk) + 7
+        compression.count(len(data), sent, 0, 0)
+
+
+class CompressedConnection(Connection):
+    """A cymysql Connection that uses a CompressedSocket."""
+
+    def __init__(self, compression, **kwargs):
+        kwargs['compression_algorithm'] = compression.algorithm
+        if compression.algorithm == 'zstd' and compression.level is not None:
+            kwargs['zstd_compression_level'] = compression.level
+        super().__init__(**kwargs)
+        self.compression = compression
+
+    def _connect(self):
+        super()._connect()
+        self.socket = CompressedSocket(self.socket._sock, self.compress, self.compression)
+
+    def _get_server_information(self):
+        super()._get_server_information()
+        if self.compress == 'zstd' and not self.server_capabilities & CLIENT.ZSTD_COMPRESSION_ALGORITHM:
+            # Negotiate zlib instead.
+            self.compress = self.socket.algorithm = 'zlib'
+            self.client_flag = (self.client_flag & ~CLIENT.ZSTD_COMPRESSION_ALGORITHM) | CLIENT.COMPRESS
+        if self.compress == 'zlib' and not self.server_capabilities & CLIENT.COMPRESS:
+            # Use the uncompressed protocol.
+            self.compress = ''
+            self.client_flag &= ~(CLIENT.COMPRESS | CLIENT.ZSTD_COMPRESSION_ALGORITHM)
+            self.socket = SocketWrapper(self.socket._sock, self.compress)
+
+
+def connect(compression=None, **kwargs):
+    """Database.connect(), compressed if compression is a Compression."""
+    if compression is None:
+        return Database.connect(**kwargs)
+    connection = CompressedConnection(compression, **kwargs)
+    connection._connect()
+    connection._initialize()
+    return connection
+
+
+_compressions = {}
+_compressions_lock = threading.Lock()
+
+
+def get_compression(key, options):
+    """Return the process-wide Compression of a server and options."""
+    key = (key, tuple(sorted(options.items())))
+    with _compressions_lock:
+        compression = _compressions.get(key)
+        if compression is None:
+            compression = _compressions[key] = Compression(**options)
+        return compression
@@ -0,0 +1,108 @@
+"""
+Test database creation.
+
+Test databases are cloned for parallel test runs (manage.py test --parallel)
+with SQL rather than with mysqldump: each table is created in the clone from
+its SHOW CREATE TABLE and filled with INSERT ... SELECT, several tables at a
+time over OPTIONS['clone_workers'] connections (4 by default). Views are
+created once the tables exist. Triggers, routines and events aren't copied.
+"""
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DatabaseError
+from django.db.backends.mysql import creation
+
+definer_re = re.compile(r'\s+DEFINER=\S+')
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _clone_db(self, source_database_name, target_database_name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = %s",
+                [source_database_name],
+            )
+            tables = cursor.fetchall()
+        base_tables = [name for name, table_type in tables if table_type == 'BASE TABLE']
+        views = [name for name, table_type in tables if table_type == 'VIEW']
+        workers = min(self.connection.settings_dict['OPTIONS'].get('clone_workers') or 4, len(base_tables))
+        pending = queue.SimpleQueue()
+        for table in base_tables:
+            pending.put(table)
+        stop = threading.Event()
+
+        def worker():
+            connection = self._clone_connection(target_database_name)
+            try:
+                # Tables are created and filled in any order.
+                connection.disable_constraint_checking()
+                with connection.cursor() as cursor:
+                    while not stop.is_set():
+                        try:
+                            table = pending.get_nowait()
+                        except queue.Empty:
+                            return
+                        self._clone_table(cursor, source_database_name, table)
+            except Exception:
+                stop.set()
+                raise
+            finally:
+                try:
+                    # The connection may go back to a pool.
+                    connection.enable_constraint_checking()
+                finally:
+                    connection.close()
+
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+        if views:
+            connection = self._clone_connection(target_database_name)
+            try:
+                with connection.cursor() as cursor:
+                    self._clone_views(cursor, source_database_name, target_database_name, views)
+            finally:
+                connection.close()
+
+    def _clone_connection(self, database_name):
+        """Return a new connection to database_name."""
+        connection = self.connection.copy()
+        connection.settings_dict['NAME'] = database_name
+        return connection
+
+    def _clone_table(self, cursor, source_database_name, table):
+        quote_name = self.connection.ops.quote_name
+        source_table = '%s.%s' % (quote_name(source_database_name), quote_name(table))
+        # Unlike CREATE TABLE ... LIKE, this keeps the foreign keys and the
+        # AUTO_INCREMENT counter.
+        cursor.execute('SHOW CREATE TABLE %s' % source_table)
+        cursor.execute(cursor.fetchone()[1])
+        cursor.execute('INSERT INTO %s SELECT * FROM %s' % (quote_name(table), source_table))
+
+    def _clone_views(self, cursor, source_database_name, target_database_name, views):
+        quote_name = self.connection.ops.quote_name
+        source, target = quote_name(source_database_name) + '.', quote_name(target_database_name) + '.'
+        pending = {}
+        for view in views:
+            cursor.execute('SHOW CREATE VIEW %s%s' % (source, quote_name(view)))
+            # Views refer to tables with the database name.
+            pending[view] = definer_re.sub('', cursor.fetchone()[1], count=1).replace(source, target)
+        # Views that select from other views need them to exist first.
+        while pending:
+            error = None
+            for view, sql in list(pending.items()):
+                try:
+                    cursor.execute(sql)
+                except DatabaseError as e:
+                    error = e
+                else:
+                    del pending[view]
+            if error is not None and len(pending) == len(views):
+                raise error
+            views = list(pending)
@@ -0,0 +1,107 @@
+"""
+Cursor classes for cymysql connections.
+"""
+import weakref
+
+from cymysql.constants import COMMAND
+from cymysql.cursors import Cursor
+from cymysql.result import MySQLResult
+
+from . import statements
+from .columnar import ColumnBuilder
+
+
+class UnbufferedResult(MySQLResult):
+    """
+    A MySQLResult that leaves the rows on the socket after reading the
+    column descriptions. MySQLResult.fetchone() then reads them one packet
+    at a time.
+    """
+    def read_result(self):
+        self.streaming = True
+        try:
+            super().read_result()
+        finally:
+            self.streaming = False
+
+    def read_rest_rowdata_packet(self):
+        # Called at the end of read_result() to buffer the rows, and by
+        # Cursor._flush() when another cursor runs a query on the connection.
+        if not self.streaming:
+            super().read_rest_rowdata_packet()
+
+
+class StreamingCursor(Cursor):
+    """A cursor that reads rows from the server as they are fetched."""
+
+    def _query(self, q):
+        conn = self._get_db()
+        self._last_executed = q
+        conn._execute_command(COMMAND.COM_QUERY, q)
+        conn._result = UnbufferedResult(conn)
+        conn._result.read_result()
+        self._do_get_result()
+
+
+class ColumnarResult(UnbufferedResult):
+    """
+    A MySQLResult that reads the rows into per-column buffers (see
+    columnar.py) rather than a list of rows.
+    """
+    columns = None
+
+    def read_result(self):
+        super().read_result()
+        if self.has_result:
+            builder = ColumnBuilder(self.description)
+            for row in iter(self.fetchone, None):
+                builder.add(row)
+            self.columns = builder.columns
+            # rowcount reports the rows read.
+            self.affected_rows = builder.rows
+
+
+class ColumnarCursor(Cursor):
+    """A cursor that reads result sets into per-column buffers."""
+
+    def _query(self, q):
+        conn = self._get_db()
+        self._last_executed = q
+        conn._execute_command(COMMAND.COM_QUERY, q)
+        conn._result = ColumnarResult(conn)
+        conn._result.read_result()
+        self._do_get_result()
+
+    def fetchcolumns(self):
+        """Return the columns of the last result set, [] if it had none."""
+        if self._result is None or self._result.columns is None:
+            return []
+        return self._result.columns
+
+
+class PreparedCursor(Cursor):
+    """A cursor that can run statements prepared on the server."""
+
+    def _flush_last_cursor(self, conn):
+        # Like Cursor.execute(), read what's left of the previous result.
+        last_cursor = getattr(conn, '_last_execute_cursor', None)
+        if last_cursor is not None and last_cursor() is not None:
+            last_cursor()._flush()
+
+    def prepare(self, query):
+        conn = self._get_db()
+        self._flush_last_cursor(conn)
+        return statements.prepare(conn, query)
+
+    def execute_prepared(self, query, args, statement):
+        conn = self._get_db()
+        self._flush_last_cursor(conn)
+        del self.messages[:]
+        self._rowcount = None
+        # The statement as the text protocol would have sent it, for
+        # DatabaseOperations.last_executed_query().
+        self._last_executed = query % tuple(conn.escape(arg) for arg in args)
+        conn._result = statements.execute(conn, statement, args)
+        self._do_get_result()
+        self._executed = query
+        conn._last_execute_cursor = weakref.ref(self)
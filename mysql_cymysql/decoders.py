@@ -0,0 +1,74 @@
+"""
+Result value decoders.
+
+cymysql's decoders split and reparse the text of each value. The server
+sends DATETIME, TIMESTAMP, DATE and TIME values in the ISO formats that
+datetime's fromisoformat() parses natively, so these decoders try that first
+and fall back to the generic decoders for anything else (zero dates,
+negative or out of range TIME values, fractional seconds the running Python
+doesn't parse).
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.backends import utils as backend_utils
+
+from cymysql.converters import convert_datetime, convert_mysql_timestamp, decoders
+from cymysql.constants import FIELD_TYPE
+
+_datetime_fromisoformat = datetime.datetime.fromisoformat
+_date_fromisoformat = datetime.date.fromisoformat
+_time_fromisoformat = datetime.time.fromisoformat
+
+
+def decode_datetime(value):
+    try:
+        return _datetime_fromisoformat(value.decode('ascii'))
+    except ValueError:
+        return convert_datetime(value)
+
+
+def decode_timestamp(value):
+    try:
+        return _datetime_fromisoformat(value.decode('ascii'))
+    except ValueError:
+        return convert_mysql_timestamp(value)
+
+
+def decode_date(value):
+    try:
+        return _date_fromisoformat(value.decode('ascii'))
+    except ValueError:
+        # Zero and partial dates.
+        return None
+
+
+# MySQLdb returns TIME columns as timedelta -- they are more like timedelta in
+# terms of actual behavior as they are signed and include days -- and Django
+# expects time.
+def typecast_time(v):
+    if isinstance(v, bytes):
+        v = v.decode('ascii')
+    return backend_utils.typecast_time(v)
+
+
+def decode_time(value):
+    try:
+        return _time_fromisoformat(value.decode('ascii'))
+    except ValueError:
+        return typecast_time(value)
+
+
+def decode_decimal(value):
+    return Decimal(value.decode('ascii'))
+
+
+django_conversions = decoders.copy()
+django_conversions.update({
+    FIELD_TYPE.DATETIME: decode_datetime,
+    FIELD_TYPE.TIMESTAMP: decode_timestamp,
+    FIELD_TYPE.DATE: decode_date,
+    FIELD_TYPE.TIME: decode_time,
+    FIELD_TYPE.DECIMAL: decode_decimal,
+    FIELD_TYPE.NEWDECIMAL: decode_decimal,
+})
@@ -4,13 +4,26 @@ from django.utils.functional import cached_property
 class DatabaseFeatures(BaseDatabaseFeatures):
     empty_fetchmany_value = []
     supports_paramstyle_pyformat = False
-    can_clone_databases = False
+    can_clone_databases = True
     test_collations = {
         'ci': 'utf8_general_ci',
         'non_default': None,
         'swedish_ci': None,
     }
 
+    @cached_property
+    def supports_insert_row_alias(self):
+        # INSERT ... VALUES (...) AS alias ON DUPLICATE KEY UPDATE col =
+        # alias.col; VALUES(col) is deprecated there.
+        return not self.connection.mysql_is_mariadb and self.connection.mysql_version >= (8, 0, 19)
+
+    @cached_property
+    def supports_instant_ddl(self):
+        # ALTER TABLE ... ALGORITHM=INSTANT.
+        if self.connection.mysql_is_mariadb:
+            return self.connection.mysql_version >= (10, 3, 2)
+        return self.connection.mysql_version >= (8, 0, 12)
+
     @cached_property
     def django_test_skips(self):
         skips = super().django_test_skips
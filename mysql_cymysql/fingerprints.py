@@ -0,0 +1,162 @@
+"""
+Statement fingerprints and N+1 detection.
+
+A fingerprint is a statement with its literals and placeholders replaced by
+'?' and its IN and VALUES lists collapsed, so that the queries an ORM call
+site runs with different values share one fingerprint. Within profile(),
+the queries of aliases with OPTIONS['instrumentation'] = True are aggregated
+per fingerprint:
+
+    from mysql_cymysql.fingerprints import profile
+
+    with profile() as query_profile:
+        render_the_page()
+    query_profile.stats()        # slowest fingerprints first
+    query_profile.n_plus_one()   # SELECTs repeated at least N times
+
+QueryProfileMiddleware profiles each request and logs likely N+1 patterns to
+the 'mysql_cymysql.fingerprints' logger.
+"""
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from . import instrumentation
+
+logger = logging.getLogger('mysql_cymysql.fingerprints')
+
+# Strings come first so that comment markers inside them are left alone.
+_literal_re = re.compile(
+    r"(?P<literal>'(?:[^'\\]|\\.|'')*'"     # strings
+    r'|"(?:[^"\\]|\\.|"")*"'
+    r"|\b[xX]'[0-9a-fA-F]*'"                # hexadecimal literals
+    r'|\b0x[0-9a-fA-F]+\b'
+    r'|(?<![\w.`])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b'
+    r'|%s|%\(\w+\)s)'                      # placeholders
+    r'|/\*.*?\*/|(?:--|#)[^\n]*',          # comments
+    re.DOTALL,
+)
+_in_list_re = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_row = r'\(\s*(?:\?|NULL|DEFAULT)(?:\s*,\s*(?:\?|NULL|DEFAULT))*\s*\)'
+_values_re = re.compile(r'\bVALUES\s*%s(?:\s*,\s*%s)*' % (_row, _row), re.IGNORECASE)
+_whitespace_re = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Return the fingerprint of a statement."""
+    sql = _literal_re.sub(lambda m: '?' if m.group('literal') else ' ', sql)
+    sql = _in_list_re.sub('IN (...)', sql)
+    sql = _values_re.sub('VALUES (...)', sql)
+    return _whitespace_re.sub(' ', sql).strip()
+
+
+class FingerprintStats:
+    __slots__ = ('count', 'total_time', 'max_time', 'rows')
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.rows = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class QueryProfile:
+    """
+    Aggregates per fingerprint. At most max_fingerprints fingerprints are
+    tracked; the queries of any others are counted under OTHER.
+    """
+    OTHER = '<other>'
+
+    def __init__(self, max_fingerprints=500, n_plus_one_threshold=10):
+        self.max_fingerprints = max_fingerprints
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.fingerprints = {}
+
+    def add(self, event):
+        key = fingerprint(event.sql)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                key = self.OTHER
+                stats = self.fingerprints.get(key)
+            if stats is None:
+                stats = self.fingerprints[key] = FingerprintStats()
+        stats.count += 1
+        stats.total_time += event.duration
+        stats.max_time = max(stats.max_time, event.duration)
+        if event.rows is not None and event.rows > 0:
+            stats.rows += event.rows
+
+    def stats(self):
+        """Return [(fingerprint, stats dict)], by descending total time."""
+        return sorted(
+            ((key, stats.as_dict()) for key, stats in self.fingerprints.items()),
+            key=lambda item: item[1]['total_time'], reverse=True,
+        )
+
+    def n_plus_one(self):
+        """
+        Return [(fingerprint, count)] of the SELECTs that ran at least
+        n_plus_one_threshold times, most repeated first.
+        """
+        return sorted(
+            (
+                (key, stats.count) for key, stats in self.fingerprints.items()
+                if stats.count >= self.n_plus_one_threshold and
+                key != self.OTHER and key[:6].upper() == 'SELECT'
+            ),
+            key=lambda item: item[1], reverse=True,
+        )
+
+
+_current_profile = ContextVar('mysql_cymysql_query_profile', default=None)
+
+
+class FingerprintSink(instrumentation.Sink):
+    """Add the queries to the QueryProfile of the current context, if any."""
+
+    def record_query(self, event):
+        query_profile = _current_profile.get()
+        if query_profile is not None:
+            query_profile.add(event)
+
+
+sink = FingerprintSink()
+
+
+@contextmanager
+def profile(**kwargs):
+    """Collect a QueryProfile of the queries run within the block."""
+    instrumentation.add_sink(sink)
+    query_profile = QueryProfile(**kwargs)
+    token = _current_profile.set(query_profile)
+    try:
+        yield query_profile
+    finally:
+        _current_profile.reset(token)
+
+
+class QueryProfileMiddleware:
+    """
+    Profile each request, make the QueryProfile available as
+    request.query_profile and log the SELECTs it repeated.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile() as query_profile:
+            request.query_profile = query_profile
+            response = self.get_response(request)
+        for key, count in query_profile.n_plus_one():
+            logger.warning(
+                'Likely N+1 query in %s %s: %d executions of %s',
+                request.method, request.path, count, key,
+            )
+        return response
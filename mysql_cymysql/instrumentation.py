@@ -0,0 +1,220 @@
+"""
+Per-query instrumentation.
+
+With OPTIONS['instrumentation'] = True, every query run through the
+backend's cursors is reported to the registered sinks as a QueryEvent, and
+the time spent getting a connection (from the pool, or by connecting) is
+reported as a connection wait. Nothing is recorded, and nothing is kept in
+memory, for aliases without the option.
+
+    from mysql_cymysql import instrumentation
+
+    histograms = instrumentation.HistogramSink()
+    instrumentation.add_sink(histograms)
+    instrumentation.add_sink(instrumentation.CallbackSink(on_query=print))
+
+    # e.g. in a /metrics view
+    HttpResponse(histograms.prometheus_text(), content_type='text/plain; version=0.0.4')
+"""
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+# rows is the cursor's rowcount: rows returned by a SELECT, rows affected
+# otherwise. The byte counts include the protocol framing.
+QueryEvent = namedtuple(
+    'QueryEvent',
+    'alias sql many duration rows bytes_sent bytes_received failed',
+)
+
+sinks = []
+
+
+def add_sink(sink):
+    if sink not in sinks:
+        sinks.append(sink)
+
+
+def remove_sink(sink):
+    if sink in sinks:
+        sinks.remove(sink)
+
+
+def record_query(event):
+    for sink in sinks:
+        sink.record_query(event)
+
+
+def record_connection_wait(alias, duration):
+    for sink in sinks:
+        sink.record_connection_wait(alias, duration)
+
+
+class CountingSocket:
+    """
+    Stands in for the socket of a cymysql connection to count the bytes
+    sent and received.
+    """
+    __slots__ = ('_sock', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def recv(self, size):
+        data = self._sock.recv(size)
+        self.bytes_received += len(data)
+        return data
+
+    def sendall(self, data):
+        self._sock.sendall(data)
+        self.bytes_sent += len(data)
+
+    def __getattr__(self, attr):
+        return getattr(self._sock, attr)
+
+
+def count_bytes(connection):
+    """
+    Install a CountingSocket on a cymysql connection, if it doesn't have one
+    yet, and return it.
+    """
+    wrapper = connection.socket
+    if not isinstance(wrapper._sock, CountingSocket):
+        wrapper._sock = CountingSocket(wrapper._sock)
+    return wrapper._sock
+
+
+class Sink:
+    """Receives the recorded events. Sinks must be thread-safe."""
+
+    def record_query(self, event):
+        pass
+
+    def record_connection_wait(self, alias, duration):
+        pass
+
+
+class CallbackSink(Sink):
+    """Call on_query(event) and on_connection_wait(alias, duration)."""
+
+    def __init__(self, on_query=None, on_connection_wait=None):
+        self.on_query = on_query
+        self.on_connection_wait = on_connection_wait
+
+    def record_query(self, event):
+        if self.on_query is not None:
+            self.on_query(event)
+
+    def record_connection_wait(self, alias, duration):
+        if self.on_connection_wait is not None:
+            self.on_connection_wait(alias, duration)
+
+
+class Histogram:
+    """Counts of observed values per bucket upper bound, plus +Inf."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class HistogramSink(Sink):
+    """
+    Keep histograms of query durations and connection waits, and counters of
+    queries, failures, rows and bytes, per database alias.
+    """
+    # Seconds.
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    counters = ('queries', 'failures', 'rows', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def _alias(self, alias):
+        # Must be called with self._lock held.
+        stats = self._aliases.get(alias)
+        if stats is None:
+            stats = self._aliases[alias] = {
+                'query_duration': Histogram(self.buckets),
+                'connection_wait': Histogram(self.buckets),
+                **{name: 0 for name in self.counters},
+            }
+        return stats
+
+    def record_query(self, event):
+        with self._lock:
+            stats = self._alias(event.alias)
+            stats['query_duration'].observe(event.duration)
+            stats['queries'] += 1
+            stats['failures'] += event.failed
+            if event.rows is not None and event.rows > 0:
+                stats['rows'] += event.rows
+            stats['bytes_sent'] += event.bytes_sent
+            stats['bytes_received'] += event.bytes_received
+
+    def record_connection_wait(self, alias, duration):
+        with self._lock:
+            self._alias(alias)['connection_wait'].observe(duration)
+
+    def stats(self):
+        """
+        Return {alias: {'query_duration': {...}, 'connection_wait': {...},
+        'queries': ..., ...}} where histograms are given as their count, sum
+        and cumulative bucket counts.
+        """
+        with self._lock:
+            return {
+                alias: {
+                    name: {
+                        'count': value.count,
+                        'sum': value.sum,
+                        'buckets': dict(zip(self.buckets + (float('inf'),), value.cumulative_counts())),
+                    } if isinstance(value, Histogram) else value
+                    for name, value in stats.items()
+                }
+                for alias, stats in self._aliases.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._aliases.clear()
+
+    def prometheus_text(self, prefix='django_cymysql'):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        stats = self.stats()
+        for name, unit in (('query_duration', 'seconds'), ('connection_wait', 'seconds')):
+            metric = '%s_%s_%s' % (prefix, name, unit)
+            lines.append('# TYPE %s histogram' % metric)
+            for alias, alias_stats in sorted(stats.items()):
+                histogram = alias_stats[name]
+                for bound, count in histogram['buckets'].items():
+                    lines.append('%s_bucket{alias="%s",le="%s"} %d' % (
+                        metric, alias, '+Inf' if bound == float('inf') else repr(float(bound)), count,
+                    ))
+                lines.append('%s_sum{alias="%s"} %r' % (metric, alias, float(histogram['sum'])))
+                lines.append('%s_count{alias="%s"} %d' % (metric, alias, histogram['count']))
+        for name in self.counters:
+            metric = '%s_%s_total' % (prefix, name)
+            lines.append('# TYPE %s counter' % metric)
+            for alias, alias_stats in sorted(stats.items()):
+                lines.append('%s{alias="%s"} %d' % (metric, alias, alias_stats[name]))
+        return '\n'.join(lines) + '\n'
@@ -1,4 +1,5 @@
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
 
 import sqlparse
 from cymysql.constants import FIELD_TYPE
@@ -13,9 +14,155 @@ FieldInfo = namedtuple('FieldInfo', BaseFieldInfo._fields + ('extra', 'is_unsign
 InfoLine = namedtuple(
     'InfoLine',
     'col_name data_type max_len num_prec num_scale extra column_default '
-    'collation is_unsigned'
+    'collation is_unsigned is_nullable datetime_precision'
 )
 
+# The type codes that the protocol reports for information_schema's
+# columns.data_type, so that get_table_description() doesn't have to read
+# the table to get them.
+data_type_codes = {
+    'bigint': FIELD_TYPE.LONGLONG,
+    'binary': FIELD_TYPE.STRING,
+    'bit': FIELD_TYPE.BIT,
+    'blob': FIELD_TYPE.BLOB,
+    'char': FIELD_TYPE.STRING,
+    'date': FIELD_TYPE.DATE,
+    'datetime': FIELD_TYPE.DATETIME,
+    'decimal': FIELD_TYPE.NEWDECIMAL,
+    'double': FIELD_TYPE.DOUBLE,
+    'enum': FIELD_TYPE.STRING,
+    'float': FIELD_TYPE.FLOAT,
+    'geomcollection': FIELD_TYPE.GEOMETRY,
+    'geometry': FIELD_TYPE.GEOMETRY,
+    'geometrycollection': FIELD_TYPE.GEOMETRY,
+    'int': FIELD_TYPE.LONG,
+    'json': FIELD_TYPE.JSON,
+    'linestring': FIELD_TYPE.GEOMETRY,
+    'longblob': FIELD_TYPE.BLOB,
+    'longtext': FIELD_TYPE.BLOB,
+    'mediumblob': FIELD_TYPE.BLOB,
+    'mediumint': FIELD_TYPE.INT24,
+    'mediumtext': FIELD_TYPE.BLOB,
+    'multilinestring': FIELD_TYPE.GEOMETRY,
+    'multipoint': FIELD_TYPE.GEOMETRY,
+    'multipolygon': FIELD_TYPE.GEOMETRY,
+    'point': FIELD_TYPE.GEOMETRY,
+    'polygon': FIELD_TYPE.GEOMETRY,
+    'set': FIELD_TYPE.STRING,
+    'smallint': FIELD_TYPE.SHORT,
+    'text': FIELD_TYPE.BLOB,
+    'time': FIELD_TYPE.TIME,
+    'timestamp': FIELD_TYPE.TIMESTAMP,
+    'tinyblob': FIELD_TYPE.BLOB,
+    'tinyint': FIELD_TYPE.TINY,
+    'tinytext': FIELD_TYPE.BLOB,
+    'varbinary': FIELD_TYPE.VAR_STRING,
+    'varchar': FIELD_TYPE.VAR_STRING,
+    'year': FIELD_TYPE.YEAR,
+}
+
+
+class SchemaSnapshot:
+    """
+    The metadata of every table in the current database, loaded with one
+    query per information_schema view.
+    """
+    def __init__(self, cursor, connection):
+        cursor.execute("""
+            SELECT table_name, table_type, table_collation, engine
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE()
+        """)
+        self.tables = []
+        self.collations = {}
+        self.engines = {}
+        for table, table_type, collation, engine in cursor.fetchall():
+            self.tables.append(TableInfo(table, {'BASE TABLE': 't', 'VIEW': 'v'}.get(table_type)))
+            self.collations[table] = collation or ''
+            self.engines[table] = engine
+
+        self.columns = defaultdict(list)
+        cursor.execute("""
+            SELECT
+                table_name, column_name, data_type, character_maximum_length,
+                numeric_precision, numeric_scale, extra, column_default,
+                collation_name,
+                CASE
+                    WHEN column_type LIKE '% unsigned' THEN 1
+                    ELSE 0
+                END AS is_unsigned,
+                is_nullable, datetime_precision
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, ordinal_position
+        """)
+        for table, *line in cursor.fetchall():
+            line = InfoLine(*line)
+            if line.collation == self.collations.get(table):
+                line = line._replace(collation=None)
+            self.columns[table].append(line)
+
+        self.key_columns = defaultdict(list)
+        cursor.execute("""
+            SELECT kc.`table_name`, kc.`constraint_name`, kc.`column_name`,
+                kc.`referenced_table_name`, kc.`referenced_column_name`
+            FROM information_schema.key_column_usage AS kc
+            WHERE kc.table_schema = DATABASE()
+            ORDER BY kc.`table_name`, kc.`ordinal_position`
+        """)
+        for table, *row in cursor.fetchall():
+            self.key_columns[table].append(tuple(row))
+
+        self.constraint_types = defaultdict(list)
+        cursor.execute("""
+            SELECT c.table_name, c.constraint_name, c.constraint_type
+            FROM information_schema.table_constraints AS c
+            WHERE c.table_schema = DATABASE()
+        """)
+        for table, *row in cursor.fetchall():
+            self.constraint_types[table].append(tuple(row))
+
+        self.check_constraints = defaultdict(list)
+        if connection.features.can_introspect_check_constraints:
+            if connection.mysql_is_mariadb:
+                cursor.execute("""
+                    SELECT c.table_name, c.constraint_name, c.check_clause
+                    FROM information_schema.check_constraints AS c
+                    WHERE c.constraint_schema = DATABASE()
+                """)
+            else:
+                cursor.execute("""
+                    SELECT tc.table_name, cc.constraint_name, cc.check_clause
+                    FROM
+                        information_schema.check_constraints AS cc,
+                        information_schema.table_constraints AS tc
+                    WHERE
+                        cc.constraint_schema = DATABASE() AND
+                        tc.table_schema = cc.constraint_schema AND
+                        cc.constraint_name = tc.constraint_name AND
+                        tc.constraint_type = 'CHECK'
+                """)
+            for table, *row in cursor.fetchall():
+                self.check_constraints[table].append(tuple(row))
+
+        # The same columns as SHOW INDEX, which can only describe one table.
+        self.indexes = defaultdict(list)
+        cursor.execute("""
+            SELECT table_name, non_unique, index_name, seq_in_index,
+                column_name, collation, index_type
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, index_name, seq_in_index
+        """)
+        for row in cursor.fetchall():
+            self.indexes[row[0]].append(row)
+
+    def json_constraints(self, table_name):
+        return {
+            constraint for constraint, check_clause in self.check_constraints[table_name]
+            if check_clause.lower() == 'json_valid(`%s`)' % constraint.lower()
+        }
+
 
 class DatabaseIntrospection(BaseDatabaseIntrospection):
     data_types_reverse = {
@@ -42,6 +189,41 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
         FIELD_TYPE.VAR_STRING: 'CharField',
     }
 
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._snapshot = None
+        self._snapshot_version = None
+        self._snapshot_depth = 0
+
+    @contextmanager
+    def schema_snapshot(self):
+        """
+        Answer introspection queries from a snapshot of the whole schema
+        within this block. OPTIONS['bulk_introspection'] does the same for
+        the lifetime of the connection. The snapshot is discarded when any
+        connection of the process runs DDL on the database.
+        """
+        self._snapshot_depth += 1
+        try:
+            yield
+        finally:
+            self._snapshot_depth -= 1
+            if not self._snapshot_depth:
+                self._snapshot = None
+
+    def invalidate_snapshot(self):
+        self._snapshot = None
+
+    def _get_snapshot(self, cursor):
+        if not self._snapshot_depth and not self.connection.settings_dict['OPTIONS'].get('bulk_introspection'):
+            return None
+        # See DatabaseWrapper.schema_changed().
+        version = self.connection.schema_version
+        if self._snapshot is None or self._snapshot_version != version:
+            self._snapshot = SchemaSnapshot(cursor, self.connection)
+            self._snapshot_version = version
+        return self._snapshot
+
     def get_field_type(self, data_type, description):
         field_type = super().get_field_type(data_type, description)
         if 'auto_increment' in description.extra:
@@ -66,6 +248,9 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
 
     def get_table_list(self, cursor):
         """Return a list of table and view names in the current database."""
+        snapshot = self._get_snapshot(cursor)
+        if snapshot is not None:
+            return list(snapshot.tables)
         cursor.execute("SHOW FULL TABLES")
         return [TableInfo(row[0], {'BASE TABLE': 't', 'VIEW': 'v'}.get(row[1]))
                 for row in cursor.fetchall()]
@@ -75,69 +260,80 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
         Return a description of the table with the DB-API cursor.description
         interface."
         """
-        json_constraints = {}
-        if self.connection.mysql_is_mariadb and self.connection.features.can_introspect_json_field:
-            # JSON data type is an alias for LONGTEXT in MariaDB, select
-            # JSON_VALID() constraints to introspect JSONField.
+        snapshot = self._get_snapshot(cursor)
+        if snapshot is not None:
+            json_constraints = set()
+            if self.connection.mysql_is_mariadb and self.connection.features.can_introspect_json_field:
+                json_constraints = snapshot.json_constraints(table_name)
+            lines = snapshot.columns[table_name]
+        else:
+            json_constraints = {}
+            if self.connection.mysql_is_mariadb and self.connection.features.can_introspect_json_field:
+                # JSON data type is an alias for LONGTEXT in MariaDB, select
+                # JSON_VALID() constraints to introspect JSONField.
+                cursor.execute("""
+                    SELECT c.constraint_name AS column_name
+                    FROM information_schema.check_constraints AS c
+                    WHERE
+                        c.table_name = %s AND
+                        LOWER(c.check_clause) = 'json_valid(`' + LOWER(c.constraint_name) + '`)' AND
+                        c.constraint_schema = DATABASE()
+                """, [table_name])
+                json_constraints = {row[0] for row in cursor.fetchall()}
+            # A default collation for the given table.
             cursor.execute("""
-                SELECT c.constraint_name AS column_name
-                FROM information_schema.check_constraints AS c
-                WHERE
-                    c.table_name = %s AND
-                    LOWER(c.check_clause) = 'json_valid(`' + LOWER(c.constraint_name) + '`)' AND
-                    c.constraint_schema = DATABASE()
+                SELECT  table_collation
+                FROM    information_schema.tables
+                WHERE   table_schema = DATABASE()
+                AND     table_name = %s
             """, [table_name])
-            json_constraints = {row[0] for row in cursor.fetchall()}
-        # A default collation for the given table.
-        cursor.execute("""
-            SELECT  table_collation
-            FROM    information_schema.tables
-            WHERE   table_schema = DATABASE()
-            AND     table_name = %s
-        """, [table_name])
-        row = cursor.fetchone()
-        default_column_collation = row[0] if row else ''
-        # information_schema database gives more accurate results for some figures:
-        # - varchar length returned by cursor.description is an internal length,
-        #   not visible length (#5725)
-        # - precision and scale (for decimal fields) (#5014)
-        # - auto_increment is not available in cursor.description
-        cursor.execute("""
-            SELECT
-                column_name, data_type, character_maximum_length,
-                numeric_precision, numeric_scale, extra, column_default,
-                CASE
-                    WHEN collation_name = %s THEN NULL
-                    ELSE collation_name
-                END AS collation_name,
-                CASE
-                    WHEN column_type LIKE '%% unsigned' THEN 1
-                    ELSE 0
-                END AS is_unsigned
-            FROM information_schema.columns
-            WHERE table_name = %s AND table_schema = DATABASE()
-        """, [default_column_collation, table_name])
-        field_info = {line[0]: InfoLine(*line) for line in cursor.fetchall()}
-
-        cursor.execute("SELECT * FROM %s LIMIT 1" % self.connection.ops.quote_name(table_name))
+            row = cursor.fetchone()
+            default_column_collation = row[0] if row else ''
+            # information_schema database gives more accurate results for some figures:
+            # - varchar length returned by cursor.description is an internal length,
+            #   not visible length (#5725)
+            # - precision and scale (for decimal fields) (#5014)
+            # - auto_increment is not available in cursor.description
+            cursor.execute("""
+                SELECT
+                    column_name, data_type, character_maximum_length,
+                    numeric_precision, numeric_scale, extra, column_default,
+                    CASE
+                        WHEN collation_name = %s THEN NULL
+                        ELSE collation_name
+                    END AS collation_name,
+                    CASE
+                        WHEN column_type LIKE '%% unsigned' THEN 1
+                        ELSE 0
+                    END AS is_unsigned,
+                    is_nullable, datetime_precision
+                FROM information_schema.columns
+                WHERE table_name = %s AND table_schema = DATABASE()
+                ORDER BY ordinal_position
+            """, [default_column_collation, table_name])
+            lines = [InfoLine(*line) for line in cursor.fetchall()]
 
         def to_int(i):
             return int(i) if i is not None else i
 
+        # Everything comes from information_schema rather than from the
+        # cursor.description of a query on the table, which would read the
+        # table's data or run a view's query.
         fields = []
-        for line in cursor.description:
-            info = field_info[line[0]]
+        for info in lines:
             fields.append(FieldInfo(
-                *line[:3],
-                to_int(info.max_len) or line[3],
-                to_int(info.num_prec) or line[4],
-                to_int(info.num_scale) or line[5],
-                line[6],
+                info.col_name,
+                data_type_codes.get(info.data_type.lower(), info.data_type),
+                None,
+                to_int(info.max_len) or to_int(info.num_prec),
+                to_int(info.num_prec),
+                to_int(info.num_scale) or to_int(info.datetime_precision) or 0,
+                info.is_nullable == 'YES',
                 info.column_default,
                 info.collation,
                 info.extra,
                 info.is_unsigned,
-                line[0] in json_constraints,
+                info.col_name in json_constraints,
             ))
         return fields
 
@@ -164,6 +360,13 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
         Return a list of (column_name, referenced_table_name, referenced_column_name)
         for all key columns in the given table.
         """
+        snapshot = self._get_snapshot(cursor)
+        if snapshot is not None:
+            return [
+                (column, ref_table, ref_column)
+                for constraint, column, ref_table, ref_column in snapshot.key_columns[table_name]
+                if ref_table is not None and ref_column is not None
+            ]
         key_columns = []
         cursor.execute("""
             SELECT column_name, referenced_table_name, referenced_column_name
@@ -180,6 +383,9 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
         Retrieve the storage engine for a given table. Return the default
         storage engine if the table doesn't exist.
         """
+        snapshot = self._get_snapshot(cursor)
+        if snapshot is not None:
+            return snapshot.engines.get(table_name) or self.connection.features._mysql_storage_engine
         cursor.execute(
             "SELECT engine "
             "FROM information_schema.tables "
@@ -202,6 +408,31 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
                 check_columns.add(token.value[1:-1])
         return check_columns
 
+    def _get_check_constraints(self, cursor, table_name):
+        if self.connection.mysql_is_mariadb:
+            type_query = """
+                SELECT c.constraint_name, c.check_clause
+                FROM information_schema.check_constraints AS c
+                WHERE
+                    c.constraint_schema = DATABASE() AND
+                    c.table_name = %s
+            """
+        else:
+            type_query = """
+                SELECT cc.constraint_name, cc.check_clause
+                FROM
+                    information_schema.check_constraints AS cc,
+                    information_schema.table_constraints AS tc
+                WHERE
+                    cc.constraint_schema = DATABASE() AND
+                    tc.table_schema = cc.constraint_schema AND
+                    cc.constraint_name = tc.constraint_name AND
+                    tc.constraint_type = 'CHECK' AND
+                    tc.table_name = %s
+            """
+        cursor.execute(type_query, [table_name])
+        return cursor.fetchall()
+
     def get_constraints(self, cursor, table_name):
         """
         Retrieve any constraints or keys (unique, pk, fk, check, index) across
@@ -218,8 +449,13 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
                 kc.table_name = %s
             ORDER BY kc.`ordinal_position`
         """
-        cursor.execute(name_query, [table_name])
-        for constraint, column, ref_table, ref_column in cursor.fetchall():
+        snapshot = self._get_snapshot(cursor)
+        if snapshot is not None:
+            key_columns = snapshot.key_columns[table_name]
+        else:
+            cursor.execute(name_query, [table_name])
+            key_columns = cursor.fetchall()
+        for constraint, column, ref_table, ref_column in key_columns:
             if constraint not in constraints:
                 constraints[constraint] = {
                     'columns': OrderedSet(),
@@ -240,8 +476,12 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
                 c.table_schema = DATABASE() AND
                 c.table_name = %s
         """
-        cursor.execute(type_query, [table_name])
-        for constraint, kind in cursor.fetchall():
+        if snapshot is not None:
+            constraint_types = snapshot.constraint_types[table_name]
+        else:
+            cursor.execute(type_query, [table_name])
+            constraint_types = cursor.fetchall()
+        for constraint, kind in constraint_types:
             if kind.lower() == "primary key":
                 constraints[constraint]['primary_key'] = True
                 constraints[constraint]['unique'] = True
@@ -250,30 +490,13 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
         # Add check constraints.
         if self.connection.features.can_introspect_check_constraints:
             unnamed_constraints_index = 0
-            columns = {info.name for info in self.get_table_description(cursor, table_name)}
-            if self.connection.mysql_is_mariadb:
-                type_query = """
-                    SELECT c.constraint_name, c.check_clause
-                    FROM information_schema.check_constraints AS c
-                    WHERE
-                        c.constraint_schema = DATABASE() AND
-                        c.table_name = %s
-                """
+            if snapshot is not None:
+                columns = {line.col_name for line in snapshot.columns[table_name]}
+                check_constraints = snapshot.check_constraints[table_name]
             else:
-                type_query = """
-                    SELECT cc.constraint_name, cc.check_clause
-                    FROM
-                        information_schema.check_constraints AS cc,
-                        information_schema.table_constraints AS tc
-                    WHERE
-                        cc.constraint_schema = DATABASE() AND
-                        tc.table_schema = cc.constraint_schema AND
-                        cc.constraint_name = tc.constraint_name AND
-                        tc.constraint_type = 'CHECK' AND
-                        tc.table_name = %s
-                """
-            cursor.execute(type_query, [table_name])
-            for constraint, check_clause in cursor.fetchall():
+                columns = {info.name for info in self.get_table_description(cursor, table_name)}
+                check_constraints = self._get_check_constraints(cursor, table_name)
+            for constraint, check_clause in check_constraints:
                 constraint_columns = self._parse_constraint_columns(check_clause, columns)
                 # Ensure uniqueness of unnamed constraints. Unnamed unique
                 # and check columns constraints have the same name as
@@ -290,10 +513,12 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
                     'foreign_key': None,
                 }
         # Now add in the indexes
-        cursor.execute("SHOW INDEX FROM %s" % self.connection.ops.quote_name(table_name))
-        for table, non_unique, index, colseq, column, order, type_ in [
-            x[:6] + (x[10],) for x in cursor.fetchall()
-        ]:
+        if snapshot is not None:
+            indexes = snapshot.indexes[table_name]
+        else:
+            cursor.execute("SHOW INDEX FROM %s" % self.connection.ops.quote_name(table_name))
+            indexes = [x[:6] + (x[10],) for x in cursor.fetchall()]
+        for table, non_unique, index, colseq, column, order, type_ in indexes:
             if index not in constraints:
                 constraints[index] = {
                     'columns': OrderedSet(),
@@ -0,0 +1,63 @@
+"""
+Keyset iteration over large querysets.
+
+iterate() walks a queryset in chunks ordered by a unique key, each one read
+with its own short query (WHERE key > last ORDER BY key LIMIT n), instead
+of one long-running statement or OFFSET pagination. Long statements hold
+back InnoDB purge and, on the primary, delay replicas; short ones don't.
+
+    from mysql_cymysql.keyset import iterate
+
+    for event in iterate(Event.objects.filter(kind='click'), target_time=0.2, throttle=0.05):
+        process(event)
+
+The chunk size adapts so that each query takes about target_time seconds,
+between min_chunk_size and max_chunk_size. throttle is a pause in seconds
+after each chunk, or a callable that takes the duration of the chunk's
+query and returns the pause. The queryset's ordering is replaced by the key;
+rows inserted or updated behind the walk while it runs aren't seen.
+"""
+import time
+
+from django.db.models.query import ModelIterable, ValuesIterable
+
+
+def iterate(queryset, key='pk', chunk_size=1000, min_chunk_size=100, max_chunk_size=10000,
+            target_time=0.5, throttle=None):
+    """
+    Yield the objects of queryset (model instances or values() dicts, which
+    must include key) in chunks ordered by key, a unique field.
+    """
+    if queryset._iterable_class is ModelIterable:
+        def key_value(obj):
+            return getattr(obj, key)
+    elif queryset._iterable_class is ValuesIterable:
+        name = queryset.model._meta.pk.attname if key == 'pk' else key
+
+        def key_value(obj):
+            return obj[name]
+    else:
+        raise TypeError('iterate() requires a queryset of model instances or values() dicts.')
+    queryset = queryset.order_by(key)
+    last = None
+    while True:
+        chunk_queryset = queryset if last is None else queryset.filter(**{'%s__gt' % key: last})
+        start = time.monotonic()
+        chunk = list(chunk_queryset[:chunk_size])
+        elapsed = time.monotonic() - start
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = key_value(chunk[-1])
+        chunk_size = _next_chunk_size(chunk_size, elapsed, target_time, min_chunk_size, max_chunk_size)
+        pause = throttle(elapsed) if callable(throttle) else throttle
+        if pause:
+            time.sleep(pause)
+
+
+def _next_chunk_size(chunk_size, elapsed, target_time, min_chunk_size, max_chunk_size):
+    if elapsed < target_time / 2:
+        chunk_size *= 2
+    elif elapsed > target_time:
+        chunk_size = int(chunk_size * target_time / elapsed)
+    return max(min_chunk_size, min(max_chunk_size, chunk_size))
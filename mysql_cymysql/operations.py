@@ -1,6 +1,127 @@
 from django.db.backends.mysql.operations import DatabaseOperations as BaseDatabaseOperations
 
+# The largest packet CyMySQL sends: it doesn't split statements into several
+# packets.
+MAX_PACKET_SIZE = 0xffffff
+
+
 class DatabaseOperations(BaseDatabaseOperations):
+    # Upper bounds of the size of a value literal by field type (values of
+    # other types are measured) and the number of objects sampled to
+    # estimate the size of a row.
+    bulk_value_sizes = {
+        'AutoField': 11,
+        'BigAutoField': 20,
+        'BigIntegerField': 20,
+        'BooleanField': 5,
+        'DateField': 12,
+        'DateTimeField': 28,
+        'DurationField': 20,
+        'FloatField': 24,
+        'IntegerField': 11,
+        'PositiveBigIntegerField': 20,
+        'PositiveIntegerField': 10,
+        'PositiveSmallIntegerField': 5,
+        'SmallAutoField': 6,
+        'SmallIntegerField': 6,
+        'TimeField': 17,
+        'UUIDField': 34,
+    }
+    bulk_sample_size = 100
+    # Room left in a statement packet for the header and slack.
+    packet_margin = 1024
+
+    def max_statement_size(self):
+        """
+        Return the size in bytes a statement may take: max_allowed_packet,
+        capped at the largest packet CyMySQL sends, less packet_margin.
+        """
+        max_allowed_packet = self.connection.mysql_server_data['max_allowed_packet']
+        return min(max_allowed_packet, MAX_PACKET_SIZE) - self.packet_margin
 
     def last_executed_query(self, cursor, sql, params):
         return getattr(cursor, '_last_executed', None)
+
+    def bulk_batch_size(self, fields, objs):
+        """
+        Size bulk_create() batches so that each INSERT statement fits in the
+        server's max_allowed_packet, estimating the row size from a sample of
+        the objects. Batches fill 90% of a statement since the rest of the
+        objects may be larger than the sample.
+        """
+        if not fields or not objs:
+            return len(objs)
+        sample = objs[:self.bulk_sample_size]
+        sample_size = 0
+        for obj in sample:
+            for field in fields:
+                size = self._value_size(field)
+                if size is None:
+                    # Measure the value as it's sent, e.g. a JSONField's
+                    # dict as its JSON document.
+                    value = getattr(obj, field.attname, None) if hasattr(field, 'attname') else None
+                    if value is not None and not hasattr(value, 'resolve_expression'):
+                        value = field.get_db_prep_save(value, connection=self.connection)
+                    size = self._literal_size(value)
+                sample_size += size
+        row_size = sample_size // len(sample) + 3
+        max_size = self.max_statement_size() * 9 // 10
+        return max(1, min(len(objs), max_size // row_size))
+
+    def _value_size(self, field):
+        """Return the upper bound of the literals of field, or None."""
+        internal_type = field.get_internal_type() if hasattr(field, 'get_internal_type') else None
+        if internal_type == 'DecimalField' and field.max_digits is not None:
+            # Sign, point and quotes.
+            return field.max_digits + 4
+        return self.bulk_value_sizes.get(internal_type)
+
+    def _literal_size(self, value):
+        if value is None:
+            return 4
+        if isinstance(value, str):
+            # Up to 4 bytes per character in utf8mb4.
+            return 4 * len(value) + 3
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            # Escaping may double the size of a bytestring.
+            return 2 * len(bytes(value)) + 3
+        return len(str(value)) + 3
+
+    def upsert_sql(self, table, columns, update_columns, rows):
+        """
+        Return an INSERT of rows, a list of '(value, ...)' literals, that
+        updates update_columns of the rows whose primary or unique key
+        already exists.
+        """
+        quote_name = self.quote_name
+        if self.connection.features.supports_insert_row_alias:
+            alias = ' AS _new'
+            updates = ['%s = _new.%s' % (quote_name(c), quote_name(c)) for c in update_columns]
+        else:
+            alias = ''
+            updates = ['%s = VALUES(%s)' % (quote_name(c), quote_name(c)) for c in update_columns]
+        if not updates:
+            # Leave existing rows alone.
+            updates = ['%s = %s' % (quote_name(columns[0]), quote_name(columns[0]))]
+        return 'INSERT INTO %s (%s) VALUES %s%s ON DUPLICATE KEY UPDATE %s' % (
+            quote_name(table), ', '.join(quote_name(c) for c in columns),
+            ', '.join(rows), alias, ', '.join(updates),
+        )
+
+    def bulk_update_sql(self, table, pk_column, columns, rows):
+        """
+        Return an UPDATE that sets columns of the rows of table to rows, a
+        list of [pk, value, ...] literals, joined on a derived table.
+        """
+        quote_name = self.quote_name
+        names = [pk_column] + list(columns)
+        first, rest = rows[0], rows[1:]
+        selects = ['SELECT %s' % ', '.join(
+            '%s AS %s' % (value, quote_name(name)) for value, name in zip(first, names)
+        )]
+        selects.extend('SELECT %s' % ', '.join(row) for row in rest)
+        return 'UPDATE %s JOIN (%s) AS _rows ON %s.%s = _rows.%s SET %s' % (
+            quote_name(table), ' UNION ALL '.join(selects),
+            quote_name(table), quote_name(pk_column), quote_name(pk_column),
+            ', '.join('%s.%s = _rows.%s' % (quote_name(table), quote_name(c), quote_name(c)) for c in columns),
+        )
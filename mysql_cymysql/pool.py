@@ -0,0 +1,385 @@
+"""
+Process-wide connection pool for the cymysql backend.
+
+Pools are keyed by the connection parameters returned by
+DatabaseWrapper.get_connection_params() and the isolation level, so every
+DatabaseWrapper (one per thread and alias) that would open an identical
+connection shares the same pool of physical connections.
+
+Connections taken back are reset with COM_RESET_CONNECTION, so the next
+borrower gets the session of a new connection, set up the way the backend
+last set it up.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import cymysql as Database
+
+from django.core.exceptions import ImproperlyConfigured
+
+from . import compression
+
+# cymysql.constants.COMMAND lacks it.
+COM_RESET_CONNECTION = 0x1f
+# The first versions with COM_RESET_CONNECTION.
+reset_versions = {'mysql': (5, 7, 3), 'mariadb': (10, 2, 4)}
+# MariaDB prefixes its version with 5.5.5- for old clients.
+version_re = re.compile(r'(?:5\.5\.5-)?(\d+)\.(\d+)\.(\d+)')
+
+# What the backend remembers on a physical connection to skip statements,
+# see base.py. None means unknown.
+session_attributes = (
+    '_django_session_state',
+    '_django_autocommit',
+    '_django_foreign_key_checks',
+    '_django_statement_cache',
+)
+
+
+class BasePool:
+    """
+    The bookkeeping of a bounded LIFO pool, shared by ConnectionPool and
+    aio.AsyncConnectionPool. Subclasses set self._cond to a threading or
+    asyncio Condition and hold it around the calls of the methods below.
+
+    - min_size: number of idle connections kept open even when they exceed
+      max_idle.
+    - max_size: maximum number of physical connections, idle or in use.
+    - max_idle: seconds an idle connection is kept before being closed.
+    - max_lifetime: seconds after which a connection is closed instead of
+      being handed out again.
+    - timeout: seconds acquire() waits for a connection when the pool is
+      exhausted.
+    """
+    defaults = {
+        'min_size': 0,
+        'max_size': 10,
+        'max_idle': 300,
+        'max_lifetime': 3600,
+        'timeout': 30,
+    }
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid connection pool option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+        if self.max_size < 1 or self.min_size > self.max_size:
+            raise ImproperlyConfigured(
+                "Connection pool requires 1 <= max_size and min_size <= max_size."
+            )
+        self.options = {name: getattr(self, name) for name in self.defaults}
+        # Idle connections as (connection, created_at, released_at) tuples,
+        # most recently released last.
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        # Whether the server was found to support COM_RESET_CONNECTION.
+        self._reset_checked = False
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _is_usable(self, connection):
+        return connection._is_connect()
+
+    def _is_expired(self, created_at, now):
+        return self.max_lifetime is not None and now - created_at > self.max_lifetime
+
+    def _forget(self, connection):
+        # Also gives back the room reserved by _reserve() when connection
+        # is None.
+        self._created_at.pop(id(connection), None)
+        self._size -= 1
+        self._cond.notify()
+
+    def _prune(self, now):
+        """
+        Remove idle connections that outlived max_idle or max_lifetime.
+        Return the removed connections so that they can be closed outside
+        of the lock.
+        """
+        stale = []
+        for entry in list(self._idle):
+            connection, created_at, released_at = entry
+            idle_expired = (
+                self.max_idle is not None and now - released_at > self.max_idle and
+                len(self._idle) > self.min_size
+            )
+            if idle_expired or self._is_expired(created_at, now):
+                self._idle.remove(entry)
+                self._forget(connection)
+                stale.append(connection)
+        return stale
+
+    def _pop_idle(self, now, stale):
+        """
+        Return the most recently released usable connection, or None.
+        Connections to close are appended to stale.
+        """
+        stale.extend(self._prune(now))
+        while self._idle:
+            connection, created_at, released_at = self._idle.pop()
+            if self._is_usable(connection):
+                return connection
+            self._forget(connection)
+        return None
+
+    def _reserve(self):
+        """Make room for a new connection, return False if there is none."""
+        if self._size < self.max_size:
+            self._size += 1
+            return True
+        return False
+
+    def _added(self, connection):
+        self._created_at[id(connection)] = time.monotonic()
+
+    def _check_in(self, connection, reusable):
+        """
+        Make a released connection idle if it's reusable and not expired.
+        Return whether it was kept; otherwise it must be closed.
+        """
+        now = time.monotonic()
+        created_at = self._created_at.get(id(connection), now)
+        if reusable and not self._is_expired(created_at, now):
+            self._idle.append((connection, created_at, now))
+            self._cond.notify()
+            return True
+        self._forget(connection)
+        return False
+
+    def _take_idle(self):
+        """Remove every idle connection and return them to be closed."""
+        idle = [entry[0] for entry in self._idle]
+        self._idle.clear()
+        for connection in idle:
+            self._forget(connection)
+        return idle
+
+    def _check_reset(self, connection):
+        """
+        Raise ImproperlyConfigured if the server of the first connection
+        can't reset sessions: connections couldn't be reused.
+        """
+        if self._reset_checked:
+            return
+        if not supports_reset(connection):
+            raise ImproperlyConfigured(
+                "Connection pooling requires COM_RESET_CONNECTION (MySQL >= "
+                "5.7.3, MariaDB >= 10.2.4); the server is %s." % connection.server_version
+            )
+        self._reset_checked = True
+
+    def _exhausted(self):
+        return Database.OperationalError(
+            "Timed out after %ss waiting for a pooled connection "
+            "(max_size=%s)." % (self.timeout, self.max_size)
+        )
+
+
+class ConnectionPool(BasePool):
+    """A bounded LIFO pool of cymysql connections, see BasePool."""
+
+    def __init__(self, conn_params, **options):
+        super().__init__(**options)
+        self.conn_params = conn_params
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        stale = []
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    connection = self._pop_idle(now, stale)
+                    if connection is not None:
+                        return connection
+                    if self._reserve():
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._exhausted()
+                    self._cond.wait(remaining)
+        finally:
+            _close_quietly(stale)
+        try:
+            connection = compression.connect(**self.conn_params)
+        except Exception:
+            with self._cond:
+                self._forget(None)
+            raise
+        with self._cond:
+            self._added(connection)
+        try:
+            self._check_reset(connection)
+        except ImproperlyConfigured:
+            self.discard(connection)
+            raise
+        return connection
+
+    def release(self, connection):
+        """
+        Take a connection back. Its session is reset, see reset_session();
+        broken or expired connections are closed instead of being reused.
+        """
+        try:
+            if connection._is_connect():
+                reset_session(connection)
+                reusable = True
+            else:
+                reusable = False
+        except Database.Error:
+            reusable = False
+        with self._cond:
+            if self._check_in(connection, reusable):
+                return
+        _close_quietly([connection])
+
+    def discard(self, connection):
+        """Close a checked out connection without returning it to the pool."""
+        with self._cond:
+            self._forget(connection)
+        _close_quietly([connection])
+
+    def close(self):
+        """Close all idle connections."""
+        with self._cond:
+            idle = self._take_idle()
+        _close_quietly(idle)
+
+
+def supports_reset(connection):
+    """Whether the server of a connection supports COM_RESET_CONNECTION."""
+    version = connection.server_version
+    match = version_re.match(version)
+    if not match:
+        return False
+    minimum = reset_versions['mariadb' if 'mariadb' in version.lower() else 'mysql']
+    return tuple(int(x) for x in match.groups()) >= minimum
+
+
+def reset_session(connection):
+    """
+    Reset the session of a cymysql connection to that of a new connection:
+    the transaction is rolled back, temporary tables, user variables and
+    prepared statements are dropped and session variables are set to their
+    global values. The character set, sql_mode and init_command that
+    Connection._initialize() applies are then applied again, followed by
+    the session state, autocommit mode and foreign key checks that the
+    backend recorded (see session_attributes), so that the next borrower
+    doesn't set them up again.
+    """
+    connection._execute_command(COM_RESET_CONNECTION, b'')
+    connection.read_packet()
+    # The prepared statements are gone.
+    connection._django_statement_cache = None
+    # Unknown until they are applied again.
+    session_state = getattr(connection, '_django_session_state', None)
+    autocommit = getattr(connection, '_django_autocommit', None)
+    foreign_key_checks = getattr(connection, '_django_foreign_key_checks', None)
+    for name in session_attributes:
+        setattr(connection, name, None)
+    connection.set_charset(connection.charset)
+    cursor = connection.cursor()
+    if connection.sql_mode is not None:
+        cursor.execute("SET sql_mode=%s", (connection.sql_mode,))
+    if connection.init_command is not None:
+        cursor.execute(connection.init_command)
+        connection.commit()
+    # One statement at a time, see DatabaseWrapper.init_connection_state().
+    for assignment in session_state or ():
+        cursor.execute(assignment)
+    assignments = []
+    if autocommit is not None:
+        assignments.append('autocommit=%d' % autocommit)
+    if foreign_key_checks is not None:
+        assignments.append('foreign_key_checks=%d' % foreign_key_checks)
+    if assignments:
+        cursor.execute('SET ' + ', '.join(assignments))
+    cursor.close()
+    connection._django_session_state = session_state
+    connection._django_autocommit = autocommit
+    connection._django_foreign_key_checks = foreign_key_checks
+
+
+def _close_quietly(connections):
+    for connection in connections:
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+
+def _pool_key(conn_params, isolation_level=None):
+    # Mappings such as 'conv' aren't hashable; they are shared objects so
+    # their identity is a good enough key. The isolation level isn't a
+    # connection parameter but is part of the session state.
+    return tuple(sorted(
+        (k, id(v) if isinstance(v, (dict, list)) else v)
+        for k, v in conn_params.items()
+    )) + (('isolation_level', isolation_level),)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, options, isolation_level=None):
+    """
+    Return the process-wide pool for these connection parameters. Aliases
+    that share a pool must configure it with the same options.
+    """
+    key = _pool_key(conn_params, isolation_level)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(conn_params, **options)
+        elif pool.options != {**ConnectionPool.defaults, **options}:
+            raise ImproperlyConfigured(
+                "Databases that connect with the same parameters share a "
+                "connection pool and must use the same 'pool' options."
+            )
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _forget_pools():
+    # The connections of the parent process can't be used by a child, and
+    # closing them politely would end the parent's sessions: only the
+    # child's copies of the sockets are closed.
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        for connection, created_at, released_at in pool._idle:
+            if connection.socket is not None:
+                try:
+                    connection.socket.close()
+                except OSError:
+                    pass
+                connection.socket = None
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pools)
@@ -0,0 +1,213 @@
+"""
+Read replicas.
+
+With OPTIONS['replicas'], reads that run outside transactions go to a
+replica of the primary server (HOST/PORT):
+
+    'OPTIONS': {
+        'replicas': {
+            'hosts': [{'HOST': 'replica1'}, {'HOST': 'replica2', 'PORT': 3307}],
+            'max_lag': 5,
+        },
+    },
+
+A list of hosts is short for {'hosts': [...]}. Each host may also set USER
+and PASSWORD. The other options are:
+
+- max_lag: seconds a replica may lag behind (Seconds_Behind_Source) before
+  it's skipped; None to never check.
+- check_interval: seconds between lag checks of a replica.
+- strategy: 'least_connections' picks the replica with the fewest
+  connections from this process, 'latency' the one that answered the lag
+  checks the fastest.
+- retry_after: seconds a replica that failed is skipped.
+
+The state of the replicas (lag, latency, failures, connections) is shared by
+every connection of the process.
+"""
+import logging
+import random
+import re
+import threading
+import time
+
+import cymysql as Database
+
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger('mysql_cymysql.replicas')
+
+# Queries that may run on a replica, unless they lock rows, read session
+# state or store results.
+read_re = re.compile(r'\s*(?:\(\s*)*SELECT\b', re.IGNORECASE)
+primary_read_re = re.compile(
+    r'\bFOR\s+(?:UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\b|@|'
+    r'\b(?:GET_LOCK|RELEASE_LOCK|IS_FREE_LOCK|LAST_INSERT_ID|FOUND_ROWS|ROW_COUNT)\s*\(',
+    re.IGNORECASE,
+)
+# Statements after which reads stay on the primary, so that they see the
+# changes.
+write_re = re.compile(
+    r'\s*(?:INSERT|UPDATE|DELETE|REPLACE|LOAD|CALL|CREATE|ALTER|DROP|TRUNCATE|'
+    r'RENAME|LOCK|DO|GRANT|REVOKE)\b',
+    re.IGNORECASE,
+)
+
+# Errors that mean the server is unreachable rather than the query wrong.
+connection_error_codes = (
+    2003,  # Can't connect to MySQL server
+    2006,  # MySQL server has gone away
+    2013,  # Lost connection to MySQL server during query
+)
+
+
+class ReplicaState:
+    def __init__(self, settings):
+        self.settings = settings
+        self.connections = 0
+        # Seconds behind the primary, None until checked or when the
+        # replica isn't replicating.
+        self.lag = None
+        self.checked_at = None
+        # Moving average of the lag check round trips, in seconds.
+        self.latency = 0
+        self.down_until = 0
+
+    def __repr__(self):
+        return '<ReplicaState %s:%s>' % (self.settings.get('HOST'), self.settings.get('PORT'))
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _get_state(settings):
+    key = (settings.get('HOST'), settings.get('PORT'))
+    with _states_lock:
+        state = _states.get(key)
+        if state is None:
+            state = _states[key] = ReplicaState(settings)
+        return state
+
+
+class ReplicaSet:
+    defaults = {
+        'hosts': (),
+        'max_lag': 5,
+        'check_interval': 5,
+        'strategy': 'least_connections',
+        'retry_after': 30,
+    }
+    strategies = ('least_connections', 'latency')
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid replica option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+        if self.strategy not in self.strategies:
+            raise ImproperlyConfigured(
+                "Invalid replica strategy '%s'. Use one of %s." % (self.strategy, ', '.join(self.strategies))
+            )
+        self.states = [_get_state(dict(settings)) for settings in self.hosts]
+        # Set by DatabaseWrapper.get_connection_params().
+        self.primary_params = None
+
+    def conn_params(self, state, primary_params):
+        """Return the connection parameters of a replica."""
+        params = dict(primary_params)
+        settings = state.settings
+        params.pop('unix_socket', None)
+        params['host'] = settings['HOST']
+        if settings.get('PORT'):
+            params['port'] = int(settings['PORT'])
+        else:
+            params.pop('port', None)
+        if settings.get('USER'):
+            params['user'] = settings['USER']
+        if settings.get('PASSWORD'):
+            params['passwd'] = settings['PASSWORD']
+        return params
+
+    def candidates(self):
+        """
+        Return the replicas that aren't known to be down or lagging, the
+        preferred one first.
+        """
+        now = time.monotonic()
+        states = [
+            state for state in self.states
+            if state.down_until <= now and (
+                self.max_lag is None or state.checked_at is None or
+                (state.lag is not None and state.lag <= self.max_lag)
+            )
+        ]
+        random.shuffle(states)
+        if self.strategy == 'latency':
+            states.sort(key=lambda state: state.latency)
+        else:
+            states.sort(key=lambda state: state.connections)
+        return states
+
+    def is_healthy(self, state, connection):
+        """
+        Return whether a replica, connected to with connection, can serve
+        reads. Its lag is checked on that connection every check_interval
+        seconds.
+        """
+        now = time.monotonic()
+        if state.down_until > now:
+            return False
+        if self.max_lag is None:
+            return True
+        if state.checked_at is None or now - state.checked_at >= self.check_interval:
+            self.check(state, connection)
+        return state.down_until <= now and state.lag is not None and state.lag <= self.max_lag
+
+    def check(self, state, connection):
+        start = time.monotonic()
+        try:
+            state.lag = self._read_lag(connection)
+        except Database.OperationalError as e:
+            if e.args[0] in connection_error_codes:
+                self.mark_down(state)
+                return
+            logger.warning("Could not read the replication status of %r: %s", state, e)
+            state.lag = None
+        except Database.Error as e:
+            logger.warning("Could not read the replication status of %r: %s", state, e)
+            state.lag = None
+        now = time.monotonic()
+        state.latency = 0.8 * state.latency + 0.2 * (now - start) if state.checked_at else now - start
+        state.checked_at = now
+
+    def _read_lag(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except Database.ProgrammingError:
+            # Before MySQL 8.0.22 and on MariaDB.
+            cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [column[0] for column in cursor.description]
+        for name in ('Seconds_Behind_Source', 'Seconds_Behind_Master'):
+            if name in columns:
+                return row[columns.index(name)]
+        return None
+
+    def mark_down(self, state):
+        state.down_until = time.monotonic() + self.retry_after
+        logger.warning("Replica %r failed, skipping it for %ss.", state, self.retry_after)
+
+    def acquire(self, state):
+        with _states_lock:
+            state.connections += 1
+
+    def release(self, state):
+        with _states_lock:
+            state.connections -= 1
@@ -0,0 +1,324 @@
+"""
+Query result cache.
+
+With OPTIONS['result_cache'], the results of SELECTs that only read the
+configured tables are kept in a process-wide LRU cache, keyed by the SQL, its
+parameters, and the user and session settings of the connection:
+
+    'OPTIONS': {
+        'result_cache': {
+            'tables': ['flags_flag', 'tenants_config'],
+            'max_entries': 1000,
+            'max_rows': 1000,
+            'ttl': 60,
+        },
+    },
+
+Options:
+
+- tables: the tables whose reads are cached (required).
+- max_entries: number of results kept.
+- max_rows: larger results aren't cached.
+- ttl: seconds a result is kept, or None to keep it until it's invalidated.
+
+Entries are tagged with the tables they read and dropped when this process
+writes to one of them, both when the statement runs and, inside a
+transaction, when the transaction commits. Writes by other processes aren't
+seen before the entries expire. Reads inside transactions, reads that call
+functions whose result changes between calls (NOW(), RAND(), ...), and
+reads that join tables with commas (FROM a, b) bypass the cache.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .replicas import read_re, primary_read_re, write_re
+
+# Tables named after FROM, JOIN, INTO, UPDATE, TABLE, with an optional
+# database prefix.
+_name = r'(?:`[^`]+`|\w+)'
+tables_re = re.compile(
+    r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE|TRUNCATE)\s+(%s(?:\s*\.\s*%s)?)' % (_name, _name),
+    re.IGNORECASE,
+)
+_keywords = {'select', 'dual', 'lateral', 'table'}
+# The clauses that list tables, and the tokens they are scanned in for
+# commas: quoted strings and names, parentheses, commas and words.
+table_list_re = re.compile(r'\bFROM\b|^\s*(?:UPDATE|DELETE)\b', re.IGNORECASE)
+_token_re = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|[(),;]|\w+")
+_clause_ends = {'where', 'group', 'having', 'order', 'limit', 'union', 'window', 'for', 'lock', 'into', 'set'}
+# Statements that write the one table they insert into.
+insert_re = re.compile(r'\s*(?:INSERT|REPLACE|LOAD)\b', re.IGNORECASE)
+# Functions whose result differs between calls or connections.
+volatile_re = re.compile(
+    r'\b(?:NOW|SYSDATE|CURDATE|CURTIME|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|'
+    r'UNIX_TIMESTAMP|RAND|UUID|UUID_SHORT|RANDOM_BYTES|CONNECTION_ID|USER|'
+    r'SESSION_USER|SYSTEM_USER|DATABASE|SCHEMA|SLEEP|BENCHMARK)\s*\(|'
+    r'\b(?:CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP|CURRENT_USER)\b',
+    re.IGNORECASE,
+)
+
+Entry = namedtuple('Entry', 'description rows rowcount tables expires')
+
+
+def query_tables(query):
+    """
+    Return the names of the tables a statement refers to, or None if they
+    can't all be told: only the first of tables joined with commas (FROM a,
+    b) would be found.
+    """
+    tables = set()
+    for name in tables_re.findall(query):
+        name = name.rsplit('.', 1)[-1].strip().strip('`')
+        if name.lower() not in _keywords:
+            tables.add(name)
+    if tables and not insert_re.match(query) and _joins_with_commas(query):
+        return None
+    return tables
+
+
+def _joins_with_commas(query):
+    """Whether a list of tables of query has a comma outside parentheses."""
+    for match in table_list_re.finditer(query):
+        depth = 0
+        for token in _token_re.finditer(query, match.end()):
+            token = token.group()
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+                # The end of a subquery, or of EXTRACT(YEAR FROM ...).
+                if depth < 0:
+                    break
+            elif depth == 0:
+                if token == ',':
+                    return True
+                if token == ';' or token.lower() in _clause_ends:
+                    break
+    return False
+
+
+def session_key(db):
+    """
+    Return what, besides the statement, a result depends on: the user and
+    the session settings of db's connection.
+    """
+    params = db.connection_params or {}
+    return (
+        db.settings_dict['USER'], params.get('charset'), params.get('sql_mode'),
+        params.get('init_command'), db.session_state,
+    )
+
+
+class CachedResult:
+    """
+    Stands in for a cursor to serve a cached result. cursor is the cursor it
+    replaces, closed along with it.
+    """
+    arraysize = 1
+    lastrowid = None
+
+    def __init__(self, entry, query, cursor):
+        self.cursor = cursor
+        self.description = entry.description
+        self.rowcount = entry.rowcount
+        self._rows = entry.rows
+        self._index = 0
+        self._last_executed = query
+
+    def fetchone(self):
+        if self._index >= len(self._rows):
+            return None
+        row = self._rows[self._index]
+        self._index += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows = self._rows[self._index:self._index + size]
+        self._index += len(rows)
+        return list(rows)
+
+    def fetchall(self):
+        rows = self._rows[self._index:]
+        self._index = len(self._rows)
+        return list(rows)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self.cursor.close()
+
+    def nextset(self):
+        return None
+
+
+class ResultCache:
+    defaults = {
+        'tables': (),
+        'max_entries': 1000,
+        'max_rows': 1000,
+        'ttl': 60,
+    }
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid result cache option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+        self.tables = set(self.tables)
+        if not self.tables:
+            raise ImproperlyConfigured(
+                "The result cache requires 'tables', the tables whose reads are cached."
+            )
+        self._entries = OrderedDict()
+        # Keys of the entries that read each table.
+        self._tags = {}
+        # Incremented by each invalidation of a table, so that a result read
+        # while a write ran isn't stored.
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+            }
+
+    def clear(self):
+        self.invalidate(None)
+
+    def _cacheable_tables(self, query):
+        if not read_re.match(query) or primary_read_re.search(query):
+            return None
+        tables = query_tables(query)
+        if not tables or not tables <= self.tables or volatile_re.search(query):
+            return None
+        return frozenset(tables)
+
+    def execute(self, wrapper, query, args):
+        """Run a statement for a CursorWrapper, through the cache."""
+        db = wrapper.db
+        if isinstance(wrapper.cursor, CachedResult):
+            wrapper.cursor = wrapper.primary_cursor
+        tables = None
+        if wrapper.cacheable and db.autocommit and not db.in_atomic_block:
+            tables = self._cacheable_tables(query)
+        if tables is None:
+            if not write_re.match(query):
+                return wrapper._execute(query, args)
+            try:
+                return wrapper._execute(query, args)
+            finally:
+                self.wrote(db, query)
+        try:
+            key = (query, None if args is None else tuple(args), session_key(db))
+            hash(key)
+        except TypeError:
+            return wrapper._execute(query, args)
+        entry = self._get(key)
+        if entry is not None:
+            wrapper.cursor = CachedResult(entry, query, wrapper.primary_cursor)
+            return None
+        versions = self._get_versions(tables)
+        result = wrapper._execute(query, args)
+        rows = wrapper.cursor.fetchall()
+        entry = Entry(
+            wrapper.cursor.description, tuple(rows), wrapper.cursor.rowcount, tables,
+            None if self.ttl is None else time.monotonic() + self.ttl,
+        )
+        if len(entry.rows) <= self.max_rows:
+            self._put(key, entry, versions)
+        wrapper.cursor = CachedResult(entry, query, wrapper.primary_cursor)
+        return result
+
+    def wrote(self, db, query):
+        """
+        Invalidate the tables a write statement refers to (every table if
+        they can't be told), again when the current transaction commits.
+        """
+        tables = query_tables(query) or None
+        self.invalidate(tables)
+        if not db.autocommit or db.in_atomic_block:
+            # None stands for every table.
+            db.result_cache_dirty = db.result_cache_dirty | (tables or {None})
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _get_versions(self, tables):
+        with self._lock:
+            return self._generation, tuple(self._versions.get(table, 0) for table in tables)
+
+    def _put(self, key, entry, versions):
+        with self._lock:
+            if versions != (self._generation, tuple(self._versions.get(table, 0) for table in entry.tables)):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for table in entry.tables:
+                self._tags.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        # Must be called with self._lock held.
+        entry = self._entries.pop(key)
+        for table in entry.tables:
+            keys = self._tags.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[table]
+
+    def invalidate(self, tables):
+        """Drop the entries that read any of tables, or all if it's None."""
+        with self._lock:
+            self.invalidations += 1
+            if tables is None:
+                self._generation += 1
+                self._entries.clear()
+                self._tags.clear()
+                return
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in list(self._tags.get(table, ())):
+                    self._remove(key)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(key, options):
+    """Return the process-wide result cache of a database."""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResultCache(**options)
+        return cache
@@ -1,9 +1,243 @@
+"""
+Schema editor.
+
+With OPTIONS['online_ddl'] (True for the defaults), ALTER TABLE, CREATE
+INDEX and DROP INDEX statements ask the server to run without blocking
+writes to the table:
+
+    'OPTIONS': {
+        'online_ddl': {
+            'algorithm': 'instant',
+            'backfill_batch_size': 10000,
+            'backfill_max_lag': 5,
+        },
+    },
+
+Options:
+
+- algorithm: 'instant' tries ALGORITHM=INSTANT first on servers that
+  support it (MySQL >= 8.0.12, MariaDB >= 10.3.2), then ALGORITHM=INPLACE;
+  'inplace' starts with ALGORITHM=INPLACE.
+- lock: the LOCK of ALGORITHM=INPLACE statements, 'none' or 'shared'.
+- copy_fallback: whether a statement the server can't run online (errors
+  1845 and 1846) is run again without the clauses, which may copy the table
+  while blocking writes; a warning is logged. False raises the error.
+- backfill_batch_size: when set, a column added with a default is added as
+  nullable and without it, its value is written to the existing rows in
+  batches of this many primary keys, and then the column is made NOT NULL.
+  On servers with ALGORITHM=INSTANT, adding the column with its default
+  doesn't rewrite the table and is faster: leave this unset there.
+- backfill_pause: seconds to pause after each batch.
+- backfill_max_lag: with OPTIONS['replicas'], the backfill waits while a
+  replica lags more than this many seconds behind.
+
+Statements collected by sqlmigrate are shown without the clauses.
+"""
+import copy
+import logging
+import re
+import time
+
 import cymysql
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
 from django.db.backends.mysql import schema
+from django.db.models import NOT_PROVIDED
+
+from . import compression
+
+logger = logging.getLogger('mysql_cymysql.schema')
+
+# Statements that take ALGORITHM and LOCK clauses, and whether they are
+# ALTER TABLE statements, whose clauses are separated by commas.
+online_ddl_re = re.compile(r'\s*(?:(ALTER\s+TABLE)|(?:CREATE\s+(?:UNIQUE\s+)?|DROP\s+)INDEX)\b', re.IGNORECASE)
+
+# The server can't run the statement with the requested ALGORITHM or LOCK.
+not_online_error_codes = (
+    1845,  # ER_ALTER_OPERATION_NOT_SUPPORTED
+    1846,  # ER_ALTER_OPERATION_NOT_SUPPORTED_REASON
+)
+
+
+class OnlineDDL:
+    defaults = {
+        'algorithm': 'instant',
+        'lock': 'none',
+        'copy_fallback': True,
+        'backfill_batch_size': None,
+        'backfill_pause': 0,
+        'backfill_max_lag': 5,
+    }
+    algorithms = ('instant', 'inplace')
+    locks = ('none', 'shared')
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid online DDL option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+        if self.algorithm not in self.algorithms:
+            raise ImproperlyConfigured(
+                "Invalid online DDL algorithm '%s'. Use one of %s." % (self.algorithm, ', '.join(self.algorithms))
+            )
+        if self.lock not in self.locks:
+            raise ImproperlyConfigured(
+                "Invalid online DDL lock '%s'. Use one of %s." % (self.lock, ', '.join(self.locks))
+            )
+
+    def clauses(self, alter_table, supports_instant):
+        """Return the ALGORITHM and LOCK clauses to try, in order."""
+        clauses = []
+        # Index changes are never instant.
+        if alter_table and self.algorithm == 'instant' and supports_instant:
+            clauses.append(['ALGORITHM=INSTANT'])
+        clauses.append(['ALGORITHM=INPLACE', 'LOCK=%s' % self.lock.upper()])
+        return clauses
+
 
 class DatabaseSchemaEditor(schema.DatabaseSchemaEditor):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Connections to the replicas, to check their lag during backfills.
+        self._replica_connections = {}
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            for key in list(self._replica_connections):
+                self._close_replica_connection(key)
+
+    def _close_replica_connection(self, key):
+        connection = self._replica_connections.pop(key, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except cymysql.Error:
+                pass
+
     def quote_value(self, value):
         if isinstance(value, str):
             value = value.replace('%', '%%')
         return cymysql.converters.escape_item(value, 'utf-8')
+
+    def execute(self, sql, params=()):
+        online_ddl = self.connection.online_ddl
+        match = None if online_ddl is None or self.collect_sql else online_ddl_re.match(str(sql))
+        if match is None:
+            super().execute(sql, params)
+        else:
+            self._execute_online(online_ddl, str(sql), params, alter_table=bool(match[1]))
+
+    def _execute_online(self, online_ddl, sql, params, alter_table):
+        separator = ', ' if alter_table else ' '
+        clauses = online_ddl.clauses(alter_table, self.connection.features.supports_instant_ddl)
+        for i, clause in enumerate(clauses):
+            try:
+                super().execute(sql + separator + separator.join(clause), params)
+                return
+            except DatabaseError as e:
+                if e.args[0] not in not_online_error_codes:
+                    raise
+                if i + 1 < len(clauses):
+                    logger.info("%s isn't supported, trying %s: %s", clause[0], clauses[i + 1][0], e.args[1])
+                elif not online_ddl.copy_fallback:
+                    raise
+                else:
+                    logger.warning(
+                        "Running %s without ALGORITHM and LOCK, which may block writes to the table: %s",
+                        sql, e.args[1],
+                    )
+        super().execute(sql, params)
+
+    def add_field(self, model, field):
+        online_ddl = self.connection.online_ddl
+        if (
+            online_ddl is None or online_ddl.backfill_batch_size is None or self.collect_sql or
+            field.many_to_many or self.effective_default(field) is None
+        ):
+            return super().add_field(model, field)
+        # Add the column as nullable and without a default, which leaves the
+        # existing rows alone, then fill them in.
+        column = copy.copy(field)
+        column.null = True
+        column.default = NOT_PROVIDED
+        super().add_field(model, column)
+        self.backfill(model, field.column, self.effective_default(field))
+        if not field.null:
+            sql, params = self._alter_column_null_sql(model, column, field)
+            self.execute(self.sql_alter_column % {
+                'table': self.quote_name(model._meta.db_table),
+                'changes': sql,
+            }, params)
+
+    def backfill(self, model, column, value):
+        """
+        Set column to value in every row of model's table, in batches of
+        OPTIONS['online_ddl']['backfill_batch_size'] primary keys, each one
+        committed on its own outside transactions.
+        """
+        batch_size = self.connection.online_ddl.backfill_batch_size
+        table = self.quote_name(model._meta.db_table)
+        pk = self.quote_name(model._meta.pk.column)
+        update = 'UPDATE %s SET %s = %%s' % (table, self.quote_name(column))
+        last = None
+        rows = 0
+        with self.connection.cursor() as cursor:
+            while True:
+                where, params = ('', []) if last is None else (' WHERE %s > %%s' % pk, [last])
+                cursor.execute('SELECT %s FROM %s%s ORDER BY %s LIMIT 1 OFFSET %d' % (
+                    pk, table, where, pk, batch_size - 1,
+                ), params)
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute(update + where, [value, *params])
+                    rows += cursor.rowcount
+                    logger.info("Backfilled %s.%s in %d rows.", table, column, rows)
+                    return
+                bound = '%s <= %%s' % pk
+                cursor.execute(
+                    update + (where + ' AND ' if where else ' WHERE ') + bound,
+                    [value, *params, row[0]],
+                )
+                rows += cursor.rowcount
+                last = row[0]
+                self._throttle_backfill()
+
+    def _throttle_backfill(self):
+        online_ddl = self.connection.online_ddl
+        if online_ddl.backfill_pause:
+            time.sleep(online_ddl.backfill_pause)
+        replica_set = self.connection.replicas
+        if replica_set is None or online_ddl.backfill_max_lag is None:
+            return
+        while True:
+            lag = self._replica_lag(replica_set)
+            if lag is None or lag <= online_ddl.backfill_max_lag:
+                return
+            logger.info("A replica is %ss behind, pausing the backfill.", lag)
+            time.sleep(replica_set.check_interval)
+
+    def _replica_lag(self, replica_set):
+        """Return the largest lag of the replicas that are up, if known."""
+        lags = []
+        for state in replica_set.states:
+            if state.down_until > time.monotonic():
+                self._close_replica_connection(id(state))
+                continue
+            connection = self._replica_connections.get(id(state))
+            if connection is None:
+                try:
+                    connection = compression.connect(**replica_set.conn_params(state, replica_set.primary_params))
+                except cymysql.Error:
+                    replica_set.mark_down(state)
+                    continue
+                self._replica_connections[id(state)] = connection
+            replica_set.check(state, connection)
+            if state.lag is not None:
+                lags.append(state.lag)
+        return max(lags, default=None)
@@ -0,0 +1,67 @@
+"""
+Process-wide cache of server facts (version, sql_mode, ...).
+
+Django creates a DatabaseWrapper per thread and alias, so caching these on
+the wrapper means that every new thread queries them again. They are shared
+here instead, keyed by the server and database they were read from.
+
+SchemaVersions counts the DDL statements each database has run through this
+process, so that connections drop what they derived from the schema
+(prepared statements, introspection snapshots) when another connection
+altered it.
+"""
+import threading
+import time
+
+
+class ServerDataCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, ttl=None, stale_ok=False):
+        """
+        Return the data cached for key, calling loader() to (re)load it when
+        it's missing or older than ttl seconds. With stale_ok, data older
+        than ttl is returned as is, to be reloaded by a later call.
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and (ttl is None or stale_ok or now - entry[0] <= ttl):
+            return entry[1]
+        data = loader()
+        with self._lock:
+            self._entries[key] = (now, data)
+        return data
+
+    def refresh(self, key=None):
+        """Forget the data cached for key, or for every server if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+server_data_cache = ServerDataCache()
+
+
+class SchemaVersions:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._versions.get(key, 0)
+
+    def bump(self, key):
+        """Record that the schema of key changed."""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+
+schema_versions = SchemaVersions()
+
+
+def server_key(settings_dict):
+    return (settings_dict['HOST'], settings_dict['PORT'], settings_dict['NAME'])
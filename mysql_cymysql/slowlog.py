@@ -0,0 +1,104 @@
+"""
+Sampling slow-query log.
+
+With OPTIONS['slow_query_log'] = {'threshold': 0.5} (or True for the
+defaults), statements that take at least threshold seconds are logged to the
+'mysql_cymysql.slowlog' logger with their fingerprint, parameters and the
+plan the server reports for them with EXPLAIN FORMAT=JSON. The plan is
+captured on a separate short-lived connection, right after the statement
+ran. The log record carries these as attributes (alias, duration,
+fingerprint, sql, params, plan) for structured handlers.
+
+Options:
+
+- threshold: seconds a statement must take to be logged.
+- sample_rate: fraction of the slow statements that are logged.
+- explain: whether to capture the plan of SELECT, UPDATE and DELETE
+  statements.
+- redact: log the statement with placeholders and without its parameters.
+  No plan is captured since it quotes the parameters, e.g. in its
+  attached_condition fields.
+"""
+import logging
+import random
+import re
+
+import cymysql as Database
+
+from django.core.exceptions import ImproperlyConfigured
+
+from . import compression
+
+from .fingerprints import fingerprint
+
+logger = logging.getLogger('mysql_cymysql.slowlog')
+
+explainable_re = re.compile(r'\s*(?:SELECT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+
+class SlowQueryLog:
+    defaults = {
+        'threshold': 1.0,
+        'sample_rate': 1.0,
+        'explain': True,
+        'redact': False,
+    }
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(
+                "Invalid slow query log option(s): %s." % ', '.join(sorted(unknown))
+            )
+        for name, default in self.defaults.items():
+            setattr(self, name, options.get(name, default))
+
+    def log(self, db, cursor, query, args, duration):
+        """Log a statement that took duration seconds, if it's sampled."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        executed = db.ops.last_executed_query(cursor, query, args) or query
+        plan = None
+        # The plan of the executed statement holds its parameters.
+        if self.explain and not self.redact and explainable_re.match(executed):
+            plan = self.capture_plan(db, executed)
+        if self.redact:
+            sql, params = query, None
+        else:
+            sql, params = executed, args
+        logger.warning(
+            'Slow query (%.3fs) on %s: %s', duration, db.alias, sql,
+            extra={
+                'alias': db.alias,
+                'duration': duration,
+                'fingerprint': fingerprint(query),
+                'sql': sql,
+                'params': params,
+                'plan': plan,
+            },
+        )
+
+    def capture_plan(self, db, sql):
+        """
+        Return the EXPLAIN FORMAT=JSON output for sql, read on a new
+        connection with the parameters of db's connection, or None if it
+        can't be explained.
+        """
+        try:
+            connection = compression.connect(**db.connection_params)
+        except Database.Error:
+            logger.debug('Could not connect to capture a plan.', exc_info=True)
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute('EXPLAIN FORMAT=JSON ' + sql)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Database.Error:
+            logger.debug('Could not capture the plan of %s', sql, exc_info=True)
+            return None
+        finally:
+            try:
+                connection.close()
+            except Database.Error:
+                pass
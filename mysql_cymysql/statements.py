@@ -0,0 +1,378 @@
+"""
+Server-side prepared statements over the binary protocol.
+
+Statements are prepared with COM_STMT_PREPARE and run with COM_STMT_EXECUTE,
+so the server parses each statement once per connection, parameters are
+sent without escaping and rows come back in the binary row format. Prepared
+statements are tracked in a bounded LRU cache stored on the physical
+connection, so they are dropped along with it and survive being returned to
+the connection pool.
+"""
+import datetime
+import re
+import struct
+from collections import OrderedDict, namedtuple
+
+from cymysql.constants import FIELD_TYPE, FLAG, SERVER_STATUS
+from cymysql.converters import convert_characters, convert_json
+from cymysql.err import ProgrammingError
+from cymysql.packet import FieldDescriptorPacket, MysqlPacket
+
+from django.utils.regex_helper import _lazy_re_compile
+
+COM_STMT_PREPARE = 0x16
+COM_STMT_EXECUTE = 0x17
+COM_STMT_CLOSE = 0x19
+
+# Statements worth preparing; others (SHOW, SET, DDL, ...) run as is.
+preparable_re = _lazy_re_compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+# %s placeholders become ?, %% escapes become %.
+placeholder_re = _lazy_re_compile(r'%([%s])')
+
+PreparedStatement = namedtuple('PreparedStatement', 'statement_id num_params')
+
+# Errors of COM_STMT_PREPARE that preparing the statement again won't fix.
+unpreparable_codes = (
+    1064,  # Syntax error
+    1295,  # Not supported in the prepared statement protocol
+)
+
+
+def to_prepared_sql(query):
+    return placeholder_re.sub(lambda m: '?' if m.group(1) == 's' else '%', query)
+
+
+class StatementCache:
+    """
+    Map SQL text to PreparedStatements, least recently used first.
+
+    A value of None marks SQL that the server refused to prepare.
+    schema_version is the schema version (see server.SchemaVersions) the
+    statements were prepared under.
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.statements = OrderedDict()
+        self.schema_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.statements)
+
+    def get(self, sql):
+        """Return (found, statement) for sql, marking it as recently used."""
+        try:
+            statement = self.statements[sql]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self.statements.move_to_end(sql)
+        self.hits += 1
+        return True, statement
+
+    def add(self, sql, statement):
+        """
+        Cache a statement for sql. Return the statement evicted to make room
+        for it, if any.
+        """
+        evicted = None
+        if len(self.statements) >= self.max_size:
+            _, evicted = self.statements.popitem(last=False)
+            self.evictions += 1
+        self.statements[sql] = statement
+        return evicted
+
+    def clear(self):
+        """Forget every statement and return the ones to close."""
+        statements = [s for s in self.statements.values() if s is not None]
+        self.statements.clear()
+        return statements
+
+    def stats(self):
+        return {
+            'size': len(self.statements),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+def _read_packet(conn):
+    # MysqlPacket raises the server's error if this is an error packet.
+    return MysqlPacket(conn.socket.recv_packet(), conn.charset, conn.encoding).get_all_data()
+
+
+def _read_fields(conn, count):
+    fields = [
+        FieldDescriptorPacket(conn.socket.recv_packet(), conn.charset, conn.encoding)
+        for i in range(count)
+    ]
+    _read_packet(conn)  # EOF
+    return fields
+
+
+def prepare(conn, sql):
+    """Prepare sql on the connection and return a PreparedStatement."""
+    conn._execute_command(COM_STMT_PREPARE, to_prepared_sql(sql))
+    data = _read_packet(conn)
+    statement_id, num_columns, num_params = struct.unpack_from('<IHH', data, 1)
+    if num_params:
+        _read_fields(conn, num_params)
+    if num_columns:
+        _read_fields(conn, num_columns)
+    return PreparedStatement(statement_id, num_params)
+
+
+def close(conn, statement):
+    # The server doesn't reply to COM_STMT_CLOSE.
+    conn._execute_command(COM_STMT_CLOSE, struct.pack('<I', statement.statement_id))
+
+
+def _length_coded(n):
+    if n < 251:
+        return bytes((n,))
+    if n < 0x10000:
+        return b'\xfc' + struct.pack('<H', n)
+    if n < 0x1000000:
+        return b'\xfd' + struct.pack('<I', n)[:3]
+    return b'\xfe' + struct.pack('<Q', n)
+
+
+def _encode_param(value, encoding):
+    """
+    Return the type, unsigned flag and binary encoding of a value. Values
+    without a binary form (decimals, dates, ...) are sent as strings, which
+    the server converts as it does for the text protocol.
+    """
+    if isinstance(value, bool):
+        return FIELD_TYPE.TINY, 0, struct.pack('<b', value)
+    if isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            return FIELD_TYPE.LONGLONG, 0, struct.pack('<q', value)
+        if 0 <= value < (1 << 64):
+            return FIELD_TYPE.LONGLONG, 0x80, struct.pack('<Q', value)
+        value = str(value)
+    elif isinstance(value, float):
+        return FIELD_TYPE.DOUBLE, 0, struct.pack('<d', value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        return FIELD_TYPE.BLOB, 0, _length_coded(len(value)) + value
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat(' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    elif isinstance(value, datetime.timedelta):
+        seconds = value.days * 86400 + value.seconds
+        value = '%s%02d:%02d:%02d.%06d' % (
+            '-' if seconds < 0 else '', abs(seconds) // 3600, abs(seconds) // 60 % 60,
+            abs(seconds) % 60, value.microseconds,
+        )
+    elif not isinstance(value, str):
+        value = str(value)
+    value = value.encode(encoding)
+    return FIELD_TYPE.VAR_STRING, 0, _length_coded(len(value)) + value
+
+
+def execute(conn, statement, args):
+    """
+    Execute a prepared statement with args and return its BinaryResult,
+    which provides the interface of cymysql's MySQLResult.
+    """
+    if len(args) != statement.num_params:
+        raise ProgrammingError(
+            -1, 'Statement takes %d parameters, %d given.' % (statement.num_params, len(args))
+        )
+    payload = [struct.pack('<IBI', statement.statement_id, 0, 1)]
+    if args:
+        null_bitmap = bytearray((len(args) + 7) // 8)
+        types = []
+        values = []
+        for i, value in enumerate(args):
+            if value is None:
+                null_bitmap[i // 8] |= 1 << (i % 8)
+                types.append(struct.pack('<BB', FIELD_TYPE.NULL, 0))
+                continue
+            type_code, flag, encoded = _encode_param(value, conn.encoding)
+            types.append(struct.pack('<BB', type_code, flag))
+            values.append(encoded)
+        payload.append(bytes(null_bitmap))
+        payload.append(b'\x01')
+        payload.extend(types)
+        payload.extend(values)
+    conn._execute_command(COM_STMT_EXECUTE, b''.join(payload))
+    result = BinaryResult(conn)
+    result.read_result()
+    return result
+
+
+_struct_for_type = {
+    FIELD_TYPE.TINY: (struct.Struct('<b'), struct.Struct('<B')),
+    FIELD_TYPE.SHORT: (struct.Struct('<h'), struct.Struct('<H')),
+    FIELD_TYPE.YEAR: (struct.Struct('<h'), struct.Struct('<H')),
+    FIELD_TYPE.INT24: (struct.Struct('<i'), struct.Struct('<I')),
+    FIELD_TYPE.LONG: (struct.Struct('<i'), struct.Struct('<I')),
+    FIELD_TYPE.LONGLONG: (struct.Struct('<q'), struct.Struct('<Q')),
+    FIELD_TYPE.DOUBLE: (struct.Struct('<d'), struct.Struct('<d')),
+    FIELD_TYPE.FLOAT: (struct.Struct('<f'), struct.Struct('<f')),
+}
+_temporal_types = {FIELD_TYPE.DATE, FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP, FIELD_TYPE.TIME}
+
+
+class BinaryResult:
+    """The result of COM_STMT_EXECUTE, decoded from binary rows."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.affected_rows = None
+        self.insert_id = None
+        self.warning_count = 0
+        self.message = None
+        self.description = None
+        self.has_next = 0
+        self.has_result = False
+        self.rest_rows = None
+        self.rest_row_index = 0
+
+    def read_result(self):
+        conn = self.connection
+        packet = MysqlPacket(conn.socket.recv_packet(), conn.charset, conn.encoding)
+        if packet.is_ok_packet():
+            (self.affected_rows, self.insert_id, server_status,
+                self.warning_count, self.message) = packet.read_ok_packet()
+            self.has_next = server_status & SERVER_STATUS.SERVER_MORE_RESULTS_EXISTS
+            return
+        self.has_result = True
+        self.fields = _read_fields(conn, _read_length_coded_int(packet.get_all_data(), 0)[0])
+        self.description = tuple(field.description() for field in self.fields)
+        self.decoders = [self._decoder(field) for field in self.fields]
+        # Buffer the rows like MySQLResult does; commit() and rollback()
+        # don't expect unread rows on the connection.
+        self.read_rest_rowdata_packet()
+
+    def _decoder(self, field):
+        unpacker = _struct_for_type.get(field.type_code)
+        if unpacker is not None:
+            unpack = unpacker[1 if field.flags & FLAG.UNSIGNED else 0].unpack_from
+            if field.type_code == FIELD_TYPE.FLOAT:
+                # Round to float precision like the text protocol does.
+                return lambda data, pos: (float('%.7g' % unpack(data, pos)[0]), pos + 4)
+            return lambda data, pos, size=unpacker[0].size: (unpack(data, pos)[0], pos + size)
+        if field.type_code in _temporal_types:
+            return self._temporal_decoder(field)
+        convert = self.connection.conv.get(field.type_code)
+        encoding = self.connection.encoding
+
+        def decode(data, pos):
+            value, pos = _read_length_coded_bytes(data, pos)
+            if convert is None:
+                return value, pos
+            if convert in (convert_characters, convert_json):
+                return convert(value, encoding, field), pos
+            return convert(value), pos
+        return decode
+
+    def _temporal_decoder(self, field):
+        convert = self.connection.conv.get(field.type_code)
+        type_code = field.type_code
+
+        def decode(data, pos):
+            length = data[pos]
+            pos += 1
+            value = data[pos:pos + length]
+            pos += length
+            if type_code == FIELD_TYPE.TIME:
+                return _decode_time(value, convert), pos
+            if length == 0:
+                # Zero dates are returned as None, like cymysql's converters.
+                return None, pos
+            year, month, day = struct.unpack_from('<HBB', value)
+            hour = minute = second = microsecond = 0
+            if length >= 7:
+                hour, minute, second = value[4], value[5], value[6]
+            if length == 11:
+                microsecond = struct.unpack_from('<I', value, 7)[0]
+            try:
+                if type_code == FIELD_TYPE.DATE:
+                    return datetime.date(year, month, day), pos
+                return datetime.datetime(year, month, day, hour, minute, second, microsecond), pos
+            except ValueError:
+                # Dates with zero parts such as 2024-00-00 too.
+                return None, pos
+        return decode
+
+    def fetchone(self):
+        if not self.has_result:
+            return None
+        if self.rest_rows is None:
+            return self._read_row()
+        if self.rest_row_index < len(self.rest_rows):
+            self.rest_row_index += 1
+            return self.rest_rows[self.rest_row_index - 1]
+        return None
+
+    def read_rest_rowdata_packet(self):
+        if not self.has_result or self.rest_rows is not None:
+            return
+        rows = []
+        row = self._read_row()
+        while row is not None:
+            rows.append(row)
+            row = self._read_row()
+        self.rest_rows = rows
+        self.rest_row_index = 0
+
+    def _read_row(self):
+        conn = self.connection
+        packet = MysqlPacket(conn.socket.recv_packet(), conn.charset, conn.encoding)
+        is_eof, warning_count, server_status = packet.is_eof_and_status()
+        if is_eof:
+            self.warning_count = warning_count
+            self.has_next = server_status & SERVER_STATUS.SERVER_MORE_RESULTS_EXISTS
+            self.rest_rows = []
+            return None
+        data = packet.get_all_data()
+        # Header byte, then a NULL bitmap with an offset of 2 bits.
+        pos = 1 + (len(self.decoders) + 9) // 8
+        row = []
+        for i, decode in enumerate(self.decoders):
+            bit = i + 2
+            if data[1 + bit // 8] & (1 << (bit % 8)):
+                row.append(None)
+                continue
+            value, pos = decode(data, pos)
+            row.append(value)
+        return tuple(row)
+
+
+def _read_length_coded_int(data, pos):
+    first = data[pos]
+    pos += 1
+    if first < 251:
+        return first, pos
+    if first == 0xfc:
+        return struct.unpack_from('<H', data, pos)[0], pos + 2
+    if first == 0xfd:
+        return struct.unpack('<I', data[pos:pos + 3] + b'\x00')[0], pos + 3
+    return struct.unpack_from('<Q', data, pos)[0], pos + 8
+
+
+def _read_length_coded_bytes(data, pos):
+    length, pos = _read_length_coded_int(data, pos)
+    return data[pos:pos + length], pos + length
+
+
+def _decode_time(value, convert):
+    """
+    Decode a binary TIME into its text form and hand it to the connection's
+    TIME converter, which decides between timedelta and time.
+    """
+    if not value:
+        text = '00:00:00'
+    else:
+        negative, days, hour, minute, second = struct.unpack_from('<BIBBB', value)
+        text = '%s%02d:%02d:%02d' % ('-' if negative else '', days * 24 + hour, minute, second)
+        if len(value) == 12:
+            text += '.%06d' % struct.unpack_from('<I', value, 8)[0]
+    text = text.encode()
+    return convert(text) if convert is not None else text
@@ -0,0 +1,186 @@
+"""
+A scripted stand-in for a MySQL server, for tests that don't need one.
+
+FakeSocket replaces cymysql's SocketWrapper: it records the commands a
+connection sends and answers each with the packets its reply function
+returns for it. The packet helpers build the payloads of the protocol's
+OK, error and result set packets.
+"""
+import struct
+import time
+import uuid
+from collections import deque
+from unittest import mock
+
+from cymysql.connections import Connection
+from cymysql.constants import COMMAND
+
+from mysql_cymysql.base import DatabaseWrapper
+from mysql_cymysql.decoders import django_conversions
+from mysql_cymysql.server import server_data_cache, server_key
+
+SERVER_DATA = {
+    'version': '8.0.36',
+    'sql_mode': 'ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES',
+    'default_storage_engine': 'InnoDB',
+    'sql_auto_is_null': False,
+    'lower_case_table_names': False,
+    'has_zoneinfo_database': True,
+    'max_allowed_packet': 64 * 1024 * 1024,
+}
+
+
+def lenenc_int(n):
+    if n < 251:
+        return bytes((n,))
+    if n < 1 << 16:
+        return b'\xfc' + struct.pack('<H', n)
+    if n < 1 << 24:
+        return b'\xfd' + struct.pack('<I', n)[:3]
+    return b'\xfe' + struct.pack('<Q', n)
+
+
+def lenenc_str(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return lenenc_int(len(value)) + value
+
+
+def ok(affected_rows=0, insert_id=0, status=2, warnings=0):
+    return b'\x00' + lenenc_int(affected_rows) + lenenc_int(insert_id) + struct.pack('<HH', status, warnings)
+
+
+def eof(status=2, warnings=0):
+    return b'\xfe' + struct.pack('<HH', warnings, status)
+
+
+def error(code, message, state='HY000'):
+    return b'\xff' + struct.pack('<H', code) + b'#' + state.encode() + message.encode()
+
+
+def field(name, type_code, charsetnr=33, length=11, flags=0, decimals=0):
+    return (
+        lenenc_str('def') + lenenc_str('db') + lenenc_str('t') + lenenc_str('t') +
+        lenenc_str(name) + lenenc_str(name) + b'\x0c' +
+        struct.pack('<HIBHB', charsetnr, length, type_code, flags, decimals) + b'\x00\x00'
+    )
+
+
+def result_set(fields, rows):
+    """
+    The packets of a text protocol result set. fields are (name, type_code)
+    tuples or field() packets, rows tuples of str, bytes or None.
+    """
+    packets = [lenenc_int(len(fields))]
+    packets += [f if isinstance(f, bytes) else field(*f) for f in fields]
+    packets.append(eof())
+    for row in rows:
+        packets.append(b''.join(b'\xfb' if value is None else lenenc_str(value) for value in row))
+    packets.append(eof())
+    return packets
+
+
+def ok_reply(command, payload):
+    return [ok()]
+
+
+class RawSocket:
+    """
+    The socket under a FakeSocket, which passes the packets through it so
+    that instrumentation.CountingSocket can count them.
+    """
+    def sendall(self, data):
+        pass
+
+    def recv(self, size):
+        return bytes(size)
+
+
+class FakeSocket:
+    def __init__(self, reply=ok_reply):
+        self.reply = reply
+        self.commands = []
+        self.replies = deque()
+        self.closed = False
+        self._sock = RawSocket()
+
+    @property
+    def queries(self):
+        return [payload.decode() for command, payload in self.commands if command == COMMAND.COM_QUERY]
+
+    def send_packet(self, data):
+        self._sock.sendall(data)
+        command, payload = data[4], data[5:]
+        self.commands.append((command, payload))
+        if command != COMMAND.COM_QUIT:
+            self.replies.extend(self.reply(command, payload))
+
+    def recv_packet(self):
+        packet = self.replies.popleft()
+        # With the 4 byte header.
+        self._sock.recv(len(packet) + 4)
+        return packet
+
+    def close(self):
+        self.closed = True
+
+
+def query_reply(results):
+    """
+    A reply function that answers queries starting with a key of results
+    with its packets (or a callable returning them), and other commands
+    with an OK packet.
+    """
+    def reply(command, payload):
+        if command == COMMAND.COM_QUERY:
+            sql = payload.decode()
+            for prefix, packets in results.items():
+                if sql.startswith(prefix):
+                    return packets(sql) if callable(packets) else list(packets)
+        return [ok()]
+    return reply
+
+
+def connect(reply=ok_reply, **params):
+    """A cymysql Connection on a FakeSocket, as cymysql.connect() returns it."""
+    params.pop('compression', None)
+    params.setdefault('conv', django_conversions)
+    connection = Connection(**params)
+    connection.socket = FakeSocket(reply)
+    # Read from the handshake.
+    connection.server_version = SERVER_DATA['version']
+    return connection
+
+
+def make_wrapper(options=None, server_data=None, alias='fake', **settings):
+    """
+    A DatabaseWrapper for a database of its own, whose server data is
+    server_data (SERVER_DATA by default).
+    """
+    settings_dict = {
+        'ENGINE': 'mysql_cymysql',
+        'NAME': 'fake_%s' % uuid.uuid4().hex,
+        'USER': 'user',
+        'PASSWORD': '',
+        'HOST': '',
+        'PORT': '',
+        'OPTIONS': options or {},
+        'AUTOCOMMIT': True,
+        'ATOMIC_REQUESTS': False,
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'TIME_ZONE': None,
+        'TEST': {'CHARSET': None, 'COLLATION': None, 'MIRROR': None, 'NAME': None},
+        **settings,
+    }
+    server_data_cache._entries[server_key(settings_dict)] = (time.monotonic(), dict(server_data or SERVER_DATA))
+    return DatabaseWrapper(settings_dict, alias)
+
+
+def connected_wrapper(reply=ok_reply, options=None, **kwargs):
+    """A make_wrapper() DatabaseWrapper connected to a FakeSocket."""
+    wrapper = make_wrapper(options, **kwargs)
+    with mock.patch('mysql_cymysql.compression.connect', side_effect=lambda **params: connect(reply, **params)):
+        wrapper.ensure_connection()
+    wrapper.connection.socket.commands.clear()
+    return wrapper
@@ -0,0 +1,235 @@
+import asyncio
+import enum
+from unittest import TestCase, mock
+
+from cymysql.err import IntegrityError as DriverIntegrityError, OperationalError as DriverOperationalError
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, OperationalError, connections
+
+from mysql_cymysql import aio
+from mysql_cymysql.pool import COM_RESET_CONNECTION
+
+from . import fakes
+
+
+class Kind(enum.Enum):
+    A = 'a'
+
+
+class FakeAsyncCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def execute(self, query, args=None):
+        self.connection.queries.append((query, args))
+        if self.connection.error is not None:
+            raise self.connection.error
+
+    async def executemany(self, query, args):
+        self.connection.queries.append((query, args))
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncConnection:
+    """The part of cymysql.aio's AsyncConnection used by aio.py."""
+
+    charset = 'utf8'
+    server_version = '8.0.36'
+
+    def __init__(self, error=None):
+        self.error = error
+        self.queries = []
+        self.commands = []
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeAsyncCursor(self)
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    async def autocommit(self, value):
+        self.queries.append(('SET AUTOCOMMIT = %d' % value, None))
+
+    async def set_charset(self, charset):
+        self.queries.append(("SET NAMES '%s'" % charset, None))
+
+    async def _execute_command(self, command, payload):
+        self.commands.append((command, payload))
+
+    async def read_packet(self):
+        if self.error is not None:
+            raise self.error
+
+    async def close(self):
+        self.closed = True
+
+    def _is_connect(self):
+        return not self.closed
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class AsyncCursorWrapperTests(TestCase):
+    def execute_raising(self, error):
+        db = aio.AsyncDatabaseConnection(FakeAsyncConnection(error), 'default')
+
+        async def execute():
+            async with db.cursor() as cursor:
+                await cursor.aexecute('INSERT INTO t VALUES (%s)', [1])
+        return db, execute()
+
+    def test_integrity_errors_are_mapped(self):
+        db, execute = self.execute_raising(DriverIntegrityError(1062, "Duplicate entry '1'"))
+        with self.assertRaises(IntegrityError):
+            run(execute)
+        # Bad data doesn't make the connection unusable.
+        self.assertIs(db.errors_occurred, False)
+        self.assertTrue(db.is_usable())
+
+    def test_misclassified_integrity_errors_are_mapped(self):
+        db, execute = self.execute_raising(DriverOperationalError(1048, "Column 'a' cannot be null"))
+        with self.assertRaises(IntegrityError):
+            run(execute)
+
+    def test_operational_errors_make_the_connection_unusable(self):
+        db, execute = self.execute_raising(DriverOperationalError(2013, 'Lost connection'))
+        with self.assertRaises(OperationalError):
+            run(execute)
+        self.assertIs(db.errors_occurred, True)
+        self.assertFalse(db.is_usable())
+
+    def test_executemany_converts_enums(self):
+        connection = FakeAsyncConnection()
+        db = aio.AsyncDatabaseConnection(connection, 'default')
+        run(db.cursor().aexecutemany('INSERT INTO t VALUES (%s, %s)', [(Kind.A, 1), [2, Kind.A]]))
+        self.assertEqual(connection.queries, [('INSERT INTO t VALUES (%s, %s)', [['a', 1], [2, 'a']])])
+
+
+class AsyncConnectionPoolTests(TestCase):
+    def setUp(self):
+        self.connections = []
+
+        self.server_version = '8.0.36'
+
+        async def connect(alias, conn_params, setup, autocommit):
+            connection = FakeAsyncConnection()
+            connection.server_version = self.server_version
+            self.connections.append(connection)
+            return aio.AsyncDatabaseConnection(connection, alias)
+
+        settings = ({}, ['SET SQL_AUTO_IS_NULL = 0'], True, None)
+        for target, patch in (
+            ('mysql_cymysql.aio._connect', {'side_effect': connect}),
+            ('mysql_cymysql.aio._connection_settings', {'return_value': settings}),
+        ):
+            patcher = mock.patch(target, **patch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_connections_are_reused(self):
+        async def test():
+            pool = aio.AsyncConnectionPool(max_size=2)
+            async with pool.connection() as db:
+                pass
+            async with pool.connection() as again:
+                self.assertIs(again, db)
+            self.assertEqual((pool.size, pool.idle), (1, 1))
+        run(test())
+
+    def test_release_resets_the_session(self):
+        async def test():
+            pool = aio.AsyncConnectionPool()
+            async with pool.connection() as db:
+                await db.cursor().aexecute('SET @a = 1')
+            connection = self.connections[0]
+            self.assertEqual(connection.commands, [(COM_RESET_CONNECTION, b'')])
+            self.assertEqual(connection.queries, [
+                ('SET @a = 1', None),
+                ("SET NAMES 'utf8'", None),
+                ('SET SQL_AUTO_IS_NULL = 0', None),
+                ('SET AUTOCOMMIT = 1', None),
+            ])
+            self.assertEqual(pool.idle, 1)
+        run(test())
+
+    def test_connection_that_fails_reset_is_closed(self):
+        async def test():
+            pool = aio.AsyncConnectionPool()
+            async with pool.connection():
+                self.connections[0].error = DriverOperationalError(1047, 'Unknown command')
+            self.assertEqual((pool.size, pool.idle), (0, 0))
+            self.assertTrue(self.connections[0].closed)
+        run(test())
+
+    def test_servers_without_reset_raise(self):
+        self.server_version = '5.6.51'
+
+        async def test():
+            pool = aio.AsyncConnectionPool()
+            with self.assertRaises(ImproperlyConfigured):
+                await pool.acquire()
+            self.assertEqual(pool.size, 0)
+            self.assertTrue(self.connections[0].closed)
+        run(test())
+
+    def test_broken_connections_are_closed(self):
+        async def test():
+            pool = aio.AsyncConnectionPool()
+            async with pool.connection() as db:
+                db.errors_occurred = True
+            self.assertEqual((pool.size, pool.idle), (0, 0))
+            self.assertTrue(self.connections[0].closed)
+        run(test())
+
+    def test_timeout(self):
+        async def test():
+            pool = aio.AsyncConnectionPool(max_size=1, timeout=0.01)
+            async with pool.connection():
+                with self.assertRaises(DriverOperationalError):
+                    await pool.acquire()
+        run(test())
+
+
+class ConnectionSettingsTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.make_wrapper(
+            {'sql_mode': 'TRADITIONAL', 'init_command': 'SET @a = 1', 'slow_query_log': True},
+            alias='async',
+        )
+        connections['async'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'async')
+
+    def test_settings(self):
+        conn_params, setup, autocommit, pool_options = aio._connection_settings('async')
+        self.assertNotIn('sql_mode', conn_params)
+        self.assertNotIn('init_command', conn_params)
+        self.assertEqual(conn_params['db'], self.wrapper.settings_dict['NAME'])
+        self.assertEqual(setup, [
+            "SET sql_mode='TRADITIONAL'", 'SET @a = 1', 'SET SQL_AUTO_IS_NULL = 0',
+            'SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED',
+        ])
+        self.assertIs(autocommit, True)
+        self.assertIsNone(pool_options)
+        # The alias' wrapper isn't set up.
+        self.assertIsNone(self.wrapper.slow_query_log)
+        self.assertIsNone(self.wrapper.connection_params)
+
+    def test_parameters_of_a_connected_wrapper_are_reused(self):
+        # As get_new_connection() leaves them.
+        self.wrapper.connection_params = {'db': 'connected', 'sql_mode': 'ANSI'}
+        self.wrapper.isolation_level, self.wrapper.pool_options = 'serializable', {'max_size': 2}
+        slow_query_log = self.wrapper.slow_query_log = mock.Mock()
+        conn_params, setup, autocommit, pool_options = aio._connection_settings('async')
+        self.assertEqual(conn_params, {'db': 'connected'})
+        self.assertEqual(setup, [
+            "SET sql_mode='ANSI'", 'SET SQL_AUTO_IS_NULL = 0', 'SET SESSION TRANSACTION ISOLATION LEVEL SERIALIZABLE',
+        ])
+        self.assertEqual(pool_options, {'max_size': 2})
+        self.assertIs(self.wrapper.slow_query_log, slow_query_log)
+        self.assertEqual(self.wrapper.connection_params, {'db': 'connected', 'sql_mode': 'ANSI'})
@@ -0,0 +1,155 @@
+import io
+import re
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE, FLAG
+from django.db import DataError, connections, models
+
+from mysql_cymysql.blobs import open_blob, write_blob
+
+from . import fakes
+
+ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 'Z': '\032'}
+BINARY = fakes.field('value', FIELD_TYPE.VAR_STRING, charsetnr=63, flags=FLAG.BINARY)
+INTEGER = ('value', FIELD_TYPE.LONGLONG)
+# max_statement_size() leaves write_blob() 1536 bytes per chunk.
+MAX_ALLOWED_PACKET = 4096
+
+
+class Attachment(models.Model):
+    data = models.BinaryField()
+    text = models.TextField()
+
+    class Meta:
+        app_label = 'tests'
+
+
+def literal(sql):
+    """Decode the literal of a SET statement."""
+    value = sql.split(None, 3)[3] if ' CONCAT(' not in sql else sql.split(', ', 1)[1][:-1]
+    if value.startswith('0x'):
+        return bytes.fromhex(value[2:])
+    return re.sub(r'\\(.)', lambda m: ESCAPES.get(m[1], m[1]), value[1:-1]).encode()
+
+
+class BlobServer:
+    """Keeps the value of one column and the user variable write_blob() uses."""
+
+    def __init__(self, value=b'', charset='utf8mb4', stored=None):
+        self.value = value
+        self.charset = charset
+        # What the server stores of the variable, to fake truncation.
+        self.stored = stored
+        self.variable = None
+        self.row_exists = True
+
+    def __call__(self, command, payload):
+        sql = payload.decode()
+        if sql.startswith('SET @mysql_cymysql_blob = NULL'):
+            self.variable = None
+        elif sql.startswith('SET @mysql_cymysql_blob = CONCAT('):
+            self.variable += literal(sql)
+        elif sql.startswith('SET @mysql_cymysql_blob = '):
+            self.variable = literal(sql)
+        elif sql.startswith('UPDATE'):
+            self.value = self.variable if self.stored is None else self.stored(self.variable)
+            return [fakes.ok(affected_rows=1)]
+        elif sql.startswith('SELECT 1 FROM'):
+            return fakes.result_set([INTEGER], [('1',)] if self.row_exists else [])
+        elif re.match(r'SELECT (CHAR_)?LENGTH\(`\w+`\) = ', sql):
+            same = None if self.value is None else str(int(self.value == self.variable))
+            return fakes.result_set([INTEGER], [(same,)])
+        elif sql.startswith('SELECT LENGTH(CONVERT('):
+            return fakes.result_set([INTEGER], [(str(len(self.value)),)])
+        elif sql.startswith('SELECT LENGTH('):
+            size = None if self.value is None else str(len(self.value))
+            charset = 'binary' if self.value is None else self.charset
+            return fakes.result_set([INTEGER, ('charset', FIELD_TYPE.VAR_STRING)], [(size, charset)])
+        elif sql.startswith('SELECT SUBSTRING('):
+            start, size = map(int, re.search(r', (\d+), (\d+)\) FROM', sql).groups())
+            return fakes.result_set([BINARY], [(self.value[start - 1:start - 1 + size],)])
+        return [fakes.ok()]
+
+
+class BlobTests(TestCase):
+    def setUp(self):
+        self.server = BlobServer()
+        self.wrapper = fakes.connected_wrapper(
+            self.server, server_data={**fakes.SERVER_DATA, 'max_allowed_packet': MAX_ALLOWED_PACKET},
+        )
+        connections['blobs'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'blobs')
+        self.obj = Attachment(pk=1)
+        self.obj._state.db = 'blobs'
+
+    def queries(self):
+        return self.wrapper.connection.socket.queries
+
+    def statements(self):
+        return [q for q in self.queries() if q.startswith(('SET @', 'UPDATE'))]
+
+    def assertStatementsFit(self):
+        # max_statement_size() leaves room for the rest of the statement.
+        limit = self.wrapper.ops.max_statement_size() + self.wrapper.ops.packet_margin
+        for statement in self.statements():
+            self.assertLessEqual(len(statement.encode()), limit)
+
+    def test_write_and_read_binary(self):
+        data = bytes(range(256)) * 12
+        self.assertEqual(write_blob(self.obj, 'data', io.BytesIO(data)), len(data))
+        self.assertEqual(self.server.value, data)
+        statements = self.statements()
+        # Two chunks assembled in the variable, one UPDATE.
+        self.assertEqual(len(statements), 4)
+        self.assertEqual(statements[2], 'UPDATE `tests_attachment` SET `data` = @mysql_cymysql_blob WHERE `id` = 1')
+        self.assertEqual(statements[3], 'SET @mysql_cymysql_blob = NULL')
+        self.assertStatementsFit()
+        with open_blob(self.obj, 'data', chunk_size=1000) as blob:
+            self.assertEqual(blob.read(), data)
+            blob.seek(-10, io.SEEK_END)
+            self.assertEqual(blob.read(), data[-10:])
+
+    def test_text_chunks_are_sized_in_bytes(self):
+        text = 'a\U0001f600\'\\' * 250
+        self.assertEqual(write_blob(self.obj, 'text', io.StringIO(text)), len(text.encode()))
+        self.assertEqual(self.server.value, text.encode())
+        self.assertStatementsFit()
+        with open_blob(self.obj, 'text') as blob:
+            self.assertEqual(blob.read(), text)
+        self.assertTrue(self.queries()[-1].startswith('SELECT SUBSTRING(CAST(`text` AS BINARY), '))
+
+    def test_text_in_other_character_sets_is_converted(self):
+        self.server.value = 'caf\xe9'.encode()
+        self.server.charset = 'latin1'
+        with open_blob(self.obj, 'text') as blob:
+            self.assertEqual(blob.read(), 'caf\xe9')
+        self.assertIn('SUBSTRING(CAST(CONVERT(`text` USING utf8mb4) AS BINARY), 1, 5)', self.queries()[-1])
+
+    def test_values_larger_than_max_allowed_packet(self):
+        self.server.value = b'old'
+        with self.assertRaisesRegex(DataError, r'larger than max_allowed_packet \(4096 bytes\)'):
+            write_blob(self.obj, 'data', io.BytesIO(b'x' * (MAX_ALLOWED_PACKET + 1)))
+        self.assertEqual(self.server.value, b'old')
+        self.assertFalse(any(q.startswith('UPDATE') for q in self.queries()))
+        self.assertEqual(self.statements()[-1], 'SET @mysql_cymysql_blob = NULL')
+        self.assertIn('ROLLBACK', self.queries())
+
+    def test_values_not_stored_whole(self):
+        for stored in (lambda value: value[:10], lambda value: None):
+            self.server.stored = stored
+            with self.subTest(stored=stored), self.assertRaisesRegex(DataError, 'not stored whole'):
+                write_blob(self.obj, 'data', io.BytesIO(b'x' * 100))
+
+    def test_missing_row(self):
+        self.server.row_exists = False
+        with self.assertRaises(Attachment.DoesNotExist):
+            write_blob(self.obj, 'data', io.BytesIO(b'x'))
+        self.assertEqual(self.statements(), [])
+
+    def test_empty_and_null_values(self):
+        self.assertEqual(write_blob(self.obj, 'data', io.BytesIO()), 0)
+        self.assertEqual(self.server.value, b'')
+        self.server.value = None
+        with open_blob(self.obj, 'data') as blob:
+            self.assertIsNone(blob.raw.size)
+            self.assertEqual(blob.read(), b'')
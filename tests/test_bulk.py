@@ -0,0 +1,194 @@
+import datetime
+from unittest import TestCase, mock
+
+from cymysql.constants import COMMAND
+from django.db import IntegrityError, NotSupportedError, connections, models
+
+from mysql_cymysql.bulk import _batches, bulk_update, encode_row, load_rows, upsert
+from mysql_cymysql.operations import MAX_PACKET_SIZE
+from mysql_cymysql.replicas import ReplicaSet
+
+from . import fakes
+
+
+class InfileSocket(fakes.FakeSocket):
+    """
+    Answers LOAD DATA LOCAL INFILE with a file request and collects the
+    data packets that follow until the empty one, which is answered with
+    reply_to_data.
+    """
+    def __init__(self, reply_to_data=None, request=True):
+        super().__init__()
+        self.reply_to_data = reply_to_data or [fakes.ok(affected_rows=3, warnings=1)]
+        self.request = request
+        self.data = None
+
+    def send_packet(self, data):
+        if self.data is not None:
+            payload = data[4:]
+            if payload:
+                self.data.append(payload)
+            else:
+                self.data = b''.join(self.data)
+                self.replies.extend(self.reply_to_data)
+            return
+        super().send_packet(data)
+        if data[4] == COMMAND.COM_QUERY and data[5:].startswith(b'LOAD DATA'):
+            self.replies.clear()
+            if self.request:
+                self.data = []
+                self.replies.append(b'\xfbrows')
+            else:
+                self.replies.append(fakes.ok())
+
+
+class EncodeRowTests(TestCase):
+    def test_values_are_quoted_like_literals(self):
+        self.assertEqual(
+            encode_row([1, 'a\'b\n', None, b'\x00\\x']),
+            b"1,'a\\'b\\n',NULL,'\\0\\\\x'\n",
+        )
+
+
+class LoadRowsTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper()
+
+    def test_rows_are_streamed_in_packets(self):
+        socket = self.wrapper.connection.socket = InfileSocket()
+        rows = [(i, 'row %d' % i) for i in range(3)]
+        result = load_rows(self.wrapper, 't', iter(rows), columns=['a', 'b'], buffer_size=8)
+        self.assertEqual(result, (3, 1))
+        self.assertEqual(
+            socket.queries,
+            ["LOAD DATA LOCAL INFILE 'rows' INTO TABLE `t` CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' "
+             "OPTIONALLY ENCLOSED BY '\\'' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' (`a`, `b`)"],
+        )
+        self.assertEqual(socket.data, b"0,'row 0'\n1,'row 1'\n2,'row 2'\n")
+
+    def test_error_in_rows_finishes_the_exchange(self):
+        socket = self.wrapper.connection.socket = InfileSocket()
+
+        def rows():
+            yield (1, 'a')
+            raise KeyError('row')
+
+        with self.assertRaises(KeyError):
+            load_rows(self.wrapper, 't', rows(), columns=['a', 'b'])
+        self.assertEqual(socket.data, b"1,'a'\n")
+        self.assertFalse(socket.replies)
+
+    def test_server_error_is_raised(self):
+        self.wrapper.connection.socket = InfileSocket([fakes.error(1062, "Duplicate entry '1'")])
+        with self.assertRaises(IntegrityError):
+            load_rows(self.wrapper, 't', [(1, 'a')], columns=['a', 'b'])
+
+    def test_no_file_request(self):
+        self.wrapper.connection.socket = InfileSocket(request=False)
+        with self.assertRaises(NotSupportedError):
+            load_rows(self.wrapper, 't', [(1, 'a')], columns=['a', 'b'])
+
+    def test_table_name_requires_columns(self):
+        with self.assertRaises(ValueError):
+            load_rows(self.wrapper, 't', [(1, 'a')])
+
+    def test_model_instances_are_pre_saved(self):
+        socket = self.wrapper.connection.socket = InfileSocket()
+        created = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        with mock.patch('django.utils.timezone.now', return_value=created):
+            load_rows(self.wrapper, Entry, [Entry(name='caf\xe9')])
+        self.assertEqual(socket.data, "NULL,'caf\xe9','2024-01-02 03:04:05'\n".encode())
+
+    def test_reads_that_follow_go_to_the_primary(self):
+        self.wrapper.connection.socket = InfileSocket()
+        self.wrapper.replicas = ReplicaSet(hosts=[{'HOST': 'replica'}])
+        load_rows(self.wrapper, 't', [(1, 'a')], columns=['a', 'b'])
+        self.assertIs(self.wrapper.read_primary, True)
+
+
+class Entry(models.Model):
+    name = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class Price(models.Model):
+    sku = models.CharField(max_length=100, unique=True)
+    amount = models.IntegerField()
+
+    class Meta:
+        app_label = 'tests'
+
+
+class WriteTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(
+            self.reply, alias='bulk', server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 2048},
+        )
+        connections['bulk'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'bulk')
+        # Rows affected by each statement: 1 per row, 2 per updated row.
+        self.affected_rows = []
+
+    def reply(self, command, payload):
+        if payload.startswith((b'INSERT', b'UPDATE')):
+            return [fakes.ok(affected_rows=self.affected_rows.pop(0))]
+        return [fakes.ok()]
+
+    def statements(self):
+        return [q for q in self.wrapper.connection.socket.queries if q.startswith(('INSERT', 'UPDATE'))]
+
+    def test_upsert(self):
+        # The second row without a primary key is updated.
+        self.affected_rows = [1, 3]
+        prices = [Price(pk=1, sku='a', amount=1), Price(sku='b', amount=2), Price(sku='c', amount=3)]
+        result = upsert(self.wrapper, Price, prices, update_fields=['amount'])
+        self.assertEqual((result.rows, result.updated), (3, 1))
+        self.assertEqual(self.statements(), [
+            "INSERT INTO `tests_price` (`id`, `sku`, `amount`) VALUES (1,'a',1) AS _new "
+            "ON DUPLICATE KEY UPDATE `amount` = _new.`amount`",
+            "INSERT INTO `tests_price` (`sku`, `amount`) VALUES ('b',2), ('c',3) AS _new "
+            "ON DUPLICATE KEY UPDATE `amount` = _new.`amount`",
+        ])
+
+    def test_upsert_batches_fit_in_a_statement(self):
+        prices = [Price(sku='%04d' % i + 'x' * 100, amount=i) for i in range(50)]
+        self.affected_rows = [1000] * 50
+        result = upsert(self.wrapper, Price, prices)
+        statements = self.statements()
+        self.assertGreater(len(statements), 1)
+        self.assertEqual(sum(statement.count('x' * 100) for statement in statements), 50)
+        for statement in statements:
+            self.assertLessEqual(len(statement), self.wrapper.ops.max_statement_size())
+        self.assertEqual(result.rows, 50)
+
+    def test_bulk_update(self):
+        self.affected_rows = [2]
+        prices = [Price(pk=1, sku='a', amount=10), Price(pk=2, sku='b', amount=20)]
+        self.assertEqual(bulk_update(self.wrapper, Price, prices, ['amount']), 2)
+        self.assertEqual(self.statements(), [
+            'UPDATE `tests_price` JOIN (SELECT 1 AS `id`, 10 AS `amount` UNION ALL SELECT 2, 20) AS _rows '
+            'ON `tests_price`.`id` = _rows.`id` SET `tests_price`.`amount` = _rows.`amount`',
+        ])
+
+    def test_bulk_update_batches_fit_in_a_statement(self):
+        prices = [Price(pk=i, sku='s', amount=i) for i in range(1, 301)]
+        self.affected_rows = [1000] * 300
+        bulk_update(self.wrapper, Price, prices, ['sku', 'amount'])
+        statements = self.statements()
+        self.assertGreater(len(statements), 1)
+        for statement in statements:
+            self.assertLessEqual(len(statement), self.wrapper.ops.max_statement_size())
+
+    def test_bulk_update_requires_primary_keys(self):
+        self.assertEqual(bulk_update(self.wrapper, Price, [], ['amount']), 0)
+        with self.assertRaisesRegex(ValueError, 'must have a primary key'):
+            bulk_update(self.wrapper, Price, [Price(sku='a', amount=1)], ['amount'])
+
+    def test_batches_are_capped_at_the_largest_packet(self):
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 1 << 30})
+        batches = list(_batches(wrapper, range(40), lambda row: 1 << 20, 0))
+        self.assertEqual([len(batch) for batch in batches], [15, 15, 10])
+        self.assertLess(15 << 20, MAX_PACKET_SIZE)
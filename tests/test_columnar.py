@@ -0,0 +1,93 @@
+import unittest
+from array import array
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.db import models
+
+from mysql_cymysql import columnar
+from mysql_cymysql.columnar import ColumnBuilder, values_columns
+
+from . import fakes
+
+FIELDS = [('id', FIELD_TYPE.LONG), ('amount', FIELD_TYPE.DOUBLE), ('name', FIELD_TYPE.VAR_STRING)]
+
+
+class Reading(models.Model):
+    amount = models.FloatField()
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = 'tests'
+
+
+def description(*type_codes):
+    return [('c%d' % i, type_code) for i, type_code in enumerate(type_codes)]
+
+
+class ColumnBuilderTests(TestCase):
+    def test_numeric_columns_are_arrays(self):
+        builder = ColumnBuilder(description(FIELD_TYPE.LONG, FIELD_TYPE.DOUBLE, FIELD_TYPE.VAR_STRING))
+        builder.add((1, 0.5, 'a'))
+        builder.add((-2, 1.5, None))
+        ids, amounts, names = builder.columns
+        self.assertEqual(ids, array('i', [1, -2]))
+        self.assertEqual(amounts, array('d', [0.5, 1.5]))
+        self.assertEqual(names, ['a', None])
+        self.assertEqual(builder.rows, 2)
+
+    def test_unsigned_values_widen_the_typecode(self):
+        builder = ColumnBuilder(description(FIELD_TYPE.TINY))
+        for value in (1, 200):
+            builder.add((value,))
+        self.assertEqual(builder.columns[0], array('B', [1, 200]))
+
+    def test_nulls_and_overflows_become_lists(self):
+        builder = ColumnBuilder(description(FIELD_TYPE.LONG, FIELD_TYPE.TINY, FIELD_TYPE.LONGLONG))
+        builder.add((1, -1, 1))
+        builder.add((None, 200, 1 << 64))
+        self.assertEqual(builder.columns, [[1, None], [-1, 200], [1, 1 << 64]])
+        builder.add((3, 4, 5))
+        self.assertEqual(builder.columns, [[1, None, 3], [-1, 200, 4], [1, 1 << 64, 5]])
+
+
+class ExecuteColumnsTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(fakes.query_reply({
+            'SELECT': fakes.result_set(FIELDS, [('1', '0.5', 'a'), ('2', '1.5', 'b')]),
+        }))
+
+    def test_execute_columns(self):
+        with self.wrapper.cursor() as cursor:
+            columns = cursor.execute_columns('SELECT id, amount, name FROM t WHERE id > %s', [0], use_numpy=False)
+            self.assertEqual(columns, [array('i', [1, 2]), array('d', [0.5, 1.5]), ['a', 'b']])
+            self.assertEqual(cursor.rowcount, 2)
+            self.assertIs(cursor.cursor.cursor, cursor.cursor.primary_cursor)
+        self.assertEqual(self.wrapper.connection.socket.queries, ['SELECT id, amount, name FROM t WHERE id > 0'])
+
+    def test_statements_without_results(self):
+        with self.wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute_columns('DO 1', use_numpy=False), [])
+
+    @unittest.skipIf(columnar.numpy is None, 'NumPy is required.')
+    def test_numpy(self):
+        with self.wrapper.cursor() as cursor:
+            ids, amounts, names = cursor.execute_columns('SELECT id, amount, name FROM t')
+        self.assertEqual(ids.dtype, columnar.numpy.int32)
+        self.assertEqual(amounts.sum(), 2.0)
+        self.assertEqual(names, ['a', 'b'])
+
+    def test_values_columns(self):
+        self.wrapper.connection.socket.reply = fakes.query_reply({
+            'SELECT': fakes.result_set(FIELDS[1:], [('0.5', 'a'), ('1.5', 'b')]),
+        })
+        with mock.patch.object(columnar, 'connections', {'default': self.wrapper}):
+            columns = values_columns(Reading.objects.all(), 'amount', 'name', use_numpy=False)
+            self.assertEqual(columns, {'amount': array('d', [0.5, 1.5]), 'name': ['a', 'b']})
+            self.assertEqual(
+                values_columns(Reading.objects.filter(pk__in=[]), 'amount', use_numpy=False), {'amount': []},
+            )
+        self.assertEqual(
+            self.wrapper.connection.socket.queries,
+            ['SELECT `tests_reading`.`amount`, `tests_reading`.`name` FROM `tests_reading`'],
+        )
@@ -0,0 +1,140 @@
+import struct
+import unittest
+import zlib
+from unittest import mock
+
+from cymysql.constants import CLIENT
+from cymysql.socketwrapper import SocketWrapper
+from django.core.exceptions import ImproperlyConfigured
+
+from mysql_cymysql import compression
+from mysql_cymysql.compression import Compression, CompressedConnection, CompressedSocket
+
+from . import fakes
+
+CAPABILITIES = CLIENT.PROTOCOL_41 | CLIENT.SECURE_CONNECTION | CLIENT.PLUGIN_AUTH | CLIENT.CONNECT_WITH_DB
+
+
+def packet(sequence, payload):
+    return compression._int24(len(payload)) + bytes((sequence,)) + payload
+
+
+def greeting(capabilities):
+    return (
+        b'\x0a8.0.36\x00' + struct.pack('<I', 1) + b'abcdefgh\x00' +
+        struct.pack('<H', capabilities & 0xffff) + b'\x21' + struct.pack('<HH', 2, capabilities >> 16) +
+        b'\x15' + bytes(10) + b'ijklmnopqrst\x00' + b'mysql_native_password\x00'
+    )
+
+
+class ServerSocket:
+    """
+    A socket to a server with capabilities that accepts the handshake and
+    answers each command with an OK packet, compressed with zlib when the
+    client asked for it.
+    """
+
+    def __init__(self, capabilities=CAPABILITIES):
+        self.output = bytearray(packet(0, greeting(capabilities)))
+        self.client_flag = None
+        self.queries = []
+        self.compressed_frames = 0
+
+    def recv(self, size):
+        data = bytes(self.output[:size])
+        del self.output[:size]
+        return data
+
+    def sendall(self, data):
+        if self.client_flag is None:
+            # The handshake response, and the OK of the authentication.
+            self.client_flag = struct.unpack('<I', data[4:8])[0]
+            self.output += packet(2, fakes.ok())
+            return
+        if self.client_flag & CLIENT.COMPRESS:
+            length = data[4] | data[5] << 8 | data[6] << 16
+            data = data[7:]
+            if length:
+                data = zlib.decompress(data)
+                self.compressed_frames += 1
+            reply = packet(1, fakes.ok())
+            self.output += compression._int24(len(reply)) + bytes((data[3],)) + compression._int24(0) + reply
+        else:
+            self.output += packet(1, fakes.ok())
+        self.queries.append(data[5:].decode())
+
+    def close(self):
+        pass
+
+
+def connect(server, **options):
+    compression_ = Compression(**options)
+    with mock.patch.object(CompressedConnection, '_get_socket', return_value=server):
+        return compression.connect(compression=compression_, user='user', passwd='', db='db')
+
+
+class CompressionOptionsTests(unittest.TestCase):
+    def test_invalid_options(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, r'Invalid compression option\(s\): size\.'):
+            Compression(size=1)
+        with self.assertRaisesRegex(ImproperlyConfigured, "Invalid compression algorithm 'lz4'"):
+            Compression(algorithm='lz4')
+
+    @unittest.skipIf(compression.pyzstd is not None, 'pyzstd is installed.')
+    def test_zstd_requires_pyzstd(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, 'requires pyzstd'):
+            Compression(algorithm='zstd')
+
+    def test_get_compression_is_shared(self):
+        key = ('host', 3306)
+        self.assertIs(
+            compression.get_compression(key, {'level': 1}), compression.get_compression(key, {'level': 1}),
+        )
+        self.assertIsNot(
+            compression.get_compression(key, {'level': 1}), compression.get_compression(key, {'level': 2}),
+        )
+
+
+class CompressedConnectionTests(unittest.TestCase):
+    def test_compressed_server(self):
+        server = ServerSocket(CAPABILITIES | CLIENT.COMPRESS)
+        connection = connect(server, min_size=10)
+        self.assertIsInstance(connection.socket, CompressedSocket)
+        self.assertTrue(server.client_flag & CLIENT.COMPRESS)
+        connection.query('SELECT %s' % ('x' * 1000))
+        self.assertEqual(server.queries[-1], 'SELECT %s' % ('x' * 1000))
+        self.assertEqual(server.compressed_frames, 1)
+        stats = connection.compression.stats()
+        self.assertGreater(stats['bytes_saved'], 900)
+        self.assertLess(stats['ratio'], 1)
+
+    def test_uncompressed_server(self):
+        server = ServerSocket(CAPABILITIES)
+        connection = connect(server)
+        self.assertNotIsInstance(connection.socket, CompressedSocket)
+        self.assertIsInstance(connection.socket, SocketWrapper)
+        self.assertEqual(connection.compress, '')
+        self.assertFalse(server.client_flag & (CLIENT.COMPRESS | CLIENT.ZSTD_COMPRESSION_ALGORITHM))
+        connection.query('SELECT %s' % ('x' * 1000))
+        self.assertEqual(server.queries[-1], 'SELECT %s' % ('x' * 1000))
+        self.assertEqual(connection.compression.stats()['ratio'], None)
+
+
+class CompressedSocketTests(unittest.TestCase):
+    def socket(self, **options):
+        server = ServerSocket()
+        return CompressedSocket(server, 'zlib', Compression(**options)), server
+
+    def test_small_packets_are_sent_uncompressed(self):
+        sock, server = self.socket(min_size=100)
+        sent = []
+        server.sendall = sent.append
+        sock.send_packet(packet(0, b'\x03SELECT 1'))
+        self.assertEqual(sent, [compression._int24(13) + b'\x00' + compression._int24(0) + packet(0, b'\x03SELECT 1')])
+
+    def test_malformed_packet(self):
+        sock, server = self.socket()
+        payload = zlib.compress(b'abc')
+        server.output[:] = compression._int24(len(payload)) + b'\x00' + compression._int24(4) + payload
+        with self.assertRaisesRegex(Exception, 'Malformed compressed packet'):
+            sock.recv_packet()
@@ -0,0 +1,82 @@
+import re
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.db import IntegrityError
+
+from . import fakes
+
+# Tables a, b and c each reference table p; rows of b are invalid.
+KEY_COLUMNS = {
+    'a': [('p_id', 'p', 'id')],
+    'b': [('p_id', 'p', 'id')],
+    'c': [('p_id', 'p', 'id')],
+}
+FIELDS = [('id', FIELD_TYPE.LONG), ('p_id', FIELD_TYPE.LONG)]
+
+
+def check_reply(command, payload):
+    sql = payload.decode()
+    if sql.startswith('SELECT MIN('):
+        return fakes.result_set(FIELDS, [('1', '25')])
+    if 'LEFT JOIN' in sql:
+        if 'FROM `b`' in sql and ('>= 21' in sql or 'AND REFERRING.`id` >=' not in sql):
+            return fakes.result_set(FIELDS, [('22', '99')])
+        return fakes.result_set(FIELDS, [])
+    return [fakes.ok()]
+
+
+def anti_joins(wrapper):
+    return [q for q in wrapper.connection.socket.queries if 'LEFT JOIN' in q]
+
+
+class CheckConstraintsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            'mysql_cymysql.introspection.DatabaseIntrospection',
+            get_primary_key_column=lambda self, cursor, table_name: 'id',
+            get_key_columns=lambda self, cursor, table_name: KEY_COLUMNS[table_name],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_invalid_row_is_reported(self):
+        wrapper = fakes.connected_wrapper(check_reply)
+        with self.assertRaisesMessage(
+            IntegrityError,
+            "The row in table 'b' with primary key '22' has an invalid foreign key: "
+            "b.p_id contains a value '99' that does not have a corresponding value in p.id.",
+        ):
+            wrapper.check_constraints(['a', 'b', 'c'])
+        queries = anti_joins(wrapper)
+        # Table c isn't checked after the violation in b.
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all(q.rstrip().endswith('LIMIT 1') for q in queries))
+
+    def test_chunked_scan(self):
+        wrapper = fakes.connected_wrapper(check_reply, {'constraint_check_chunk_size': 10})
+        with self.assertRaises(IntegrityError):
+            wrapper.check_constraints(['a', 'b'])
+        queries = anti_joins(wrapper)
+        # Three ranges of a, and b up to its invalid row.
+        self.assertEqual(len(queries), 6)
+        self.assertIn('AND REFERRING.`id` >= 11 AND REFERRING.`id` < 21', queries[1])
+
+    def test_valid_tables(self):
+        wrapper = fakes.connected_wrapper(check_reply)
+        wrapper.check_constraints(['a', 'c'])
+        self.assertEqual(len(anti_joins(wrapper)), 2)
+
+    def test_parallel_checks_report_the_first_violation(self):
+        wrapper = fakes.connected_wrapper(check_reply, {'constraint_check_workers': 2})
+        with mock.patch(
+            'mysql_cymysql.compression.connect',
+            side_effect=lambda **params: fakes.connect(check_reply, **params),
+        ):
+            with self.assertRaisesMessage(IntegrityError, "The row in table 'b'"):
+                wrapper.check_constraints(['a', 'b', 'c'])
+        # The checks ran on the worker connections.
+        self.assertEqual(anti_joins(wrapper), [])
+
+    def assertRaisesMessage(self, exception, message):
+        return self.assertRaisesRegex(exception, '^' + re.escape(message))
@@ -0,0 +1,122 @@
+import threading
+import time
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.db import DatabaseError
+
+from mysql_cymysql.server import server_data_cache, server_key
+
+from . import fakes
+
+NAME = [('name', FIELD_TYPE.VAR_STRING), ('sql', FIELD_TYPE.VAR_STRING)]
+
+
+class CloneServer:
+    """
+    A server with a source database of tables and views (whose definitions
+    may select from other views), that records what clone connections run.
+    """
+
+    def __init__(self, tables, views):
+        self.tables = tables
+        self.views = views
+        self.created = []
+        self.lock = threading.Lock()
+
+    def reply(self, command, payload):
+        sql = payload.decode()
+        if sql.startswith('SELECT table_name'):
+            rows = [(t, 'BASE TABLE') for t in self.tables] + [(v, 'VIEW') for v in self.views]
+            return fakes.result_set([('table_name', FIELD_TYPE.VAR_STRING), ('table_type', FIELD_TYPE.VAR_STRING)], rows)
+        if sql.startswith('SHOW CREATE TABLE `src`.'):
+            table = sql.split('.')[1].strip('`')
+            return fakes.result_set(NAME, [(table, 'CREATE TABLE `%s` (`id` integer)' % table)])
+        if sql.startswith('SHOW CREATE VIEW `src`.'):
+            view = sql.split('.')[1].strip('`')
+            return fakes.result_set(NAME, [(view, (
+                'CREATE ALGORITHM=UNDEFINED DEFINER=`root`@`%%` SQL SECURITY DEFINER VIEW `%s` AS '
+                'select `src`.`%s`.`id` AS `id` from `src`.`%s`'
+            ) % (view, self.views[view], self.views[view]))])
+        if sql.startswith('CREATE'):
+            name = sql.split('`')[1]
+            source = self.views.get(name)
+            if source is not None and source not in self.created and source not in self.tables:
+                return [fakes.error(1146, "Table 'dst.%s' doesn't exist" % source)]
+            with self.lock:
+                self.created.append(name)
+        return [fakes.ok()]
+
+
+class CloneTests(TestCase):
+    def setUp(self):
+        self.sockets = []
+
+    def clone(self, server, workers=2):
+        wrapper = fakes.connected_wrapper(server.reply, {'clone_workers': workers}, NAME='src')
+        server_data_cache._entries[server_key({**wrapper.settings_dict, 'NAME': 'dst'})] = (
+            time.monotonic(), dict(fakes.SERVER_DATA),
+        )
+
+        def connect(**params):
+            self.assertEqual(params['db'], 'dst')
+            connection = fakes.connect(server.reply, **params)
+            self.sockets.append(connection.socket)
+            return connection
+
+        with mock.patch('mysql_cymysql.compression.connect', side_effect=connect):
+            wrapper.creation._clone_db('src', 'dst')
+        return wrapper
+
+    def queries(self):
+        return [q for socket in self.sockets for q in socket.queries]
+
+    def test_tables_are_cloned_in_parallel(self):
+        server = CloneServer(['a', 'b', 'c'], {})
+        self.clone(server)
+        self.assertEqual(sorted(server.created), ['a', 'b', 'c'])
+        self.assertEqual(len(self.sockets), 2)
+        for socket in self.sockets:
+            # Foreign key checks are off while tables are filled in any order.
+            queries = [q for q in socket.queries if 'foreign_key_checks' in q]
+            self.assertEqual(queries, ['SET foreign_key_checks=0', 'SET foreign_key_checks=1'])
+            self.assertTrue(socket.closed)
+        self.assertEqual(
+            sorted(q for q in self.queries() if q.startswith('INSERT')),
+            ['INSERT INTO `%s` SELECT * FROM `src`.`%s`' % (t, t) for t in 'abc'],
+        )
+
+    def test_workers_are_bounded_by_tables(self):
+        self.clone(CloneServer(['a'], {}), workers=4)
+        self.assertEqual(len(self.sockets), 1)
+
+    def test_views_are_created_after_the_views_they_select_from(self):
+        server = CloneServer(['t'], {'v2': 'v1', 'v1': 't'})
+        self.clone(server)
+        self.assertEqual(server.created, ['t', 'v1', 'v2'])
+        views = [q for q in self.queries() if q.startswith('CREATE ALGORITHM')]
+        self.assertEqual(views[-1], (
+            'CREATE ALGORITHM=UNDEFINED SQL SECURITY DEFINER VIEW `v2` AS select `dst`.`v1`.`id` AS `id` '
+            'from `dst`.`v1`'
+        ))
+
+    def test_views_that_cant_be_created_raise(self):
+        server = CloneServer(['t'], {'v': 'missing'})
+        with self.assertRaises(DatabaseError):
+            self.clone(server)
+        self.assertEqual(server.created, ['t'])
+
+    def test_worker_errors_are_raised(self):
+        server = CloneServer(['a', 'b'], {})
+        reply = server.reply
+
+        def failing_reply(command, payload):
+            if payload.startswith(b'INSERT INTO `b`'):
+                return [fakes.error(1062, "Duplicate entry '1' for key 'PRIMARY'")]
+            return reply(command, payload)
+
+        server.reply = failing_reply
+        with self.assertRaises(DatabaseError):
+            self.clone(server)
+        for socket in self.sockets:
+            self.assertTrue(socket.closed)
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE
+from django.db import ProgrammingError
+
+from mysql_cymysql.cursors import StreamingCursor
+
+from . import fakes
+
+ROWS = [('1', 'a'), ('2', 'b'), ('3', None)]
+FIELDS = [('id', FIELD_TYPE.LONG), ('name', FIELD_TYPE.VAR_STRING)]
+
+
+def select_reply(command, payload):
+    if payload.startswith(b'SELECT'):
+        return fakes.result_set(FIELDS, ROWS)
+    return [fakes.ok()]
+
+
+class StreamingCursorTests(TestCase):
+    def test_rows_stay_on_the_socket_until_fetched(self):
+        connection = fakes.connect(select_reply)
+        cursor = connection.cursor(StreamingCursor)
+        cursor.execute('SELECT id, name FROM t')
+        self.assertEqual([d[0] for d in cursor.description], ['id', 'name'])
+        # Three rows and the closing EOF packet.
+        self.assertEqual(len(connection.socket.replies), 4)
+        self.assertEqual(cursor.fetchone(), (1, 'a'))
+        self.assertEqual(len(connection.socket.replies), 3)
+        self.assertEqual(cursor.fetchall(), [(2, 'b'), (3, None)])
+        self.assertEqual(len(connection.socket.replies), 0)
+
+
+class StreamingCursorWrapperTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(select_reply, {'server_side_cursors': True})
+
+    def test_other_queries_raise_while_streaming(self):
+        stream = self.wrapper.chunked_cursor()
+        stream.execute('SELECT id, name FROM t')
+        self.assertEqual(stream.fetchone(), (1, 'a'))
+        with self.assertRaises(ProgrammingError):
+            self.wrapper.cursor().execute('SELECT 1')
+        self.assertEqual(stream.fetchmany(10), [(2, 'b'), (3, None)])
+        self.assertEqual(stream.fetchmany(10), [])
+        self.wrapper.cursor().execute('SELECT 1')
+
+    def test_close_discards_unread_rows(self):
+        stream = self.wrapper.chunked_cursor()
+        stream.execute('SELECT id, name FROM t')
+        stream.close()
+        self.assertIsNone(self.wrapper.open_stream)
+        self.assertEqual(len(self.wrapper.connection.socket.replies), 0)
+        cursor = self.wrapper.cursor()
+        cursor.execute('SELECT id, name FROM t')
+        self.assertEqual(list(cursor.fetchall()), [(1, 'a'), (2, 'b'), (3, None)])
@@ -0,0 +1,75 @@
+import datetime
+from decimal import Decimal
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE
+from cymysql.converters import decoders
+
+from mysql_cymysql.decoders import (
+    decode_date, decode_datetime, decode_decimal, decode_time, decode_timestamp,
+    typecast_time,
+)
+
+from . import fakes
+
+
+class DecoderTests(TestCase):
+    def test_datetime(self):
+        self.assertEqual(decode_datetime(b'2024-01-02 03:04:05'), datetime.datetime(2024, 1, 2, 3, 4, 5))
+        self.assertEqual(
+            decode_datetime(b'2024-01-02 03:04:05.123456'), datetime.datetime(2024, 1, 2, 3, 4, 5, 123456),
+        )
+        self.assertEqual(decode_datetime(b'2024-01-02 03:04:05.12'), datetime.datetime(2024, 1, 2, 3, 4, 5, 120000))
+        self.assertEqual(decode_timestamp(b'2024-01-02 03:04:05'), datetime.datetime(2024, 1, 2, 3, 4, 5))
+
+    def test_date(self):
+        self.assertEqual(decode_date(b'2024-01-02'), datetime.date(2024, 1, 2))
+
+    def test_time(self):
+        self.assertEqual(decode_time(b'03:04:05'), datetime.time(3, 4, 5))
+        self.assertEqual(decode_time(b'03:04:05.5'), datetime.time(3, 4, 5, 500000))
+
+    def test_decimal(self):
+        self.assertEqual(decode_decimal(b'-1.50'), Decimal('-1.50'))
+        self.assertEqual(str(decode_decimal(b'12345.670')), '12345.670')
+
+    def test_fallbacks_match_the_generic_decoders(self):
+        for decode, type_code, value in [
+            (decode_datetime, FIELD_TYPE.DATETIME, b'0000-00-00 00:00:00'),
+            (decode_datetime, FIELD_TYPE.DATETIME, b'2024-01-00 00:00:00'),
+            (decode_timestamp, FIELD_TYPE.TIMESTAMP, b'0000-00-00 00:00:00'),
+            (decode_date, FIELD_TYPE.DATE, b'0000-00-00'),
+            (decode_date, FIELD_TYPE.DATE, b'2024-00-00'),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(decode(value), decoders[type_code](value))
+
+    def test_out_of_range_time(self):
+        # Like typecast_time(), TIME values outside of a day aren't times.
+        for value in (b'-01:00:00', b'838:59:59'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    typecast_time(value)
+                with self.assertRaises(ValueError):
+                    decode_time(value)
+
+
+class ConnectionDecodingTests(TestCase):
+    def test_rows_are_decoded(self):
+        fields = [
+            ('dt', FIELD_TYPE.DATETIME), ('d', FIELD_TYPE.DATE), ('t', FIELD_TYPE.TIME),
+            ('n', FIELD_TYPE.NEWDECIMAL),
+        ]
+        wrapper = fakes.connected_wrapper(fakes.query_reply({
+            'SELECT': fakes.result_set(fields, [
+                ('2024-01-02 03:04:05.000001', '2024-01-02', '03:04:05', '1.10'),
+                ('0000-00-00 00:00:00', '0000-00-00', '00:00:00', None),
+            ]),
+        }))
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT dt, d, t, n FROM t')
+            self.assertEqual(cursor.fetchall(), [
+                (datetime.datetime(2024, 1, 2, 3, 4, 5, 1), datetime.date(2024, 1, 2), datetime.time(3, 4, 5),
+                 Decimal('1.10')),
+                (None, None, datetime.time(0), None),
+            ])
@@ -0,0 +1,97 @@
+import datetime
+import json
+from unittest import TestCase
+
+from django.db import models
+
+from mysql_cymysql.operations import MAX_PACKET_SIZE
+
+from . import fakes
+
+
+def insert_reply(command, payload):
+    # One affected row per row of a multi-row INSERT.
+    if payload.startswith(b'INSERT'):
+        return [fakes.ok(affected_rows=payload.count(b'),(') + 1)]
+    return [fakes.ok()]
+
+
+def wrapper_with_packet(max_allowed_packet, reply=insert_reply):
+    return fakes.connected_wrapper(
+        reply, server_data={**fakes.SERVER_DATA, 'max_allowed_packet': max_allowed_packet},
+    )
+
+
+class ExecutemanyInsertTests(TestCase):
+    query = 'INSERT INTO t (a, b) VALUES (%s, %s)'
+
+    def test_rows_are_batched_by_packet_size(self):
+        wrapper = wrapper_with_packet(1024 + 200)
+        rows = [(i, 'x' * 10) for i in range(50)]
+        with wrapper.cursor() as cursor:
+            cursor.executemany(self.query, rows)
+            self.assertEqual(cursor.rowcount, 50)
+        queries = wrapper.connection.socket.queries
+        self.assertGreater(len(queries), 1)
+        self.assertTrue(all(len(q.encode()) <= 200 for q in queries))
+        self.assertEqual(sum(q.count('),(') + 1 for q in queries), 50)
+        self.assertTrue(queries[0].startswith("INSERT INTO t (a, b) VALUES (0, 'xxxxxxxxxx'),(1, "))
+
+    def test_rows_fit_in_one_statement(self):
+        wrapper = wrapper_with_packet(64 * 1024 * 1024)
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.executemany(self.query, [(1, 'a'), (2, None)]), 2)
+            self.assertEqual(cursor.rowcount, 2)
+        self.assertEqual(wrapper.connection.socket.queries, ["INSERT INTO t (a, b) VALUES (1, 'a'),(2, NULL)"])
+
+    def test_other_statements_run_per_row(self):
+        wrapper = wrapper_with_packet(64 * 1024 * 1024)
+        with wrapper.cursor() as cursor:
+            cursor.executemany('UPDATE t SET a = %s WHERE b = %s', [(1, 'a'), (2, 'b')])
+        self.assertEqual(len(wrapper.connection.socket.queries), 2)
+
+
+class Item(models.Model):
+    name = models.CharField(max_length=100)
+    created = models.DateTimeField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class Document(models.Model):
+    data = models.JSONField()
+
+    class Meta:
+        app_label = 'tests'
+
+
+class PacketSizeTests(TestCase):
+    def test_statement_size_is_capped_at_the_largest_packet(self):
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 1 << 30})
+        self.assertEqual(wrapper.ops.max_statement_size(), MAX_PACKET_SIZE - wrapper.ops.packet_margin)
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 4 << 20})
+        self.assertEqual(wrapper.ops.max_statement_size(), (4 << 20) - wrapper.ops.packet_margin)
+
+    def test_bulk_batch_size_bounds_values_by_type(self):
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 1 << 20})
+        fields = [Item._meta.get_field(name) for name in ('name', 'created', 'amount')]
+        created = datetime.datetime(2024, 1, 1, 12, 0, 0, 123456)
+        objs = [Item(name='n' * 10, created=created, amount=1) for i in range(100000)]
+        batch_size = wrapper.ops.bulk_batch_size(fields, objs)
+        # 43 bytes of name, 28 of DATETIME(6) and 14 of DECIMAL(10, 2)
+        # literals, and separators.
+        row_size = 43 + 28 + 14 + 3
+        self.assertEqual(batch_size, wrapper.ops.max_statement_size() * 9 // 10 // row_size)
+        literal = "'%s'" % created.isoformat(' ')
+        self.assertEqual(len(literal), 28)
+
+    def test_bulk_batch_size_measures_other_values(self):
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'max_allowed_packet': 1 << 20})
+        fields = [Document._meta.get_field('data')]
+        objs = [Document(data={'values': list(range(2000))}) for i in range(1000)]
+        batch_size = wrapper.ops.bulk_batch_size(fields, objs)
+        literal_size = 4 * len(json.dumps(objs[0].data)) + 3
+        self.assertEqual(batch_size, wrapper.ops.max_statement_size() * 9 // 10 // (literal_size + 3))
+        self.assertLess(batch_size * len(json.dumps(objs[0].data)), wrapper.ops.max_statement_size())
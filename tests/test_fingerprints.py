@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE
+
+from mysql_cymysql.fingerprints import QueryProfile, QueryProfileMiddleware, fingerprint, profile
+from mysql_cymysql.instrumentation import QueryEvent
+
+from . import fakes
+
+
+def event(sql, duration=0.001, rows=1):
+    return QueryEvent('default', sql, False, duration, rows, 0, 0, False)
+
+
+class FingerprintTests(TestCase):
+    def test_literals_and_placeholders(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'it''s' AND b = -1.5e3 AND c = %s AND d = 0xff"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c = ? AND d = ?',
+        )
+
+    def test_identifiers_keep_their_digits(self):
+        self.assertEqual(fingerprint('SELECT t1.a2, `3` FROM t1'), 'SELECT t1.a2, `3` FROM t1')
+
+    def test_lists_are_collapsed(self):
+        self.assertEqual(fingerprint('SELECT a FROM t WHERE id IN (1, 2, 3)'), 'SELECT a FROM t WHERE id IN (...)')
+        self.assertEqual(
+            fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, NULL)"),
+            'INSERT INTO t (a, b) VALUES (...)',
+        )
+
+    def test_comments_are_removed(self):
+        self.assertEqual(
+            fingerprint("SELECT /* view */ a FROM t -- trailing\nWHERE b = '/* kept */'"),
+            'SELECT a FROM t WHERE b = ?',
+        )
+
+
+class QueryProfileTests(TestCase):
+    def test_stats_and_n_plus_one(self):
+        query_profile = QueryProfile(n_plus_one_threshold=3)
+        for i in range(3):
+            query_profile.add(event('SELECT * FROM author WHERE id = %d' % i))
+        query_profile.add(event('SELECT * FROM book', duration=0.01, rows=10))
+        query_profile.add(event('UPDATE t SET a = 1'))
+        query_profile.add(event('UPDATE t SET a = 2'))
+        query_profile.add(event('UPDATE t SET a = 3'))
+        stats = query_profile.stats()
+        self.assertEqual(stats[0], ('SELECT * FROM book', {'count': 1, 'total_time': 0.01, 'max_time': 0.01, 'rows': 10}))
+        self.assertEqual(query_profile.n_plus_one(), [('SELECT * FROM author WHERE id = ?', 3)])
+
+    def test_other_fingerprints_are_grouped(self):
+        query_profile = QueryProfile(max_fingerprints=1)
+        query_profile.add(event('SELECT a FROM t'))
+        query_profile.add(event('SELECT b FROM t'))
+        query_profile.add(event('SELECT c FROM t'))
+        self.assertEqual(
+            {key: stats['count'] for key, stats in query_profile.stats()},
+            {'SELECT a FROM t': 1, QueryProfile.OTHER: 2},
+        )
+
+
+def reply(command, payload):
+    if payload.startswith(b'SELECT'):
+        return fakes.result_set([('id', FIELD_TYPE.LONG)], [('1',)])
+    return [fakes.ok()]
+
+
+class ProfileTests(TestCase):
+    def test_queries_of_instrumented_aliases_are_profiled(self):
+        wrapper = fakes.connected_wrapper(reply, {'instrumentation': True})
+        with profile() as query_profile:
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT id FROM t WHERE id = %s', [1])
+                cursor.execute('SELECT id FROM t WHERE id = %s', [2])
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT id FROM t WHERE id = %s', [3])
+        self.assertEqual([(key, stats['count']) for key, stats in query_profile.stats()],
+                         [('SELECT id FROM t WHERE id = ?', 2)])
+
+    def test_middleware_logs_repeated_selects(self):
+        wrapper = fakes.connected_wrapper(reply, {'instrumentation': True})
+
+        def view(request):
+            with wrapper.cursor() as cursor:
+                for i in range(10):
+                    cursor.execute('SELECT id FROM t WHERE id = %s', [i])
+            return 'response'
+
+        request = type('Request', (), {'method': 'GET', 'path': '/books/'})()
+        with self.assertLogs('mysql_cymysql.fingerprints', 'WARNING') as logs:
+            self.assertEqual(QueryProfileMiddleware(view)(request), 'response')
+        self.assertEqual(logs.output, [
+            'WARNING:mysql_cymysql.fingerprints:Likely N+1 query in GET /books/: '
+            '10 executions of SELECT id FROM t WHERE id = ?',
+        ])
+        self.assertEqual(request.query_profile.n_plus_one(), [('SELECT id FROM t WHERE id = ?', 10)])
@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE
+from django.db import ProgrammingError
+
+from mysql_cymysql import instrumentation
+
+from . import fakes
+
+
+def reply(command, payload):
+    if payload.startswith(b'SELECT'):
+        return fakes.result_set([('id', FIELD_TYPE.LONG)], [('1',), ('2',)])
+    if payload.startswith(b'BAD'):
+        return [fakes.error(1064, 'You have an error in your SQL syntax', '42000')]
+    return [fakes.ok(affected_rows=3)]
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.events = []
+        self.waits = []
+        self.sink = instrumentation.CallbackSink(
+            on_query=self.events.append,
+            on_connection_wait=lambda alias, duration: self.waits.append(alias),
+        )
+        instrumentation.add_sink(self.sink)
+        self.addCleanup(instrumentation.remove_sink, self.sink)
+
+    def test_queries_are_recorded(self):
+        wrapper = fakes.connected_wrapper(reply, {'instrumentation': True}, alias='instrumented')
+        self.assertEqual(self.waits, ['instrumented'])
+        # Without the session setup.
+        self.events.clear()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT id FROM t')
+            cursor.execute('UPDATE t SET a = 1')
+        select, update = self.events
+        self.assertEqual((select.alias, select.sql, select.many, select.rows, select.failed),
+                         ('instrumented', 'SELECT id FROM t', False, 2, False))
+        self.assertEqual(select.bytes_sent, 4 + 1 + len('SELECT id FROM t'))
+        self.assertGreater(select.bytes_received, 0)
+        self.assertEqual(update.rows, 3)
+        self.assertGreaterEqual(select.duration, 0)
+
+    def test_failures_are_recorded(self):
+        wrapper = fakes.connected_wrapper(reply, {'instrumentation': True})
+        self.events.clear()
+        with self.assertRaises(ProgrammingError):
+            with wrapper.cursor() as cursor:
+                cursor.execute('BAD')
+        self.assertEqual([event.failed for event in self.events], [True])
+
+    def test_uninstrumented_aliases_record_nothing(self):
+        wrapper = fakes.connected_wrapper(reply)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT id FROM t')
+        self.assertEqual((self.events, self.waits), ([], []))
+
+
+class HistogramSinkTests(TestCase):
+    def test_stats_and_prometheus_text(self):
+        sink = instrumentation.HistogramSink(buckets=[0.01, 0.1])
+        for duration, rows, failed in ((0.005, 2, False), (0.05, 1, False), (1, None, True)):
+            sink.record_query(instrumentation.QueryEvent('default', 'SELECT 1', False, duration, rows, 10, 20, failed))
+        sink.record_connection_wait('default', 0.001)
+        stats = sink.stats()['default']
+        self.assertEqual(stats['query_duration']['buckets'], {0.01: 1, 0.1: 2, float('inf'): 3})
+        self.assertEqual(
+            (stats['queries'], stats['failures'], stats['rows'], stats['bytes_sent'], stats['bytes_received']),
+            (3, 1, 3, 30, 60),
+        )
+        text = sink.prometheus_text()
+        self.assertIn('# TYPE django_cymysql_query_duration_seconds histogram\n', text)
+        self.assertIn('django_cymysql_query_duration_seconds_bucket{alias="default",le="0.1"} 2\n', text)
+        self.assertIn('django_cymysql_query_duration_seconds_bucket{alias="default",le="+Inf"} 3\n', text)
+        self.assertIn('django_cymysql_connection_wait_seconds_count{alias="default"} 1\n', text)
+        self.assertIn('django_cymysql_queries_total{alias="default"} 3\n', text)
+        sink.reset()
+        self.assertEqual(sink.stats(), {})
@@ -0,0 +1,98 @@
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE
+
+from . import fakes
+
+STRING = FIELD_TYPE.VAR_STRING
+
+
+def schema_reply(command, payload):
+    sql = payload.decode()
+    if 'information_schema.tables' in sql:
+        return fakes.result_set(
+            [('table_name', STRING), ('table_type', STRING), ('table_collation', STRING), ('engine', STRING)],
+            [('t', 'BASE TABLE', 'utf8mb4_0900_ai_ci', 'InnoDB')],
+        )
+    if 'information_schema' in sql:
+        # No columns, keys, constraints or indexes.
+        return fakes.result_set([('table_name', STRING)], [])
+    if sql.startswith('SHOW FULL TABLES'):
+        return fakes.result_set([('name', STRING), ('type', STRING)], [('t', 'BASE TABLE')])
+    return [fakes.ok()]
+
+
+def snapshot_loads(wrapper):
+    return sum('information_schema.tables' in q for q in wrapper.connection.socket.queries)
+
+
+class SchemaSnapshotTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(schema_reply)
+        self.introspection = self.wrapper.introspection
+
+    def test_snapshot_is_loaded_once_per_block(self):
+        with self.wrapper.cursor() as cursor:
+            with self.introspection.schema_snapshot():
+                self.assertEqual([t.name for t in self.introspection.get_table_list(cursor)], ['t'])
+                self.introspection.get_table_list(cursor)
+            self.assertEqual(snapshot_loads(self.wrapper), 1)
+            self.introspection.get_table_list(cursor)
+        self.assertEqual(self.wrapper.connection.socket.queries[-1], 'SHOW FULL TABLES')
+
+    def test_ddl_on_any_connection_discards_the_snapshot(self):
+        other = fakes.connected_wrapper(NAME=self.wrapper.settings_dict['NAME'])
+        with self.wrapper.cursor() as cursor:
+            with self.introspection.schema_snapshot():
+                self.introspection.get_table_list(cursor)
+                with other.cursor() as other_cursor:
+                    other_cursor.execute('CREATE TABLE u (id integer)')
+                self.introspection.get_table_list(cursor)
+                self.assertEqual(snapshot_loads(self.wrapper), 2)
+                # Raw cursors of the connection itself too.
+                cursor.execute('DROP TABLE u')
+                self.introspection.get_table_list(cursor)
+                self.assertEqual(snapshot_loads(self.wrapper), 3)
+
+    def test_bulk_introspection_option(self):
+        wrapper = fakes.connected_wrapper(schema_reply, {'bulk_introspection': True})
+        with wrapper.cursor() as cursor:
+            wrapper.introspection.get_table_list(cursor)
+            wrapper.introspection.get_table_list(cursor)
+        self.assertEqual(snapshot_loads(wrapper), 1)
+
+
+COLUMNS = [
+    ('id', 'int', None, '10', '0', 'auto_increment', None, None, '0', 'NO', None),
+    ('location', 'point', None, None, None, '', None, None, '0', 'YES', None),
+    ('area', 'multipolygon', None, None, None, '', None, None, '0', 'YES', None),
+    ('created', 'datetime', None, None, None, '', None, None, '0', 'NO', '6'),
+]
+
+
+def columns_reply(command, payload):
+    sql = payload.decode()
+    if 'information_schema.columns' in sql:
+        return fakes.result_set([('c%d' % i, STRING) for i in range(11)], COLUMNS)
+    if 'information_schema.tables' in sql:
+        return fakes.result_set([('table_collation', STRING)], [('utf8mb4_0900_ai_ci',)])
+    return [fakes.ok()]
+
+
+class TableDescriptionTests(TestCase):
+    def test_types_come_from_information_schema(self):
+        wrapper = fakes.connected_wrapper(columns_reply)
+        with wrapper.cursor() as cursor:
+            description = wrapper.introspection.get_table_description(cursor, 't')
+        self.assertEqual(
+            [(f.name, f.type_code) for f in description],
+            [
+                ('id', FIELD_TYPE.LONG),
+                ('location', FIELD_TYPE.GEOMETRY),
+                ('area', FIELD_TYPE.GEOMETRY),
+                ('created', FIELD_TYPE.DATETIME),
+            ],
+        )
+        self.assertEqual(description[3].scale, 6)
+        # The table itself isn't read.
+        self.assertFalse(any('FROM `t`' in q for q in wrapper.connection.socket.queries))
@@ -0,0 +1,105 @@
+import re
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.db import connections, models
+
+from mysql_cymysql import keyset
+from mysql_cymysql.keyset import _next_chunk_size, iterate
+
+from . import fakes
+
+FIELDS = [('id', FIELD_TYPE.LONG), ('kind', FIELD_TYPE.VAR_STRING)]
+
+
+class Event(models.Model):
+    kind = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class KeysetServer:
+    """Answers keyset queries over rows with ids 1 to rows."""
+
+    def __init__(self, rows):
+        self.ids = list(range(1, rows + 1))
+
+    def __call__(self, command, payload):
+        sql = payload.decode()
+        if not sql.startswith('SELECT'):
+            return [fakes.ok()]
+        after = re.search(r'`id` > (\d+)', sql)
+        limit = int(re.search(r'LIMIT (\d+)', sql)[1])
+        ids = [i for i in self.ids if after is None or i > int(after[1])][:limit]
+        return fakes.result_set(FIELDS, [(str(i), 'click') for i in ids])
+
+
+class IterateTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(KeysetServer(25), alias='keyset')
+        connections['keyset'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'keyset')
+        self.events = Event.objects.using('keyset')
+
+    def selects(self):
+        return [q for q in self.wrapper.connection.socket.queries if q.startswith('SELECT')]
+
+    def test_chunks_are_read_after_the_last_key(self):
+        queryset = self.events.order_by('-kind')
+        ids = [event.pk for event in iterate(queryset, chunk_size=10, min_chunk_size=10, max_chunk_size=10)]
+        self.assertEqual(ids, list(range(1, 26)))
+        selects = self.selects()
+        self.assertEqual(len(selects), 3)
+        self.assertNotIn('WHERE', selects[0])
+        self.assertIn('ORDER BY `tests_event`.`id` ASC LIMIT 10', selects[0])
+        self.assertIn('WHERE `tests_event`.`id` > 10 ORDER BY `tests_event`.`id` ASC LIMIT 10', selects[1])
+        self.assertIn('WHERE `tests_event`.`id` > 20 ', selects[2])
+
+    def test_chunk_size_adapts_to_the_query_time(self):
+        # Chunks take 0.1s, 2s, 0.8s, 0.8s and 0.8s.
+        clock = mock.Mock(monotonic=mock.Mock(side_effect=[0, 0.1, 1, 3, 3, 3.8, 4, 4.8, 5, 5.8]))
+        with mock.patch.object(keyset, 'time', clock):
+            ids = [event.pk for event in iterate(self.events, chunk_size=5, min_chunk_size=1, target_time=1)]
+        self.assertEqual(ids, list(range(1, 26)))
+        limits = [int(re.search(r'LIMIT (\d+)', sql)[1]) for sql in self.selects()]
+        self.assertEqual(limits, [5, 10, 5, 5, 5])
+
+    def test_values(self):
+        rows = list(iterate(self.events.values('id', 'kind'), chunk_size=10, min_chunk_size=1))
+        self.assertEqual([row['id'] for row in rows], list(range(1, 26)))
+        self.assertEqual(rows[0], {'id': 1, 'kind': 'click'})
+
+    def test_other_iterables_are_rejected(self):
+        with self.assertRaisesRegex(TypeError, 'requires a queryset of model instances or values'):
+            list(iterate(self.events.values_list('id')))
+
+    def test_exact_multiple_of_the_chunk_size(self):
+        self.wrapper.connection.socket.reply = KeysetServer(20)
+        self.assertEqual(len(list(iterate(self.events, chunk_size=10, min_chunk_size=10, max_chunk_size=10))), 20)
+        # The last query finds no rows.
+        self.assertEqual(len(self.selects()), 3)
+
+    def test_throttle(self):
+        with mock.patch.object(keyset.time, 'sleep') as sleep:
+            list(iterate(self.events, chunk_size=10, min_chunk_size=10, max_chunk_size=10, throttle=0.5))
+        self.assertEqual(sleep.call_args_list, [mock.call(0.5)] * 2)
+        with mock.patch.object(keyset.time, 'sleep') as sleep:
+            list(iterate(
+                self.events, chunk_size=10, min_chunk_size=10, max_chunk_size=10,
+                throttle=lambda elapsed: 0.25,
+            ))
+        self.assertEqual(sleep.call_args_list, [mock.call(0.25)] * 2)
+
+
+class ChunkSizeTests(TestCase):
+    def test_fast_queries_double_the_chunk(self):
+        self.assertEqual(_next_chunk_size(1000, 0.1, 0.5, 100, 10000), 2000)
+        self.assertEqual(_next_chunk_size(8000, 0.1, 0.5, 100, 10000), 10000)
+
+    def test_slow_queries_shrink_the_chunk(self):
+        self.assertEqual(_next_chunk_size(1000, 1.0, 0.5, 100, 10000), 500)
+        self.assertEqual(_next_chunk_size(1000, 100, 0.5, 100, 10000), 100)
+
+    def test_queries_near_the_target_keep_the_chunk(self):
+        self.assertEqual(_next_chunk_size(1000, 0.4, 0.5, 100, 10000), 1000)
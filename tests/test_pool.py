@@ -0,0 +1,180 @@
+from unittest import TestCase, mock
+
+from django.core.exceptions import ImproperlyConfigured
+
+from mysql_cymysql import pool
+from mysql_cymysql.pool import COM_RESET_CONNECTION, ConnectionPool, close_pools, get_pool
+
+from . import fakes
+
+
+class ConnectionPoolTests(TestCase):
+    conn_params = {'host': 'fake', 'user': 'user', 'charset': 'utf8'}
+
+    def setUp(self):
+        patcher = mock.patch('mysql_cymysql.compression.connect', side_effect=fakes.connect)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pools)
+
+    def test_acquire_reuses_released_connection(self):
+        p = ConnectionPool(self.conn_params)
+        connection = p.acquire()
+        p.release(connection)
+        self.assertIs(p.acquire(), connection)
+        self.assertEqual(self.connect.call_count, 1)
+        self.assertEqual(p.size, 1)
+
+    def test_release_resets_session(self):
+        p = ConnectionPool(self.conn_params, max_size=1)
+        connection = p.acquire()
+        connection.sql_mode = 'TRADITIONAL'
+        connection._django_foreign_key_checks = False
+        connection._django_autocommit = True
+        connection._django_session_state = ('SET SESSION TRANSACTION ISOLATION LEVEL SERIALIZABLE',)
+        connection._django_statement_cache = object()
+        p.release(connection)
+        commands = connection.socket.commands
+        self.assertEqual(commands[0], (COM_RESET_CONNECTION, b''))
+        # The recorded session is applied again.
+        self.assertEqual(connection.socket.queries, [
+            "SET NAMES 'utf8'",
+            "SET sql_mode='TRADITIONAL'",
+            'SET SESSION TRANSACTION ISOLATION LEVEL SERIALIZABLE',
+            'SET autocommit=1, foreign_key_checks=0',
+        ])
+        self.assertEqual(connection._django_session_state, ('SET SESSION TRANSACTION ISOLATION LEVEL SERIALIZABLE',))
+        self.assertIs(connection._django_autocommit, True)
+        self.assertIs(connection._django_foreign_key_checks, False)
+        # The reset dropped the prepared statements.
+        self.assertIsNone(connection._django_statement_cache)
+        self.assertEqual(p.idle, 1)
+
+    def test_release_of_a_new_connection(self):
+        p = ConnectionPool(self.conn_params)
+        connection = p.acquire()
+        p.release(connection)
+        self.assertEqual(connection.socket.queries, ["SET NAMES 'utf8'"])
+        for name in pool.session_attributes:
+            self.assertIsNone(getattr(connection, name))
+
+    def test_servers_without_reset_raise(self):
+        for version in ('5.6.51-log', '5.5.5-10.1.48-MariaDB'):
+            with self.subTest(version=version):
+                p = ConnectionPool(self.conn_params)
+                with mock.patch.object(fakes, 'SERVER_DATA', {'version': version}):
+                    with self.assertRaisesRegex(ImproperlyConfigured, 'requires COM_RESET_CONNECTION'):
+                        p.acquire()
+                self.assertEqual(p.size, 0)
+        p = ConnectionPool(self.conn_params)
+        with mock.patch.object(fakes, 'SERVER_DATA', {'version': '5.5.5-10.6.12-MariaDB'}):
+            connection = p.acquire()
+        p.release(connection)
+        self.assertEqual(p.idle, 1)
+
+    def test_connection_that_fails_reset_is_closed(self):
+        p = ConnectionPool(self.conn_params)
+        connection = p.acquire()
+        connection.socket.reply = lambda command, payload: [fakes.error(1047, 'Unknown command')]
+        socket = connection.socket
+        p.release(connection)
+        self.assertTrue(socket.closed)
+        self.assertEqual((p.size, p.idle), (0, 0))
+
+    def test_exhausted_pool_times_out(self):
+        p = ConnectionPool(self.conn_params, max_size=1, timeout=0)
+        p.acquire()
+        with self.assertRaisesRegex(Exception, 'Timed out'):
+            p.acquire()
+
+    def test_expired_connection_is_closed_on_release(self):
+        p = ConnectionPool(self.conn_params, max_lifetime=0)
+        connection = p.acquire()
+        with mock.patch('time.monotonic', return_value=10 ** 9):
+            p.release(connection)
+        self.assertEqual((p.size, p.idle), (0, 0))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ConnectionPool(self.conn_params, size=3)
+        with self.assertRaises(ImproperlyConfigured):
+            ConnectionPool(self.conn_params, min_size=2, max_size=1)
+
+
+class GetPoolTests(TestCase):
+    conn_params = {'host': 'fake', 'user': 'user', 'db': 'get_pool'}
+
+    def setUp(self):
+        self.addCleanup(close_pools)
+
+    def test_same_parameters_share_a_pool(self):
+        self.assertIs(get_pool(dict(self.conn_params), {}), get_pool(dict(self.conn_params), {}))
+
+    def test_isolation_level_is_part_of_the_key(self):
+        self.assertIsNot(
+            get_pool(self.conn_params, {}, 'read committed'),
+            get_pool(self.conn_params, {}, 'serializable'),
+        )
+
+    def test_different_options_raise(self):
+        get_pool(self.conn_params, {'max_size': 5})
+        get_pool(self.conn_params, {'max_size': 5, 'timeout': 30})
+        with self.assertRaises(ImproperlyConfigured):
+            get_pool(self.conn_params, {'max_size': 6})
+
+    def test_forked_child_forgets_pools(self):
+        p = get_pool(self.conn_params, {})
+        connection = fakes.connect()
+        p._idle.append((connection, 0, 0))
+        socket = connection.socket
+        pool._forget_pools()
+        self.assertEqual(pool._pools, {})
+        self.assertTrue(socket.closed)
+        # No COM_QUIT: the parent's session stays open.
+        self.assertEqual(socket.commands, [])
+
+
+class PooledDatabaseWrapperTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('mysql_cymysql.compression.connect', side_effect=fakes.connect)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pools)
+        self.wrapper = fakes.make_wrapper({'pool': True})
+
+    def test_new_connection_is_set_up(self):
+        self.wrapper.ensure_connection()
+        self.assertEqual(self.wrapper.connection.socket.queries, [
+            'SET AUTOCOMMIT = 1', 'SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED',
+        ])
+        self.assertEqual(self.wrapper.session_setup_queries, 1)
+
+    def test_reused_connection_skips_setup(self):
+        self.wrapper.ensure_connection()
+        connection = self.wrapper.connection
+        self.wrapper.close()
+        socket = connection.socket
+        socket.commands.clear()
+        # Another thread's wrapper of the alias.
+        other = type(self.wrapper)(self.wrapper.settings_dict, self.wrapper.alias)
+        other.ensure_connection()
+        self.assertIs(other.connection, connection)
+        self.assertEqual(socket.commands, [])
+        self.assertEqual(other.session_setup_queries, 0)
+        with other.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        other.close()
+        # Only the query and the reset on release.
+        self.assertEqual(socket.queries[0], 'SELECT 1')
+        self.assertEqual(socket.commands[1], (COM_RESET_CONNECTION, b''))
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_changed_session_state_is_applied(self):
+        self.wrapper.ensure_connection()
+        connection = self.wrapper.connection
+        self.wrapper.close()
+        connection.socket.commands.clear()
+        connection._django_session_state = ('SET SESSION TRANSACTION ISOLATION LEVEL SERIALIZABLE',)
+        self.wrapper.ensure_connection()
+        self.assertEqual(connection.socket.queries, ['SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED'])
+        self.assertEqual(self.wrapper.session_setup_queries, 2)
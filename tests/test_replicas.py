@@ -0,0 +1,86 @@
+import uuid
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from cymysql.err import OperationalError
+
+from . import fakes
+
+FIELDS = [('source', FIELD_TYPE.VAR_STRING)]
+
+
+def server_reply(name, lag='0', error=None):
+    def reply(command, payload):
+        if payload.startswith(b'SHOW REPLICA STATUS'):
+            return fakes.result_set([('Seconds_Behind_Source', FIELD_TYPE.LONGLONG)], [(lag,)])
+        if payload.startswith(b'SELECT'):
+            if error is not None:
+                raise error
+            return fakes.result_set(FIELDS, [(name,)])
+        return [fakes.ok()]
+    return reply
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        # Replica states are shared by the process, keyed by host.
+        self.host = 'replica-%s' % uuid.uuid4().hex
+        self.replica_reply = server_reply('replica')
+        self.replica_sockets = []
+
+        def connect(**params):
+            self.assertEqual(params['host'], self.host)
+            connection = fakes.connect(self.replica_reply, **params)
+            self.replica_sockets.append(connection.socket)
+            return connection
+
+        patcher = mock.patch('mysql_cymysql.compression.connect', side_effect=connect)
+        self.addCleanup(patcher.stop)
+        self.wrapper = fakes.make_wrapper({'replicas': {'hosts': [{'HOST': self.host}], 'max_lag': 5}})
+        with mock.patch(
+            'mysql_cymysql.compression.connect',
+            side_effect=lambda **params: fakes.connect(server_reply('primary'), **params),
+        ):
+            self.wrapper.ensure_connection()
+        patcher.start()
+
+    def read(self, sql='SELECT source FROM t'):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(self.read(), 'replica')
+        self.assertEqual(self.read(), 'replica')
+        # One connection, whose lag was checked once.
+        socket, = self.replica_sockets
+        self.assertEqual(sum(q == 'SHOW REPLICA STATUS' for q in socket.queries), 1)
+
+    def test_locking_reads_and_transactions_use_the_primary(self):
+        self.assertEqual(self.read('SELECT source FROM t FOR UPDATE'), 'primary')
+        self.wrapper.set_autocommit(False)
+        try:
+            self.assertEqual(self.read(), 'primary')
+        finally:
+            self.wrapper.set_autocommit(True)
+
+    def test_reads_after_a_write_use_the_primary(self):
+        self.assertEqual(self.read(), 'replica')
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('UPDATE t SET a = 1')
+        self.assertEqual(self.read(), 'primary')
+
+    def test_lagging_replicas_are_skipped(self):
+        self.replica_reply = server_reply('replica', lag='10')
+        self.assertEqual(self.read(), 'primary')
+        self.assertTrue(self.replica_sockets[0].closed)
+
+    def test_failover_to_the_primary(self):
+        # As the driver raises it when the socket fails.
+        self.replica_reply = server_reply('replica', error=OperationalError(2013, 'Lost connection'))
+        self.assertEqual(self.read(), 'primary')
+        state, = self.wrapper.replicas.states
+        self.assertGreater(state.down_until, 0)
+        # The replica is skipped while it's down.
+        self.assertEqual(self.read(), 'primary')
+        self.assertEqual(len(self.replica_sockets), 1)
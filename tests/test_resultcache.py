@@ -0,0 +1,171 @@
+import re
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.core.exceptions import ImproperlyConfigured
+
+from mysql_cymysql import bulk
+from mysql_cymysql.resultcache import ResultCache, query_tables
+
+from . import fakes
+
+FIELDS = [('name', FIELD_TYPE.VAR_STRING)]
+OPTIONS = {'result_cache': {'tables': ['flags']}}
+
+
+def reply(command, payload):
+    if payload.startswith(b'SELECT'):
+        return fakes.result_set(FIELDS, [('on',)])
+    return [fakes.ok(affected_rows=1)]
+
+
+class ResultCacheOptionsTests(TestCase):
+    def assertRaisesMessage(self, exception, message):
+        return self.assertRaisesRegex(exception, re.escape(message))
+
+    def test_tables_are_required(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "requires 'tables'"):
+            ResultCache()
+        with self.assertRaisesMessage(ImproperlyConfigured, "requires 'tables'"):
+            ResultCache(tables=[])
+
+    def test_unknown_option(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'Invalid result cache option(s): size.'):
+            ResultCache(tables=['flags'], size=1)
+
+    def test_query_tables(self):
+        self.assertEqual(
+            query_tables('SELECT a FROM `db`.`flags` JOIN tenants ON 1 WHERE b IN (SELECT c FROM d)'),
+            {'flags', 'tenants', 'd'},
+        )
+        self.assertEqual(query_tables('SELECT EXTRACT(YEAR FROM `flags`.`at`), a, b FROM flags'), {'flags', 'at'})
+
+    def test_tables_joined_with_commas_cant_be_told(self):
+        for sql in (
+            'SELECT * FROM flags, other', 'SELECT * FROM `flags` f , `other` o WHERE f.id = o.id',
+            'SELECT * FROM flags JOIN a ON a.id = flags.id, other', 'SELECT * FROM (SELECT id FROM flags) f, other',
+            'UPDATE flags, other SET flags.name = other.name',
+        ):
+            with self.subTest(sql=sql):
+                self.assertIsNone(query_tables(sql))
+        self.assertEqual(query_tables("SELECT a, b FROM flags WHERE c IN (1, 2) AND d = 'e, f' ORDER BY a, b"), {'flags'})
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(reply, OPTIONS)
+        self.socket = self.wrapper.connection.socket
+        self.addCleanup(self.wrapper.result_cache.clear)
+
+    def read(self, sql='SELECT name FROM flags WHERE id = %s', args=(1,), wrapper=None):
+        with (wrapper or self.wrapper).cursor() as cursor:
+            cursor.execute(sql, args)
+            return cursor.fetchall()
+
+    def selects(self, socket=None):
+        return [q for q in (socket or self.socket).queries if q.startswith('SELECT')]
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        self.assertEqual(self.read(), [('on',)])
+        self.assertEqual(self.read(), [('on',)])
+        self.assertEqual(len(self.selects()), 1)
+        self.assertEqual(self.wrapper.result_cache.stats()['hits'], 1)
+
+    def test_only_listed_tables_are_cached(self):
+        for sql in ('SELECT name FROM other', 'SELECT name FROM flags JOIN other ON 1'):
+            self.read(sql, None)
+            self.read(sql, None)
+        self.assertEqual(len(self.selects()), 4)
+
+    def test_comma_joins_bypass_the_cache(self):
+        for sql in ('SELECT name FROM flags, other', 'SELECT name FROM flags f, flags g'):
+            self.read(sql, None)
+            self.read(sql, None)
+        self.assertEqual(len(self.selects()), 4)
+
+    def test_comma_joined_writes_invalidate_every_table(self):
+        self.read()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('UPDATE other, tenants SET other.name = tenants.name')
+        self.read()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_volatile_functions_bypass_the_cache(self):
+        for sql in (
+            'SELECT NOW() FROM flags', 'SELECT name FROM flags ORDER BY RAND()',
+            'SELECT name FROM flags WHERE at < CURRENT_TIMESTAMP', 'SELECT USER () FROM flags',
+        ):
+            self.read(sql, None)
+            self.read(sql, None)
+        self.assertEqual(len(self.selects()), 8)
+
+    def test_writes_invalidate(self):
+        self.read()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('UPDATE flags SET name = %s', ['off'])
+        self.read()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_executemany_after_a_cached_read(self):
+        self.read()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT name FROM flags WHERE id = %s', [1])
+            cursor.fetchall()
+            cursor.executemany('UPDATE flags SET name = %s WHERE id = %s', [('off', 1), ('on', 2)])
+            self.assertEqual(cursor.rowcount, 2)
+        self.assertEqual(self.socket.queries[-2:], [
+            "UPDATE flags SET name = 'off' WHERE id = 1", "UPDATE flags SET name = 'on' WHERE id = 2",
+        ])
+        self.read()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_closing_a_cached_result_closes_the_cursor(self):
+        self.read()
+        cursor = self.wrapper.cursor()
+        cursor.execute('SELECT name FROM flags WHERE id = %s', [1])
+        primary = cursor.primary_cursor
+        with mock.patch.object(primary, 'close') as close:
+            cursor.close()
+        close.assert_called_once_with()
+
+    def test_load_rows_invalidates(self):
+        self.read()
+        with mock.patch.object(bulk, '_load', return_value=1):
+            bulk.load_rows(self.wrapper, 'flags', [('off',)], columns=['name'])
+        self.read()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_load_rows_failure_invalidates(self):
+        self.read()
+        with mock.patch.object(bulk, '_load', side_effect=OSError):
+            with self.assertRaises(OSError):
+                bulk.load_rows(self.wrapper, 'flags', [('off',)], columns=['name'])
+        self.read()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_users_dont_share_entries(self):
+        self.read()
+        other = fakes.connected_wrapper(reply, OPTIONS, NAME=self.wrapper.settings_dict['NAME'], USER='other')
+        self.assertIs(other.result_cache, self.wrapper.result_cache)
+        self.read(wrapper=other)
+        self.assertEqual(len(self.selects(other.connection.socket)), 1)
+        same = fakes.connected_wrapper(reply, OPTIONS, NAME=self.wrapper.settings_dict['NAME'])
+        self.read(wrapper=same)
+        self.assertEqual(self.selects(same.connection.socket), [])
+
+    def test_session_settings_dont_share_entries(self):
+        self.read()
+        options = dict(OPTIONS, init_command="SET time_zone = '+09:00'")
+        other = fakes.connected_wrapper(reply, options, NAME=self.wrapper.settings_dict['NAME'])
+        self.read(wrapper=other)
+        self.assertEqual(len(self.selects(other.connection.socket)), 1)
+
+    def test_transactions_bypass_the_cache(self):
+        self.read()
+        self.wrapper.set_autocommit(False)
+        try:
+            self.read()
+        finally:
+            self.wrapper.rollback()
+            self.wrapper.set_autocommit(True)
+        self.assertEqual(len(self.selects()), 2)
@@ -0,0 +1,119 @@
+from unittest import TestCase, mock
+
+from django.db import connections, transaction
+
+from mysql_cymysql import bulk
+
+from . import fakes
+
+
+class SavepointTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper()
+        connections['savepoints'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'savepoints')
+
+    def queries(self):
+        queries = self.wrapper.connection.socket.queries
+        return [q.split('`')[0].strip() if '`' in q else q for q in queries]
+
+    def execute(self, sql='UPDATE t SET a = 1'):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(sql)
+
+    def test_blocks_without_statements_send_no_savepoints(self):
+        with transaction.atomic(using='savepoints'):
+            with transaction.atomic(using='savepoints'):
+                with transaction.atomic(using='savepoints'):
+                    pass
+        self.assertEqual(self.queries(), ['SET AUTOCOMMIT = 0', 'COMMIT', 'SET AUTOCOMMIT = 1'])
+
+    def test_savepoints_are_created_before_the_first_statement(self):
+        with transaction.atomic(using='savepoints'):
+            with transaction.atomic(using='savepoints'):
+                with transaction.atomic(using='savepoints'):
+                    self.execute()
+                    self.execute()
+        self.assertEqual(self.queries(), [
+            'SET AUTOCOMMIT = 0', 'SAVEPOINT', 'SAVEPOINT', 'UPDATE t SET a = 1', 'UPDATE t SET a = 1',
+            'RELEASE SAVEPOINT', 'RELEASE SAVEPOINT', 'COMMIT', 'SET AUTOCOMMIT = 1',
+        ])
+
+    def test_only_the_savepoints_statements_ran_in_are_created(self):
+        with transaction.atomic(using='savepoints'):
+            with transaction.atomic(using='savepoints'):
+                self.execute()
+                with transaction.atomic(using='savepoints'):
+                    pass
+        self.assertEqual(self.queries(), [
+            'SET AUTOCOMMIT = 0', 'SAVEPOINT', 'UPDATE t SET a = 1', 'RELEASE SAVEPOINT', 'COMMIT',
+            'SET AUTOCOMMIT = 1',
+        ])
+
+    def test_rollback(self):
+        with transaction.atomic(using='savepoints'):
+            with self.assertRaises(ValueError), transaction.atomic(using='savepoints'):
+                self.execute()
+                raise ValueError
+            with self.assertRaises(ValueError), transaction.atomic(using='savepoints'):
+                raise ValueError
+        self.assertEqual(self.queries(), [
+            'SET AUTOCOMMIT = 0', 'SAVEPOINT', 'UPDATE t SET a = 1', 'ROLLBACK TO SAVEPOINT',
+            'RELEASE SAVEPOINT', 'COMMIT', 'SET AUTOCOMMIT = 1',
+        ])
+
+    def test_savepoint_api(self):
+        with transaction.atomic(using='savepoints'):
+            sid = transaction.savepoint(using='savepoints')
+            transaction.savepoint_rollback(sid, using='savepoints')
+            # sid is still pending and is created for this statement.
+            self.execute()
+            transaction.savepoint_rollback(sid, using='savepoints')
+        self.assertEqual(self.queries(), [
+            'SET AUTOCOMMIT = 0', 'SAVEPOINT', 'UPDATE t SET a = 1', 'ROLLBACK TO SAVEPOINT', 'COMMIT',
+            'SET AUTOCOMMIT = 1',
+        ])
+
+    def test_load_rows_creates_pending_savepoints(self):
+        with mock.patch.object(bulk, '_load', return_value=1) as load:
+            load.side_effect = lambda *args: self.assertEqual(self.wrapper.pending_savepoints, ())
+            with transaction.atomic(using='savepoints'), transaction.atomic(using='savepoints'):
+                bulk.load_rows(self.wrapper, 't', [(1,)], columns=['a'])
+        self.assertEqual(self.queries(), [
+            'SET AUTOCOMMIT = 0', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'COMMIT', 'SET AUTOCOMMIT = 1',
+        ])
+
+    def test_pending_savepoints_are_dropped_on_rollback(self):
+        self.wrapper.set_autocommit(False)
+        self.wrapper.savepoint()
+        self.assertEqual(len(self.wrapper.pending_savepoints), 1)
+        self.wrapper.rollback()
+        self.assertEqual(self.wrapper.pending_savepoints, ())
+
+
+class SessionToggleTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper()
+        self.socket = self.wrapper.connection.socket
+
+    def test_autocommit_is_only_sent_when_it_changes(self):
+        self.wrapper.set_autocommit(True)
+        self.assertEqual(self.socket.queries, [])
+        self.wrapper.set_autocommit(False)
+        # As when a pooled connection is handed out again.
+        self.wrapper.autocommit = True
+        self.wrapper.set_autocommit(False)
+        self.assertEqual(self.socket.queries, ['SET AUTOCOMMIT = 0'])
+
+    def test_failed_autocommit_change_is_unknown(self):
+        self.socket.reply = fakes.query_reply({'SET AUTOCOMMIT': [fakes.error(1105, 'Unknown error')]})
+        with self.assertRaises(Exception):
+            self.wrapper.set_autocommit(False)
+        self.assertIsNone(self.wrapper.connection._django_autocommit)
+
+    def test_foreign_key_checks_are_only_sent_when_they_change(self):
+        self.assertTrue(self.wrapper.disable_constraint_checking())
+        self.assertTrue(self.wrapper.disable_constraint_checking())
+        self.wrapper.enable_constraint_checking()
+        self.wrapper.enable_constraint_checking()
+        self.assertEqual(self.socket.queries, ['SET foreign_key_checks=0', 'SET foreign_key_checks=1'])
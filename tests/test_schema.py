@@ -0,0 +1,204 @@
+import re
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections, models
+
+from mysql_cymysql.schema import OnlineDDL
+
+from . import fakes
+
+
+class Widget(models.Model):
+    name = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'tests'
+
+
+def ddl_reply(unsupported=()):
+    """Fails the DDL statements that contain one of unsupported with 1846."""
+    def reply(command, payload):
+        sql = payload.decode()
+        if any(clause in sql for clause in unsupported):
+            return [fakes.error(1846, '%s is not supported for this operation.' % sql.rsplit(', ', 1)[-1])]
+        return [fakes.ok()]
+    return reply
+
+
+class OnlineDDLOptionsTests(TestCase):
+    def test_invalid_options(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, r'Invalid online DDL option\(s\): speed\.'):
+            OnlineDDL(speed=1)
+        with self.assertRaisesRegex(ImproperlyConfigured, "Invalid online DDL algorithm 'copy'"):
+            OnlineDDL(algorithm='copy')
+        with self.assertRaisesRegex(ImproperlyConfigured, "Invalid online DDL lock 'exclusive'"):
+            OnlineDDL(lock='exclusive')
+
+    def test_clauses(self):
+        online_ddl = OnlineDDL()
+        self.assertEqual(
+            online_ddl.clauses(True, True), [['ALGORITHM=INSTANT'], ['ALGORITHM=INPLACE', 'LOCK=NONE']],
+        )
+        self.assertEqual(online_ddl.clauses(True, False), [['ALGORITHM=INPLACE', 'LOCK=NONE']])
+        # Index changes are never instant.
+        self.assertEqual(online_ddl.clauses(False, True), [['ALGORITHM=INPLACE', 'LOCK=NONE']])
+        self.assertEqual(
+            OnlineDDL(algorithm='inplace', lock='shared').clauses(True, True),
+            [['ALGORITHM=INPLACE', 'LOCK=SHARED']],
+        )
+
+
+class OnlineDDLTests(TestCase):
+    def wrapper(self, reply=None, **options):
+        wrapper = fakes.connected_wrapper(reply or ddl_reply(), {'online_ddl': options}, alias='schema')
+        connections['schema'] = wrapper
+        self.addCleanup(connections.__delitem__, 'schema')
+        return wrapper
+
+    def test_alter_table_is_instant(self):
+        wrapper = self.wrapper()
+        with wrapper.schema_editor() as editor:
+            editor.execute('ALTER TABLE `t` ADD COLUMN `a` integer NULL')
+        self.assertEqual(wrapper.connection.socket.queries, [
+            'ALTER TABLE `t` ADD COLUMN `a` integer NULL, ALGORITHM=INSTANT',
+        ])
+
+    def test_inplace_then_copy(self):
+        wrapper = self.wrapper(ddl_reply(['ALGORITHM=INSTANT', 'LOCK=NONE']))
+        with self.assertLogs('mysql_cymysql.schema', 'INFO') as logs:
+            with wrapper.schema_editor() as editor:
+                editor.execute('ALTER TABLE `t` MODIFY `a` bigint NULL')
+        self.assertEqual(wrapper.connection.socket.queries, [
+            'ALTER TABLE `t` MODIFY `a` bigint NULL, ALGORITHM=INSTANT',
+            'ALTER TABLE `t` MODIFY `a` bigint NULL, ALGORITHM=INPLACE, LOCK=NONE',
+            'ALTER TABLE `t` MODIFY `a` bigint NULL',
+        ])
+        self.assertEqual([record.levelname for record in logs.records], ['INFO', 'WARNING'])
+        self.assertIn('may block writes', logs.records[1].getMessage())
+
+    def test_no_copy_fallback(self):
+        wrapper = self.wrapper(ddl_reply(['ALGORITHM=']), copy_fallback=False)
+        with self.assertRaises(DatabaseError) as cm, wrapper.schema_editor() as editor:
+            editor.execute('CREATE INDEX `i` ON `t` (`a`)')
+        self.assertEqual(cm.exception.args[0], 1846)
+        self.assertEqual(wrapper.connection.socket.queries, ['CREATE INDEX `i` ON `t` (`a`) ALGORITHM=INPLACE LOCK=NONE'])
+
+    def test_other_errors_are_raised(self):
+        def reply(command, payload):
+            if payload.startswith(b'DROP'):
+                return [fakes.error(1091, "Can't DROP 'i'; check that column/key exists")]
+            return [fakes.ok()]
+        wrapper = self.wrapper(reply)
+        with self.assertRaises(DatabaseError), wrapper.schema_editor() as editor:
+            editor.execute('DROP INDEX `i` ON `t`')
+        self.assertEqual(wrapper.connection.socket.queries, ['DROP INDEX `i` ON `t` ALGORITHM=INPLACE LOCK=NONE'])
+
+    def test_other_statements_and_collected_sql_are_unchanged(self):
+        wrapper = self.wrapper()
+        with wrapper.schema_editor() as editor:
+            editor.execute('CREATE TABLE `t` (`a` integer)')
+        with wrapper.schema_editor(collect_sql=True) as editor:
+            editor.execute('ALTER TABLE `t` ADD COLUMN `b` integer NULL')
+        self.assertEqual(editor.collected_sql, ['ALTER TABLE `t` ADD COLUMN `b` integer NULL;'])
+        self.assertEqual(wrapper.connection.socket.queries, ['CREATE TABLE `t` (`a` integer)'])
+
+    def test_statements_change_the_schema_version(self):
+        wrapper = self.wrapper()
+        version = wrapper.schema_version
+        with wrapper.schema_editor() as editor:
+            editor.execute('ALTER TABLE `t` ADD COLUMN `a` integer NULL')
+        self.assertNotEqual(wrapper.schema_version, version)
+
+
+class BackfillTests(TestCase):
+    def setUp(self):
+        self.ids = list(range(1, 8))
+        self.wrapper = fakes.connected_wrapper(
+            self.reply, {'online_ddl': {'algorithm': 'inplace', 'backfill_batch_size': 3}}, alias='schema',
+        )
+        connections['schema'] = self.wrapper
+        self.addCleanup(connections.__delitem__, 'schema')
+
+    def queries(self):
+        # Without the storage engine lookups of the schema editor.
+        return [q for q in self.wrapper.connection.socket.queries if not q.startswith('SELECT engine')]
+
+    def reply(self, command, payload):
+        sql = payload.decode()
+        if sql.startswith('SELECT engine'):
+            return fakes.result_set([('engine', FIELD_TYPE.VAR_STRING)], [])
+        if sql.startswith('SELECT'):
+            after = re.search(r'WHERE `id` > (\d+)', sql)
+            offset = int(re.search(r'OFFSET (\d+)', sql)[1])
+            ids = [i for i in self.ids if after is None or i > int(after[1])]
+            return fakes.result_set([('id', FIELD_TYPE.LONG)], [(str(ids[offset]),)] if offset < len(ids) else [])
+        if sql.startswith('UPDATE'):
+            return [fakes.ok(affected_rows=3)]
+        return [fakes.ok()]
+
+    def test_add_field_with_a_default_is_backfilled(self):
+        field = models.IntegerField(default=5)
+        field.set_attributes_from_name('rank')
+        with mock.patch('mysql_cymysql.schema.time.sleep') as sleep, self.wrapper.schema_editor() as editor:
+            editor.add_field(Widget, field)
+        sleep.assert_not_called()
+        queries = self.queries()
+        self.assertEqual(queries[0], 'ALTER TABLE `tests_widget` ADD COLUMN `rank` integer NULL, ALGORITHM=INPLACE, LOCK=NONE')
+        self.assertEqual([q for q in queries if q.startswith(('SELECT', 'UPDATE'))], [
+            'SELECT `id` FROM `tests_widget` ORDER BY `id` LIMIT 1 OFFSET 2',
+            'UPDATE `tests_widget` SET `rank` = 5 WHERE `id` <= 3',
+            'SELECT `id` FROM `tests_widget` WHERE `id` > 3 ORDER BY `id` LIMIT 1 OFFSET 2',
+            'UPDATE `tests_widget` SET `rank` = 5 WHERE `id` > 3 AND `id` <= 6',
+            'SELECT `id` FROM `tests_widget` WHERE `id` > 6 ORDER BY `id` LIMIT 1 OFFSET 2',
+            'UPDATE `tests_widget` SET `rank` = 5 WHERE `id` > 6',
+        ])
+        self.assertEqual(
+            queries[-1], 'ALTER TABLE `tests_widget` MODIFY `rank` integer NOT NULL, ALGORITHM=INPLACE, LOCK=NONE',
+        )
+
+    def test_nullable_fields_without_defaults_are_added_directly(self):
+        field = models.IntegerField(null=True)
+        field.set_attributes_from_name('rank')
+        with self.wrapper.schema_editor() as editor:
+            editor.add_field(Widget, field)
+        self.assertEqual(self.queries(), [
+            'ALTER TABLE `tests_widget` ADD COLUMN `rank` integer NULL, ALGORITHM=INPLACE, LOCK=NONE',
+        ])
+
+    def test_backfill_pause(self):
+        self.wrapper.online_ddl.backfill_pause = 0.5
+        with mock.patch('mysql_cymysql.schema.time.sleep') as sleep, self.wrapper.schema_editor() as editor:
+            editor.backfill(Widget, 'name', 'x')
+        self.assertEqual(sleep.call_args_list, [mock.call(0.5)] * 2)
+
+    def test_backfill_waits_for_lagging_replicas(self):
+        lags = [10, 1]
+
+        class State:
+            down_until = 0
+            lag = None
+
+        class ReplicaSet:
+            states = [State()]
+            check_interval = 2
+            primary_params = {}
+
+            def conn_params(self, state, primary_params):
+                return {}
+
+            def check(self, state, connection):
+                state.lag = lags.pop(0)
+
+        self.wrapper.replicas = ReplicaSet()
+        replica = mock.Mock()
+        with mock.patch('mysql_cymysql.schema.compression.connect', return_value=replica) as connect, \
+                mock.patch('mysql_cymysql.schema.time.sleep') as sleep:
+            with self.wrapper.schema_editor() as editor:
+                editor._throttle_backfill()
+        # One connection, checked until the lag is within backfill_max_lag,
+        # and closed with the editor.
+        connect.assert_called_once_with()
+        self.assertEqual(sleep.call_args_list, [mock.call(2)])
+        replica.close.assert_called_once_with()
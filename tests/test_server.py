@@ -0,0 +1,82 @@
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+
+from mysql_cymysql.server import ServerDataCache, server_data_cache, server_key
+
+from . import fakes
+
+
+class ServerDataCacheTests(TestCase):
+    def test_loads_once(self):
+        cache = ServerDataCache()
+        loader = mock.Mock(return_value={'version': '8.0.36'})
+        self.assertEqual(cache.get('k', loader), {'version': '8.0.36'})
+        self.assertEqual(cache.get('k', loader), {'version': '8.0.36'})
+        loader.assert_called_once_with()
+
+    def test_reloads_after_ttl(self):
+        cache = ServerDataCache()
+        loader = mock.Mock(side_effect=[1, 2])
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertEqual(cache.get('k', loader, ttl=10), 1)
+        with mock.patch('time.monotonic', return_value=105):
+            self.assertEqual(cache.get('k', loader, ttl=10), 1)
+        with mock.patch('time.monotonic', return_value=111):
+            self.assertEqual(cache.get('k', loader, ttl=10), 2)
+
+    def test_stale_ok(self):
+        cache = ServerDataCache()
+        loader = mock.Mock(side_effect=[1, 2])
+        with mock.patch('time.monotonic', return_value=100):
+            cache.get('k', loader, ttl=10)
+        with mock.patch('time.monotonic', return_value=111):
+            self.assertEqual(cache.get('k', loader, ttl=10, stale_ok=True), 1)
+            self.assertEqual(cache.get('k', loader, ttl=10), 2)
+
+    def test_refresh(self):
+        cache = ServerDataCache()
+        loader = mock.Mock(side_effect=[1, 2, 3])
+        cache.get('a', loader)
+        cache.get('b', loader)
+        cache.refresh('a')
+        self.assertEqual(cache.get('a', loader), 3)
+        self.assertEqual(cache.get('b', loader), 2)
+
+
+class DatabaseWrapperServerDataTests(TestCase):
+    def test_wrappers_share_server_data(self):
+        wrapper = fakes.make_wrapper(server_data={**fakes.SERVER_DATA, 'version': '10.6.12-MariaDB'})
+        other = type(wrapper)(wrapper.settings_dict, 'other')
+        self.assertEqual(other.mysql_version, (10, 6, 12))
+        self.assertTrue(other.mysql_is_mariadb)
+        self.assertEqual(other.sql_mode, {'ONLY_FULL_GROUP_BY', 'STRICT_TRANS_TABLES'})
+
+    def test_refresh_server_data(self):
+        wrapper = fakes.make_wrapper()
+        wrapper.refresh_server_data()
+        self.assertNotIn(server_key(wrapper.settings_dict), server_data_cache._entries)
+
+    def test_expired_data_is_served_while_streaming(self):
+        wrapper = fakes.connected_wrapper()
+        key = server_key(wrapper.settings_dict)
+        server_data_cache._entries[key] = (0, dict(fakes.SERVER_DATA, version='8.0.1'))
+        wrapper.open_stream = mock.Mock()
+        self.assertEqual(wrapper.mysql_server_info, '8.0.1')
+        self.assertEqual(wrapper.connection.socket.commands, [])
+
+    def test_missing_data_is_read_on_another_connection_while_streaming(self):
+        fields = [(name, FIELD_TYPE.VAR_STRING) for name in 'abcdefg']
+
+        def reply(command, payload):
+            if b'SELECT VERSION()' in payload:
+                return fakes.result_set(fields, [('8.0.40', 'TRADITIONAL', 'InnoDB', '0', '0', '1', '4194304')])
+            return [fakes.ok()]
+
+        wrapper = fakes.connected_wrapper()
+        wrapper.refresh_server_data()
+        wrapper.open_stream = mock.Mock()
+        with mock.patch('mysql_cymysql.compression.connect', side_effect=lambda **params: fakes.connect(reply, **params)):
+            self.assertEqual(wrapper.mysql_server_info, '8.0.40')
+        self.assertEqual(wrapper.connection.socket.commands, [])
+        self.assertEqual(wrapper.mysql_server_data['max_allowed_packet'], 4194304)
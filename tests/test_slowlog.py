@@ -0,0 +1,80 @@
+from unittest import TestCase, mock
+
+from cymysql.constants import FIELD_TYPE
+
+from . import fakes
+from .test_statements import PreparedServer
+
+PLAN = '{"query_block": {"select_id": 1}}'
+
+
+def explain_reply(command, payload):
+    if payload.startswith(b'EXPLAIN'):
+        return fakes.result_set([('EXPLAIN', FIELD_TYPE.VAR_STRING)], [(PLAN,)])
+    return [fakes.ok()]
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        # The sockets of the connections opened to capture plans.
+        self.explain_sockets = []
+
+        def connect(**params):
+            connection = fakes.connect(explain_reply, **params)
+            self.assertEqual(params['user'], 'user')
+            self.explain_sockets.append(connection.socket)
+            return connection
+
+        patcher = mock.patch('mysql_cymysql.compression.connect', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connected_wrapper(self, reply, options):
+        wrapper = fakes.make_wrapper(options)
+        with mock.patch('mysql_cymysql.compression.connect', side_effect=lambda **params: fakes.connect(reply, **params)):
+            wrapper.ensure_connection()
+        return wrapper
+
+    def run_slow_query(self, wrapper, sql, params):
+        # The plan is captured without rebuilding the connection's state.
+        with mock.patch.object(wrapper, 'get_connection_params', side_effect=AssertionError):
+            with self.assertLogs('mysql_cymysql.slowlog', 'WARNING') as logs:
+                with wrapper.cursor() as cursor:
+                    cursor.execute(sql, params)
+        return logs.records[0]
+
+    def test_slow_statements_are_logged_with_their_plan(self):
+        wrapper = self.connected_wrapper(fakes.ok_reply, {'slow_query_log': {'threshold': 0}})
+        record = self.run_slow_query(wrapper, 'UPDATE t SET a = %s WHERE b = %s', [1, 'x'])
+        self.assertEqual(record.sql, "UPDATE t SET a = 1 WHERE b = 'x'")
+        self.assertEqual(record.fingerprint, 'UPDATE t SET a = ? WHERE b = ?')
+        self.assertEqual(record.plan, PLAN)
+        explain, = self.explain_sockets
+        self.assertEqual(explain.queries, ["EXPLAIN FORMAT=JSON UPDATE t SET a = 1 WHERE b = 'x'"])
+        self.assertTrue(explain.closed)
+
+    def test_prepared_statements_are_explained_with_their_values(self):
+        wrapper = self.connected_wrapper(
+            PreparedServer(), {'slow_query_log': {'threshold': 0}, 'prepared_statements': True},
+        )
+        record = self.run_slow_query(wrapper, 'SELECT * FROM t WHERE id = %s', [7])
+        self.assertEqual(record.plan, PLAN)
+        self.assertEqual(
+            self.explain_sockets[0].queries,
+            ['EXPLAIN FORMAT=JSON SELECT * FROM t WHERE id = 7'],
+        )
+
+    def test_redact(self):
+        wrapper = self.connected_wrapper(
+            fakes.ok_reply, {'slow_query_log': {'threshold': 0, 'redact': True, 'explain': False}},
+        )
+        record = self.run_slow_query(wrapper, 'DELETE FROM t WHERE b = %s', ['secret'])
+        self.assertEqual((record.sql, record.params, record.plan), ('DELETE FROM t WHERE b = %s', None, None))
+        self.assertEqual(self.explain_sockets, [])
+
+    def test_redact_skips_the_plan(self):
+        wrapper = self.connected_wrapper(fakes.ok_reply, {'slow_query_log': {'threshold': 0, 'redact': True}})
+        record = self.run_slow_query(wrapper, 'SELECT * FROM t WHERE b = %s', ['secret'])
+        self.assertEqual((record.sql, record.params, record.plan), ('SELECT * FROM t WHERE b = %s', None, None))
+        self.assertNotIn('secret', record.getMessage())
+        self.assertEqual(self.explain_sockets, [])
@@ -0,0 +1,179 @@
+import datetime
+import struct
+from unittest import TestCase
+
+from cymysql.constants import FIELD_TYPE, FLAG
+
+from mysql_cymysql import statements
+
+from . import fakes
+
+FIELDS = [
+    ('id', FIELD_TYPE.LONG),
+    fakes.field('big', FIELD_TYPE.LONGLONG, flags=FLAG.UNSIGNED),
+    ('ratio', FIELD_TYPE.DOUBLE),
+    ('name', FIELD_TYPE.VAR_STRING),
+    ('created', FIELD_TYPE.DATETIME),
+    ('day', FIELD_TYPE.DATE),
+    ('zero_day', FIELD_TYPE.DATE),
+    ('at', FIELD_TYPE.TIME),
+    ('small', FIELD_TYPE.SHORT),
+    ('missing', FIELD_TYPE.VAR_STRING),
+]
+# Binary encodings of the values of FIELDS, None for NULL.
+ROW = [
+    struct.pack('<i', -7),
+    struct.pack('<Q', 1 << 63),
+    struct.pack('<d', 0.25),
+    fakes.lenenc_str('né'),
+    b'\x0b' + struct.pack('<HBBBBBI', 2024, 2, 29, 13, 14, 15, 16),
+    b'\x04' + struct.pack('<HBB', 2024, 1, 2),
+    b'\x00',
+    b'\x08' + struct.pack('<BIBBB', 0, 0, 1, 2, 3),
+    None,
+    None,
+]
+
+
+def binary_row(values):
+    # The NULL bitmap has an offset of 2 bits.
+    null_bitmap = bytearray((len(values) + 9) // 8)
+    for i, value in enumerate(values):
+        if value is None:
+            null_bitmap[(i + 2) // 8] |= 1 << ((i + 2) % 8)
+    return b'\x00' + bytes(null_bitmap) + b''.join(value for value in values if value is not None)
+
+
+class PreparedServer:
+    """
+    A reply function for a server that prepares statements and answers their
+    execution with rows, or with prepare_error.
+    """
+    def __init__(self, fields=FIELDS, rows=(ROW,), prepare_error=None):
+        self.fields = fields
+        self.rows = rows
+        self.prepare_error = prepare_error
+        self.next_id = 1
+
+    def __call__(self, command, payload):
+        if command == statements.COM_STMT_PREPARE:
+            if self.prepare_error is not None:
+                return [self.prepare_error]
+            statement_id, self.next_id = self.next_id, self.next_id + 1
+            num_params = payload.count(b'?')
+            packets = [b'\x00' + struct.pack('<IHHBH', statement_id, len(self.fields), num_params, 0, 0)]
+            if num_params:
+                packets += [fakes.field('?', FIELD_TYPE.VAR_STRING)] * num_params + [fakes.eof()]
+            packets += [f if isinstance(f, bytes) else fakes.field(*f) for f in self.fields] + [fakes.eof()]
+            return packets
+        if command == statements.COM_STMT_EXECUTE:
+            return (
+                [fakes.lenenc_int(len(self.fields))] +
+                [f if isinstance(f, bytes) else fakes.field(*f) for f in self.fields] +
+                [fakes.eof()] + [binary_row(row) for row in self.rows] + [fakes.eof()]
+            )
+        if command == statements.COM_STMT_CLOSE:
+            return []
+        if payload.startswith(b'SELECT'):
+            return fakes.result_set([('a', FIELD_TYPE.LONG)], [('1',)])
+        return [fakes.ok()]
+
+
+def commands(wrapper, command):
+    return [payload for c, payload in wrapper.connection.socket.commands if c == command]
+
+
+class BinaryProtocolTests(TestCase):
+    def setUp(self):
+        self.wrapper = fakes.connected_wrapper(PreparedServer(), {'prepared_statements': True})
+
+    def test_values_are_decoded(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT * FROM t WHERE id = %s', [-7])
+            self.assertEqual(cursor.fetchall(), [(
+                -7, 1 << 63, 0.25, 'né', datetime.datetime(2024, 2, 29, 13, 14, 15, 16),
+                datetime.date(2024, 1, 2), None, datetime.time(1, 2, 3), None, None,
+            )])
+        self.assertEqual(commands(self.wrapper, statements.COM_STMT_PREPARE), [b'SELECT * FROM t WHERE id = ?'])
+
+    def test_null_bitmap_spans_bytes(self):
+        fields = [('c%d' % i, FIELD_TYPE.LONG) for i in range(12)]
+        values = [None if i in (0, 5, 6, 11) else struct.pack('<i', i) for i in range(12)]
+        self.wrapper.connection.socket.reply = PreparedServer(fields, [values])
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT * FROM t WHERE id = %s', [1])
+            self.assertEqual(cursor.fetchone(), (None, 1, 2, 3, 4, None, None, 7, 8, 9, 10, None))
+
+    def test_dates_with_zero_parts_are_none(self):
+        fields = [('day', FIELD_TYPE.DATE), ('created', FIELD_TYPE.DATETIME), ('ts', FIELD_TYPE.TIMESTAMP)]
+        values = [
+            b'\x04' + struct.pack('<HBB', 2024, 0, 0),
+            b'\x07' + struct.pack('<HBBBBB', 2024, 2, 0, 1, 2, 3),
+            b'\x04' + struct.pack('<HBB', 0, 1, 1),
+        ]
+        self.wrapper.connection.socket.reply = PreparedServer(fields, [values])
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT * FROM t WHERE id = %s', [1])
+            self.assertEqual(cursor.fetchone(), (None, None, None))
+
+    def test_parameters_are_encoded(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT * FROM t WHERE a = %s AND b = %s AND c = %s', [None, 3, 'x'])
+        payload = commands(self.wrapper, statements.COM_STMT_EXECUTE)[0]
+        self.assertEqual(payload[9:], (
+            b'\x01' + b'\x01' +
+            struct.pack('<BBBBBB', FIELD_TYPE.NULL, 0, FIELD_TYPE.LONGLONG, 0, FIELD_TYPE.VAR_STRING, 0) +
+            struct.pack('<q', 3) + b'\x01x'
+        ))
+
+    def test_last_executed_query_is_interpolated(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT * FROM t WHERE name = %s AND pct LIKE '%%'", ["it's"])
+            self.assertEqual(
+                self.wrapper.ops.last_executed_query(cursor, None, None),
+                "SELECT * FROM t WHERE name = 'it\\'s' AND pct LIKE '%'",
+            )
+
+
+class StatementCacheTests(TestCase):
+    query = 'SELECT * FROM t WHERE id = %s'
+
+    def test_statements_are_reused(self):
+        wrapper = fakes.connected_wrapper(PreparedServer(), {'prepared_statements': True})
+        with wrapper.cursor() as cursor:
+            cursor.execute(self.query, [1])
+            cursor.execute(self.query, [2])
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_PREPARE)), 1)
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_EXECUTE)), 2)
+        self.assertEqual(wrapper.statement_cache.stats()['hits'], 1)
+
+    def test_refused_statements_run_as_text(self):
+        server = PreparedServer(prepare_error=fakes.error(1295, 'Not supported'))
+        wrapper = fakes.connected_wrapper(server, {'prepared_statements': True})
+        with wrapper.cursor() as cursor:
+            cursor.execute(self.query, [1])
+            cursor.execute(self.query, [2])
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_PREPARE)), 1)
+        self.assertEqual(wrapper.connection.socket.queries, ['SELECT * FROM t WHERE id = 1', 'SELECT * FROM t WHERE id = 2'])
+
+    def test_transient_prepare_errors_are_not_cached(self):
+        server = PreparedServer(prepare_error=fakes.error(1146, "Table 't' doesn't exist", '42S02'))
+        wrapper = fakes.connected_wrapper(server, {'prepared_statements': True})
+        with wrapper.cursor() as cursor:
+            cursor.execute(self.query, [1])
+            server.prepare_error = None
+            cursor.execute(self.query, [2])
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_PREPARE)), 2)
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_EXECUTE)), 1)
+
+    def test_ddl_on_another_connection_drops_statements(self):
+        wrapper = fakes.connected_wrapper(PreparedServer(), {'prepared_statements': True})
+        other = fakes.connected_wrapper(PreparedServer(), NAME=wrapper.settings_dict['NAME'])
+        with wrapper.cursor() as cursor:
+            cursor.execute(self.query, [1])
+        with other.cursor() as cursor:
+            cursor.execute('ALTER TABLE t ADD COLUMN c integer')
+        with wrapper.cursor() as cursor:
+            cursor.execute(self.query, [2])
+        self.assertEqual(commands(wrapper, statements.COM_STMT_CLOSE), [struct.pack('<I', 1)])
+        self.assertEqual(len(commands(wrapper, statements.COM_STMT_PREPARE)), 2)